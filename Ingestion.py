@@ -49,6 +49,18 @@ from dotenv import load_dotenv
 # - Handling file paths
 # -----------------------------
 import os
+import sys
+import glob
+import hashlib
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# -----------------------------
+# Batched Mongo writer shared with Project_Files/ingest.py
+# -----------------------------
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Project_Files"))
+from backend.bulk_writer import BulkWriter
 
 # Load all environment variables from .env file into the system
 load_dotenv()
@@ -70,6 +82,20 @@ COLLECTION_NAME = os.getenv("COLLECTION_NAME")
 # MongoDB Atlas Vector Search index name
 INDEX_NAME = os.getenv("INDEX_NAME")
 
+# Bulk write tuning
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "500"))
+WRITE_IN_FLIGHT = int(os.getenv("WRITE_IN_FLIGHT", "4"))
+
+# Incremental mode tuning
+LOAD_WORKERS = int(os.getenv("LOAD_WORKERS", "8"))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Chunking (shared by both modes so chunk hashes line up)
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 100
+
 
 # =====================================================
 # Function: load_documents
@@ -114,7 +140,7 @@ def load_documents(docs_path="docs"):
 # Function: split_documents
 # Breaks documents into smaller overlapping chunks
 # =====================================================
-def split_documents(documents, chunk_size=1000, chunk_overlap=100):
+def split_documents(documents, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
     """
     Splits documents into smaller chunks for embedding.
     """
@@ -135,6 +161,26 @@ def split_documents(documents, chunk_size=1000, chunk_overlap=100):
     return chunks
 
 
+# =====================================================
+# Function: chunk_document
+# Mongo document for one chunk, without its embedding
+# =====================================================
+def chunk_document(chunk):
+    """
+    Same layout MongoDBAtlasVectorSearch writes (text, embedding, metadata
+    fields) plus a content hash. The _id hashes source and content, so
+    re-running replaces chunks instead of duplicating them.
+    """
+
+    source = chunk.metadata.get("source", "")
+    return {
+        "_id": hashlib.sha256(f"{source}\n{chunk.page_content}".encode("utf-8")).hexdigest(),
+        "text": chunk.page_content,
+        "content_hash": hashlib.sha256(chunk.page_content.encode("utf-8")).hexdigest(),
+        **chunk.metadata
+    }
+
+
 # =====================================================
 # Function: create_vector_store
 # Converts text chunks into embeddings and stores them in MongoDB
@@ -149,7 +195,7 @@ def create_vector_store(chunks):
     # Initialize HuggingFace embedding model
     # all-MiniLM-L6-v2 is fast and lightweight
     embedding_model = HuggingFaceEmbeddings(
-        model_name="all-MiniLM-L6-v2"
+        model_name=EMBEDDING_MODEL
     )
 
     # Connect to MongoDB Atlas using URI
@@ -158,12 +204,31 @@ def create_vector_store(chunks):
     # Select database and collection
     collection = client[DB_NAME][COLLECTION_NAME]
 
-    # Create vector store in MongoDB Atlas
-    # This converts text into vectors and saves them
-    vectorstore = MongoDBAtlasVectorSearch.from_documents(
-        documents=chunks,           # Document chunks
-        embedding=embedding_model,  # Embedding model
+    # Batched writer: unordered bulk upserts, several batches in flight
+    writer = BulkWriter(
+        collection,
+        key="_id",
+        batch_size=WRITE_BATCH_SIZE,
+        max_in_flight=WRITE_IN_FLIGHT
+    )
+
+    # Embed in large batches and hand each batch to the writer
+    for start in range(0, len(chunks), EMBED_BATCH_SIZE):
+        batch = chunks[start:start + EMBED_BATCH_SIZE]
+        vectors = embedding_model.embed_documents([c.page_content for c in batch])
+
+        for chunk, vector in zip(batch, vectors):
+            doc = chunk_document(chunk)
+            doc["embedding"] = vector
+            writer.add(doc)
+
+    writer.close()
+    print(writer.report())
+
+    # Vector store handle over the populated collection
+    vectorstore = MongoDBAtlasVectorSearch(
         collection=collection,      # MongoDB collection
+        embedding=embedding_model,  # Embedding model
         index_name=INDEX_NAME       # Vector Search index
     )
 
@@ -172,6 +237,192 @@ def create_vector_store(chunks):
     return vectorstore
 
 
+# =====================================================
+# Incremental mode
+# Streams files through: thread-pool loading -> per-file split ->
+# hash check -> process-pool embedding -> bulk upsert.
+# Only new or edited chunks are embedded; chunks that disappeared from a
+# file, and all chunks of deleted files, are removed at the end.
+# =====================================================
+
+# Embedding model inside each pool process (loaded once per worker)
+_worker_model = None
+
+
+def _init_embed_worker(model_name, torch_threads):
+    """
+    Process pool initializer: one model per worker, with torch limited to
+    its share of the cores so workers don't oversubscribe the CPU.
+    """
+
+    global _worker_model
+    import torch
+    torch.set_num_threads(torch_threads)
+    _worker_model = HuggingFaceEmbeddings(model_name=model_name)
+
+
+def _embed_batch(texts):
+    return _worker_model.embed_documents(texts)
+
+
+# =====================================================
+# Function: list_text_files
+# Paths of the .txt files DirectoryLoader would load
+# =====================================================
+def list_text_files(docs_path="docs"):
+    if not os.path.exists(docs_path):
+        raise FileNotFoundError(
+            f"The directory {docs_path} does not exist. Please create it and add your company files."
+        )
+    return sorted(glob.glob(os.path.join(docs_path, "*.txt")))
+
+
+def _load_file(path):
+    try:
+        return TextLoader(path, encoding="utf-8").load()
+    except Exception as e:
+        print(f"Skipping {path}: {e}")
+        return []
+
+
+# =====================================================
+# Function: iter_documents
+# Loads files on a thread pool, yielding one file's Documents at a time
+# =====================================================
+def iter_documents(paths, workers=LOAD_WORKERS):
+    """
+    At most 2 * workers files are loaded ahead of the consumer, so memory
+    stays flat however large the corpus is.
+    """
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for path in paths:
+            pending.append(pool.submit(_load_file, path))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+# =====================================================
+# Function: sync_vector_store
+# Incremental ingestion into MongoDB Atlas
+# =====================================================
+def sync_vector_store(docs_path="docs", embed_workers=EMBED_WORKERS):
+    """
+    Brings the collection in line with docs_path without re-embedding
+    unchanged chunks.
+    """
+
+    print(f"Syncing {docs_path} into MongoDB Atlas (incremental)...")
+
+    paths = list_text_files(docs_path)
+    client = MongoClient(MONGODB_URI)
+    collection = client[DB_NAME][COLLECTION_NAME]
+
+    writer = BulkWriter(
+        collection,
+        key="_id",
+        batch_size=WRITE_BATCH_SIZE,
+        max_in_flight=WRITE_IN_FLIGHT
+    )
+    text_splitter = CharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    stats = {"files": 0, "chunks": 0, "unchanged": 0, "embedded": 0, "stale": 0, "removed_files": 0}
+
+    # Chunk ids to delete once the new chunks are written
+    stale_ids = []
+
+    # Files that were ingested from this folder before but are gone now
+    docs_dir = os.path.normpath(docs_path)
+    current = set(paths)
+    removed = [
+        src for src in collection.distinct("source")
+        if isinstance(src, str) and os.path.normpath(os.path.dirname(src)) == docs_dir and src not in current
+    ]
+
+    # Per-file lookups of existing chunk ids
+    collection.create_index("source")
+
+    # Started on the first changed chunk, so a no-op sync never loads the model
+    workers = max(1, embed_workers)
+    torch_threads = max(1, (os.cpu_count() or 1) // workers)
+    pool = None
+    in_flight = deque()
+    batch = []
+
+    def drain_one():
+        future, docs = in_flight.popleft()
+        for doc, vector in zip(docs, future.result()):
+            doc["embedding"] = vector
+            writer.add(doc)
+        stats["embedded"] += len(docs)
+
+    def submit(docs):
+        nonlocal pool
+        if pool is None:
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_embed_worker,
+                initargs=(EMBEDDING_MODEL, torch_threads)
+            )
+        in_flight.append((pool.submit(_embed_batch, [d["text"] for d in docs]), docs))
+        # Backpressure: keep every worker busy, but no more
+        while len(in_flight) > workers * 2:
+            drain_one()
+
+    try:
+        for documents in iter_documents(paths):
+            for document in documents:
+                stats["files"] += 1
+                source = document.metadata.get("source", "")
+                existing = {d["_id"] for d in collection.find({"source": source}, {"_id": 1})}
+                seen = set()
+
+                for chunk in text_splitter.split_documents([document]):
+                    doc = chunk_document(chunk)
+                    if doc["_id"] in seen:
+                        continue
+                    seen.add(doc["_id"])
+                    stats["chunks"] += 1
+                    if doc["_id"] in existing:
+                        stats["unchanged"] += 1
+                        continue
+                    batch.append(doc)
+                    if len(batch) >= EMBED_BATCH_SIZE:
+                        submit(batch)
+                        batch = []
+
+                # Chunks of the old version of this file that no longer exist
+                stale_ids.extend(existing - seen)
+
+        if batch:
+            submit(batch)
+        while in_flight:
+            drain_one()
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True)
+        writer.close()
+
+    # Deletes run last so searches never see a file with neither version
+    for start in range(0, len(stale_ids), WRITE_BATCH_SIZE):
+        stats["stale"] += collection.delete_many({"_id": {"$in": stale_ids[start:start + WRITE_BATCH_SIZE]}}).deleted_count
+    if removed:
+        collection.delete_many({"source": {"$in": removed}})
+        stats["removed_files"] = len(removed)
+
+    print(writer.report())
+    print(
+        f"{stats['files']} files, {stats['chunks']} chunks: {stats['unchanged']} unchanged, "
+        f"{stats['embedded']} embedded, {stats['stale']} stale chunks deleted, "
+        f"{stats['removed_files']} removed files cleared"
+    )
+    print("--- Finished syncing MongoDB ---")
+
+    return stats
+
+
 # =====================================================
 # Main pipeline
 # Controls full ingestion workflow
@@ -182,6 +433,12 @@ def main():
     Load → Split → Embed → Store
     """
 
+    parser = argparse.ArgumentParser(description="Ingest docs/*.txt into MongoDB Atlas")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only embed new or changed chunks and delete removed ones")
+    parser.add_argument("--docs", default="docs", help="Folder containing company documents")
+    args = parser.parse_args()
+
     print("=== RAG Document Ingestion Pipeline (MongoDB Atlas) ===\n")
 
     # Verify environment variables exist
@@ -190,7 +447,13 @@ def main():
         return
 
     # Folder containing company documents
-    docs_path = "docs"
+    docs_path = args.docs
+
+    # Incremental: stream, hash-check, embed only what changed
+    if args.incremental:
+        sync_vector_store(docs_path)
+        print("\n✅ Sync complete! MongoDB Atlas matches your documents.")
+        return
 
     # Step 1: Load documents from folder
     documents = load_documents(docs_path)
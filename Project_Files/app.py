@@ -160,68 +160,115 @@ with col2:
 st.markdown("---")
 
 # ---------------- RESULTS ----------------
+# Backend serving /images, as the browser reaches it; result images are <img loading="lazy">
+# tags pointing at it. Set IMAGE_BASE_URL="" to read images from disk with st.image instead.
+IMAGE_BASE_URL = os.getenv("IMAGE_BASE_URL", "http://localhost:8000").rstrip("/")
+
+class GenerationFailed(Exception):
+    """
+    Raised out of cached_ask so st.cache_data never stores a failed answer.
+    """
+    def __init__(self, result):
+        super().__init__(result.get("answer"))
+        self.result = result
+
+@st.cache_data(ttl=int(os.getenv("RESULT_CACHE_TTL", "600")), max_entries=512, show_spinner=False)
+def cached_ask(normalized_query):
+    # Shared across sessions: identical questions within the TTL skip the pipeline
+    result = engine.ask(normalized_query)
+    if result.get("generation_failed"):
+        raise GenerationFailed(result)
+    return result
+
+def normalize_query(text):
+    return " ".join(text.split())
+
+def render_image(img_data):
+    rel_path = img_data["image_path"]
+    if IMAGE_BASE_URL:
+        st.markdown(f'<img src="{IMAGE_BASE_URL}/{rel_path}" loading="lazy" decoding="async" class="catalog-image" style="width:100%;">', unsafe_allow_html=True)
+        return True
+
+    # Files of the catalog version the engine is serving
+    image_dir = os.path.join(engine.db.asset_dir, "images")
+    filename = rel_path.split("/")[-1].split("?")[0]
+    full_path = os.path.join(image_dir, filename)
+    if not os.path.exists(full_path):
+        # Nodes ingested before derivatives existed
+        filename = img_data.get("original_path", rel_path).split("/")[-1]
+        full_path = os.path.join(image_dir, filename)
+    if not os.path.exists(full_path):
+        return False
+    st.image(full_path, use_container_width=True)
+    return True
+
+def render_results(result):
+    # Layout
+    left_col, right_col = st.columns([1, 1], gap="large")
+    
+    with left_col:
+        st.markdown('<div class="glass-panel">', unsafe_allow_html=True)
+        st.markdown("### 🔍 AI Analysis")
+        st.write(result["answer"])
+        st.markdown('<br><span class="status-badge">CLIP-MATCHED</span> <span class="status-badge">VECTOR-VERIFIED</span>', unsafe_allow_html=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+    
+    with right_col:
+        st.markdown("### 🖼️ Catalog Discoveries")
+        images = result.get("images", [])
+        if images:
+            img_grid = st.columns(2)
+            for i, img_data in enumerate(images[:6]):
+                with img_grid[i % 2]:
+                    if render_image(img_data):
+                        score = img_data.get("score", 0)
+                        status_icon = "🔥" if score > 0.28 else "📎"
+                        ocr = img_data.get("ocr_text", "")
+                        if ocr:
+                            st.markdown(f'<p class="image-caption"><i>"{ocr[:40]}..."</i></p>', unsafe_allow_html=True)
+                        else:
+                            st.markdown(f'<p class="image-caption">Design Ref {i+1}</p>', unsafe_allow_html=True)
+                        pdf_src = str(img_data.get("pdf", "Catalog")).title()
+                        pg_num = img_data.get("page")
+                        pg_str = f"Pg {pg_num}" if pg_num else "Original"
+                        
+                        st.markdown(f'<p style="font-size:0.7rem; color:#94a3b8; text-align:center; margin-bottom:5px;">{pdf_src} • {pg_str} • {score:.2f} {status_icon}</p>', unsafe_allow_html=True)
+                        
+                        pdf_url = img_data.get("pdf_url")
+                        if pdf_url:
+                            st.markdown(f'''
+                                <div style="text-align:center; margin-top:2px;">
+                                    <a href="{pdf_url}" target="_blank" 
+                                       style="background:rgba(59, 130, 246, 0.1); color:#60a5fa; border:1px solid rgba(59, 130, 246, 0.3); 
+                                       padding:3px 12px; border-radius:50px; text-decoration:none; font-size:0.65rem; font-weight:bold; 
+                                       display:inline-block; transition:all 0.3s ease;">
+                                       OPEN CATALOG 🔖
+                                    </a>
+                                </div>''', unsafe_allow_html=True)
+                        
+                        st.markdown("<br>", unsafe_allow_html=True)
+        else:
+            st.info("The requested design geometry isn't in our immediate focus. Try a broader search.")
+
 if search_triggered or query:
     if query:
-        with st.status("Analyzing catalog geometry...", expanded=False) as status:
-            try:
-                result = engine.ask(query)
-                status.update(label="Architectural analysis complete", state="complete")
-                
-                # Layout
-                left_col, right_col = st.columns([1, 1], gap="large")
-                
-                with left_col:
-                    st.markdown('<div class="glass-panel">', unsafe_allow_html=True)
-                    st.markdown("### 🔍 AI Analysis")
-                    st.write(result["answer"])
-                    st.markdown('<br><span class="status-badge">CLIP-MATCHED</span> <span class="status-badge">VECTOR-VERIFIED</span>', unsafe_allow_html=True)
-                    st.markdown('</div>', unsafe_allow_html=True)
-                
-                with right_col:
-                    st.markdown("### 🖼️ Catalog Discoveries")
-                    images = result.get("images", [])
-                    if images:
-                        img_grid = st.columns(2)
-                        for i, img_data in enumerate(images[:6]):
-                            with img_grid[i % 2]:
-                                rel_path = img_data["image_path"]
-                                ocr = img_data.get("ocr_text", "")
-                                filename = rel_path.split("/")[-1]
-                                full_path = os.path.join("Data", "processed", "images", filename)
-                                
-                                if os.path.exists(full_path):
-                                    st.image(full_path, use_container_width=True)
-                                    score = img_data.get("score", 0)
-                                    status_icon = "🔥" if score > 0.28 else "📎"
-                                    ocr = img_data.get("ocr_text", "")
-                                    if ocr:
-                                        st.markdown(f'<p class="image-caption"><i>"{ocr[:40]}..."</i></p>', unsafe_allow_html=True)
-                                    else:
-                                        st.markdown(f'<p class="image-caption">Design Ref {i+1}</p>', unsafe_allow_html=True)
-                                    pdf_src = str(img_data.get("pdf", "Catalog")).title()
-                                    pg_num = img_data.get("page")
-                                    pg_str = f"Pg {pg_num}" if pg_num else "Original"
-                                    
-                                    st.markdown(f'<p style="font-size:0.7rem; color:#94a3b8; text-align:center; margin-bottom:5px;">{pdf_src} • {pg_str} • {score:.2f} {status_icon}</p>', unsafe_allow_html=True)
-                                    
-                                    pdf_url = img_data.get("pdf_url")
-                                    if pdf_url:
-                                        st.markdown(f'''
-                                            <div style="text-align:center; margin-top:2px;">
-                                                <a href="{pdf_url}" target="_blank" 
-                                                   style="background:rgba(59, 130, 246, 0.1); color:#60a5fa; border:1px solid rgba(59, 130, 246, 0.3); 
-                                                   padding:3px 12px; border-radius:50px; text-decoration:none; font-size:0.65rem; font-weight:bold; 
-                                                   display:inline-block; transition:all 0.3s ease;">
-                                                   OPEN CATALOG 🔖
-                                                </a>
-                                            </div>''', unsafe_allow_html=True)
-                                    
-                                    st.markdown("<br>", unsafe_allow_html=True)
-                    else:
-                        st.info("The requested design geometry isn't in our immediate focus. Try a broader search.")
-                
-            except Exception as e:
-                st.error(f"Neural linkage error: {e}")
+        normalized = normalize_query(query)
+        try:
+            # Only run the pipeline when the query changed, or DISCOVER is pressed again after a
+            # failed answer; other widget reruns render the stored result
+            retry = search_triggered and st.session_state.get("last_result", {}).get("generation_failed")
+            if st.session_state.get("last_query") != normalized or retry:
+                with st.status("Analyzing catalog geometry...", expanded=False) as status:
+                    try:
+                        st.session_state["last_result"] = cached_ask(normalized)
+                    except GenerationFailed as failed:
+                        # Shown but never cached
+                        st.session_state["last_result"] = failed.result
+                    st.session_state["last_query"] = normalized
+                    status.update(label="Architectural analysis complete", state="complete")
+            render_results(st.session_state["last_result"])
+        except Exception as e:
+            st.error(f"Neural linkage error: {e}")
     else:
         st.warning("Please provide a vision to begin discovery.")
 
@@ -0,0 +1,296 @@
+import re
+
+# Numeric and token fields derived from the free-text catalog fields at ingest.
+# All of them are filter paths in the vector search indexes.
+ATTRIBUTE_FIELDS = ["price_value", "width_ft", "length_ft", "area_sqft", "material_tokens", "color_tokens"]
+
+# Query constraint -> node field, for the <name>_min / <name>_max constraints
+RANGE_FIELDS = {"price": "price_value", "width": "width_ft", "length": "length_ft", "area": "area_sqft"}
+
+# Relative window used for "around 3000" and for a requested "10x12" size
+APPROX = 0.15
+
+KNOWN_MATERIALS = {
+    "wood", "oak", "walnut", "maple", "pine", "teak", "birch", "ash", "cherry", "bamboo", "mdf", "plywood",
+    "veneer", "laminate", "acrylic", "lacquer", "melamine", "quartz", "granite", "marble", "stone", "ceramic",
+    "porcelain", "concrete", "terrazzo", "glass", "steel", "stainless", "aluminium", "brass", "copper",
+    "iron", "metal", "leather", "fabric", "velvet", "linen", "rattan", "cane", "upholstered",
+}
+KNOWN_COLORS = {
+    "white", "black", "gray", "beige", "cream", "ivory", "brown", "tan", "taupe", "navy", "blue", "green",
+    "sage", "olive", "red", "pink", "blush", "yellow", "mustard", "orange", "gold", "silver", "charcoal",
+    "natural", "matte", "gloss", "oak", "walnut",
+}
+# Color words that are also ordinary words ("natural light"): only a constraint
+# when the question talks about color or finish
+AMBIGUOUS_COLORS = {"natural", "matte", "gloss"}
+_COLOR_CONTEXT = re.compile(r"\b(colou?rs?|finish(es|ed)?|shades?|tones?)\b", re.I)
+
+_SYNONYMS = {
+    "grey": "gray", "colour": "color", "laminated": "laminate", "wooden": "wood", "timber": "wood",
+    "aluminum": "aluminium", "lacquered": "lacquer", "glossy": "gloss", "matt": "matte",
+}
+_WORD = re.compile(r"[a-z]+")
+
+_NUMBER = r"(\d[\d,]*(?:\.\d+)?)\s*(k\b)?"
+_PRICE = re.compile(_NUMBER, re.I)
+
+# Longer units first so "mm" is not read as "m"; a word unit may run into the "x"
+_UNIT = r"((?:mm|cm|ft|feet|foot|meters?|metres?|m|inch(?:es)?|in)(?![a-wyz])|'|\")?"
+_DIMS = re.compile(
+    r"(\d+(?:\.\d+)?)\s*" + _UNIT + r"\s*(?:x|×|by|\*)\s*(\d+(?:\.\d+)?)\s*" + _UNIT, re.I
+)
+_AREA = re.compile(r"(\d[\d,]*(?:\.\d+)?)\s*(?:sq\.?\s*(ft|feet|m|meters?|metres?)|(ft|m)2|square\s+(feet|foot|meters?|metres?))", re.I)
+
+# Feet per unit
+_TO_FEET = {
+    "ft": 1.0, "feet": 1.0, "foot": 1.0, "'": 1.0, "m": 3.28084, "meter": 3.28084, "meters": 3.28084,
+    "metre": 3.28084, "metres": 3.28084, "cm": 0.0328084, "mm": 0.00328084, "in": 1 / 12, "inch": 1 / 12,
+    "inches": 1 / 12, '"': 1 / 12,
+}
+
+
+def _number(text, thousands=None):
+    value = float(text.replace(",", ""))
+    return value * 1000 if thousands else value
+
+
+def parse_price(text):
+    """
+    First amount in a price string ("$3,500", "From 3.5k"), or None.
+    """
+    m = _PRICE.search(text or "")
+    return _number(m.group(1), m.group(2)) if m else None
+
+
+def _feet(value, unit):
+    return value * _TO_FEET.get((unit or "ft").lower(), 1.0)
+
+
+def parse_dimensions(text):
+    """
+    Width, length (shorter side first) in feet and area in sq ft from a
+    size string like "10ft x 12ft", "3.0 x 3.6 m" or "120 sq ft".
+    """
+    text = text or ""
+    m = _DIMS.search(text)
+    if m:
+        # "10 x 12 ft": the unit after the second number applies to both
+        unit_a, unit_b = m.group(2) or m.group(4), m.group(4) or m.group(2)
+        a, b = _feet(float(m.group(1)), unit_a), _feet(float(m.group(3)), unit_b)
+        width, length = sorted((a, b))
+        return {"width_ft": round(width, 2), "length_ft": round(length, 2), "area_sqft": round(width * length, 1)}
+    m = _AREA.search(text)
+    if m:
+        unit = (m.group(2) or m.group(3) or m.group(4) or "ft").lower()
+        factor = _TO_FEET.get(unit, 1.0) ** 2
+        return {"width_ft": None, "length_ft": None, "area_sqft": round(_number(m.group(1)) * factor, 1)}
+    return {"width_ft": None, "length_ft": None, "area_sqft": None}
+
+
+def normalize_tokens(text):
+    """
+    Lowercased, singular, de-synonymed words of a material or color string.
+    """
+    out = []
+    for word in _WORD.findall((text or "").lower()):
+        word = _SYNONYMS.get(word, word)
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        if len(word) > 1 and word not in out:
+            out.append(word)
+    return out
+
+
+def node_attributes(entry):
+    """
+    Filterable fields for a catalog entry or stored node.
+    """
+    return {
+        "price_value": parse_price(entry.get("price")),
+        **parse_dimensions(entry.get("size")),
+        "material_tokens": normalize_tokens(entry.get("material")),
+        "color_tokens": normalize_tokens(entry.get("color")),
+    }
+
+
+# ---------------- Query constraints ----------------
+
+_CURRENCY = r"(?:\$|₹|€|£|\brs\.?|\binr\b|\busd\b)"
+_BETWEEN = re.compile(
+    r"\b(?:between|from)\s*" + _CURRENCY + r"?\s*" + _NUMBER + r"\s*(?:and|to|-)\s*" + _CURRENCY + r"?\s*" + _NUMBER,
+    re.I
+)
+_MAX = re.compile(
+    r"(?:\bunder|\bbelow|\bless than|\bcheaper than|\bup to|\bwithin|\bno more than|\bmax(?:imum)?|\bat most|<=?)"
+    r"\s*(?:a budget of\s*)?" + _CURRENCY + r"?\s*" + _NUMBER, re.I
+)
+_MIN = re.compile(
+    r"(?:\bover|\babove|\bmore than|\bat least|\bmin(?:imum)?|\bstarting at|>=?)\s*" + _CURRENCY + r"?\s*" + _NUMBER,
+    re.I
+)
+_AROUND = re.compile(r"(?:\baround|\babout|\broughly|~)\s*" + _CURRENCY + r"?\s*" + _NUMBER, re.I)
+_BUDGET = re.compile(r"(?:" + _CURRENCY + r"\s*" + _NUMBER + r"|\bbudget(?: of| is)?\s*" + _CURRENCY + r"?\s*" + _NUMBER + r")", re.I)
+_SIZE_AFTER = re.compile(r"\s*(?:sq|square|ft|feet|foot|m\b|meters?|metres?|cm|mm|inch|x\b|by\b|'|\")", re.I)
+
+# A bare number is a price after one of these, with a currency, a "k" suffix or a price word in the question
+_PRICE_CUE = re.compile(r"(?:between|under|below|less than|cheaper than|over|above|more than)\b", re.I)
+_CURRENCY_MARK = re.compile(_CURRENCY, re.I)
+_CURRENCY_AFTER = re.compile(r"\s*(?:dollars?|bucks|usd|rupees?|rs\b|inr|euros?|eur|pounds?|gbp)\b", re.I)
+_PRICE_WORDS = re.compile(
+    r"\b(prices?|priced|pricing|budget|costs?|costing|spend|afford\w*|cheap\w*|expensive|dollars?|bucks|"
+    r"rupees?|euros?|pounds?)\b", re.I
+)
+# "within 3 weeks", "max 2 sinks", "between 2 and 4 drawers" are counts, not prices
+_NOT_PRICE_AFTER = re.compile(
+    r"\s*(?:weeks?|days?|months?|years?|yrs?|hours?|hrs?|min(?:ute)?s?|doors?|drawers?|sinks?|shel(?:f|ves)|"
+    r"seats?|seaters?|people|persons?|burners?|pieces?|pcs|rooms?|beds?|chairs?|panels?|handles?|units?|"
+    r"cabinets?|tiers?|layers?|colou?rs?|styles?|options?|items?|products?|%|percent)\b", re.I
+)
+
+
+def _price_matches(pattern, text):
+    price_context = bool(_PRICE_WORDS.search(text))
+    for m in pattern.finditer(text):
+        # "at least 120 sq ft" is a size, "within 3 weeks" a lead time
+        if _SIZE_AFTER.match(text, m.end()) or _NOT_PRICE_AFTER.match(text, m.end()):
+            continue
+        thousands = any((g or "").lower() == "k" for g in m.groups())
+        if (price_context or thousands or _PRICE_CUE.match(m.group(0)) or _CURRENCY_MARK.search(m.group(0))
+                or _CURRENCY_AFTER.match(text, m.end())):
+            yield m
+
+
+def extract_constraints(question):
+    """
+    Hard constraints stated in a question: price/width/length/area bounds
+    (<name>_min, <name>_max) plus known material and color words. Sizes are
+    matched first and removed so their numbers are not read as prices. A
+    remaining number is a price after under/below/over/between/..., or
+    with a currency, a "k" suffix or a price word in the question, unless
+    a unit or a counted thing follows it.
+
+    Regression cases (python -m doctest backend/attributes.py):
+
+    >>> extract_constraints("kitchen under 3000 with laminate")
+    {'price_max': 3000.0, 'materials': ['laminate']}
+    >>> extract_constraints("kitchens between 2000 and 4000")
+    {'price_min': 2000.0, 'price_max': 4000.0}
+    >>> extract_constraints("kitchen under 3,000")
+    {'price_max': 3000.0}
+    >>> extract_constraints("a 12 ft kitchen under 4000")
+    {'price_max': 4000.0}
+    >>> extract_constraints("delivered within 3 weeks")
+    {}
+    >>> extract_constraints("kitchen with max 2 sinks")
+    {}
+    >>> extract_constraints("between 2 and 4 drawers")
+    {}
+    >>> extract_constraints("at least 120 sq ft")
+    {'area_min': 120.0}
+    """
+    text = question
+    constraints = {}
+
+    m = _DIMS.search(text)
+    if m:
+        dims = parse_dimensions(m.group(0))
+        for name in ("width", "length"):
+            value = dims[f"{name}_ft"]
+            constraints[f"{name}_min"] = round(value * (1 - APPROX), 2)
+            constraints[f"{name}_max"] = round(value * (1 + APPROX), 2)
+        text = text[:m.start()] + " " + text[m.end():]
+
+    m = _AREA.search(text)
+    if m:
+        area = parse_dimensions(m.group(0))["area_sqft"]
+        before = text[:m.start()].lower()
+        if re.search(r"(at least|over|above|more than|min(imum)?)\s*$", before):
+            constraints["area_min"] = area
+        elif re.search(r"(under|below|less than|up to|at most|max(imum)?)\s*$", before):
+            constraints["area_max"] = area
+        else:
+            constraints["area_min"], constraints["area_max"] = round(area * (1 - APPROX), 1), round(area * (1 + APPROX), 1)
+        text = text[:m.start()] + " " + text[m.end():]
+
+    between = next(_price_matches(_BETWEEN, text), None)
+    if between:
+        low, high = _number(between.group(1), between.group(2)), _number(between.group(3), between.group(4))
+        constraints["price_min"], constraints["price_max"] = min(low, high), max(low, high)
+    else:
+        for pattern, key in ((_MAX, "price_max"), (_MIN, "price_min")):
+            m = next(_price_matches(pattern, text), None)
+            if m:
+                constraints[key] = _number(m.group(1), m.group(2))
+        m = next(_price_matches(_AROUND, text), None)
+        if m and "price_min" not in constraints and "price_max" not in constraints:
+            value = _number(m.group(1), m.group(2))
+            constraints["price_min"], constraints["price_max"] = round(value * (1 - APPROX)), round(value * (1 + APPROX))
+        m = None if constraints.keys() & {"price_min", "price_max"} else next(_price_matches(_BUDGET, text), None)
+        if m:
+            # "$3000 kitchen" / "budget of 3000": treat as a ceiling
+            constraints["price_max"] = _number(m.group(1) or m.group(3), m.group(2) or m.group(4))
+
+    words = normalize_tokens(text)
+    materials = [w for w in words if w in KNOWN_MATERIALS]
+    color_context = bool(_COLOR_CONTEXT.search(text))
+    colors = [w for w in words if w in KNOWN_COLORS and (color_context or w not in AMBIGUOUS_COLORS)]
+    if materials:
+        constraints["materials"] = materials
+    if colors:
+        constraints["colors"] = colors
+    return constraints
+
+
+def constraint_clauses(constraints):
+    """
+    Mongo / $vectorSearch filter clauses for extracted constraints.
+    """
+    clauses = []
+    for name, field in RANGE_FIELDS.items():
+        bounds = {}
+        if constraints.get(f"{name}_min") is not None:
+            bounds["$gte"] = constraints[f"{name}_min"]
+        if constraints.get(f"{name}_max") is not None:
+            bounds["$lte"] = constraints[f"{name}_max"]
+        if bounds:
+            clauses.append({field: bounds})
+
+    materials, colors = constraints.get("materials") or [], constraints.get("colors") or []
+    # A word that is both ("oak", "walnut") may describe either field
+    shared = [w for w in materials if w in colors]
+    if shared:
+        clauses.append({"$or": [{"material_tokens": {"$in": shared}}, {"color_tokens": {"$in": shared}}]})
+    materials = [w for w in materials if w not in shared]
+    colors = [w for w in colors if w not in shared]
+    if materials:
+        clauses.append({"material_tokens": {"$in": materials}})
+    if colors:
+        clauses.append({"color_tokens": {"$in": colors}})
+    return clauses
+
+
+def vector_filter(category=None, constraints=None):
+    """
+    Combined $vectorSearch filter for a category and constraints, or None.
+    """
+    clauses = ([{"category": category}] if category else []) + constraint_clauses(constraints or {})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def describe_constraints(constraints):
+    parts = []
+    for name in RANGE_FIELDS:
+        low, high = constraints.get(f"{name}_min"), constraints.get(f"{name}_max")
+        if low is not None and high is not None:
+            parts.append(f"{name} {low:g}-{high:g}")
+        elif low is not None:
+            parts.append(f"{name} >= {low:g}")
+        elif high is not None:
+            parts.append(f"{name} <= {high:g}")
+    for key in ("materials", "colors"):
+        if constraints.get(key):
+            parts.append(f"{key[:-1]} {' or '.join(constraints[key])}")
+    return ", ".join(parts)
@@ -0,0 +1,141 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+
+class BulkWriter:
+    """
+    Batched upsert writer shared by the ingestion scripts.
+
+    Documents are buffered and written as unordered bulk_write batches of
+    ReplaceOne upserts keyed on `key`. Up to `max_in_flight` batches run
+    concurrently; add() blocks beyond that so producers feel backpressure.
+    Failed sub-batches (the writeErrors of a BulkWriteError, or the whole
+    batch on a connection error) are retried with exponential backoff.
+    `on_written(docs)` is called from a writer thread with every group of
+    documents Mongo acknowledged. `to_op(doc)` replaces the default upsert
+    with any other write model (e.g. UpdateOne for in-place $set).
+    """
+
+    def __init__(self, collection, key="id", batch_size=500, max_in_flight=4,
+                 max_retries=3, retry_backoff=0.5, on_written=None, to_op=None):
+        self.collection = collection
+        self.on_written = on_written
+        self.to_op = to_op or (lambda doc: ReplaceOne({self.key: doc[self.key]}, doc, upsert=True))
+        self.key = key
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="bulk-write")
+        self._futures = []
+        self._started = None
+
+        self.stats = {"written": 0, "batches": 0, "retries": 0, "failed": 0, "seconds": 0.0}
+
+    # ---------------- Public API ----------------
+
+    def add(self, doc):
+        with self._lock:
+            if self._started is None:
+                self._started = time.perf_counter()
+            self._buffer.append(doc)
+            if len(self._buffer) < self.batch_size:
+                return
+            batch, self._buffer = self._buffer, []
+        self._submit(batch)
+
+    def add_many(self, docs):
+        for doc in docs:
+            self.add(doc)
+
+    def flush(self):
+        """
+        Writes any buffered documents and waits for every in-flight batch.
+        """
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if batch:
+            self._submit(batch)
+        with self._lock:
+            futures, self._futures = self._futures, []
+        for f in futures:
+            f.result()
+        with self._lock:
+            if self._started is not None:
+                self.stats["seconds"] = time.perf_counter() - self._started
+        return self.stats
+
+    def close(self):
+        stats = self.flush()
+        self._executor.shutdown(wait=True)
+        return stats
+
+    def docs_per_second(self):
+        seconds = self.stats["seconds"]
+        return self.stats["written"] / seconds if seconds else 0.0
+
+    def report(self):
+        s = self.stats
+        return (f"Bulk writer: {s['written']} docs in {s['batches']} batches, {s['seconds']:.1f}s "
+                f"({self.docs_per_second():.0f} docs/s), {s['retries']} retries, {s['failed']} failed")
+
+    # ---------------- Internals ----------------
+
+    def _submit(self, batch):
+        self._slots.acquire()
+        future = self._executor.submit(self._write, batch)
+        future.add_done_callback(lambda _: self._slots.release())
+        with self._lock:
+            self._futures = [f for f in self._futures if not f.done()]
+            self._futures.append(future)
+
+    def _write(self, batch):
+        pending = batch
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                with self._lock:
+                    self.stats["retries"] += 1
+                time.sleep(self.retry_backoff * (2 ** (attempt - 1)))
+
+            ops = [self.to_op(doc) for doc in pending]
+            try:
+                self.collection.bulk_write(ops, ordered=False)
+                self._count(len(pending), 0)
+                self._acknowledge(pending)
+                return
+            except BulkWriteError as e:
+                # Unordered: everything except the reported indexes was applied
+                failed_idx = sorted({err["index"] for err in e.details.get("writeErrors", [])})
+                self._count(len(pending) - len(failed_idx), 0)
+                failed_set = set(failed_idx)
+                self._acknowledge([d for i, d in enumerate(pending) if i not in failed_set])
+                if not failed_idx:
+                    return
+                print(f"Bulk write: {len(failed_idx)} of {len(pending)} ops failed, retrying")
+                pending = [pending[i] for i in failed_idx]
+            except PyMongoError as e:
+                print(f"Bulk write of {len(pending)} docs failed ({e}), retrying")
+
+        self._count(0, len(pending))
+        print(f"Bulk write: giving up on {len(pending)} docs after {self.max_retries} retries")
+
+    def _acknowledge(self, docs):
+        if self.on_written is not None and docs:
+            try:
+                self.on_written(docs)
+            except Exception as e:
+                print(f"Bulk write: on_written callback failed: {e}")
+
+    def _count(self, written, failed):
+        with self._lock:
+            self.stats["written"] += written
+            self.stats["failed"] += failed
+            if written:
+                self.stats["batches"] += 1
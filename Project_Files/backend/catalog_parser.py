@@ -0,0 +1,229 @@
+import os
+import re
+
+try:
+    # Optional: only needed for .xlsx catalogs
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+CHUNK_SIZE = 1 << 20
+
+# Catalog source of truth: "txt" (default) or "xlsx" to read a job's sheet instead
+CATALOG_SOURCE = os.getenv("CATALOG_SOURCE", "txt").lower()
+
+# Entry fields in the order they appear after the product name
+FIELD_ORDER = ["style", "material", "color", "size", "warranty", "delivery", "installation", "description", "price"]
+FIELD_RANK = {field: i for i, field in enumerate(FIELD_ORDER)}
+
+LABEL_FIELDS = {
+    "Style": "style",
+    "Material": "material",
+    "Color": "color",
+    "Layout Size": "size",
+    "Size": "size",
+    "Warranty": "warranty",
+    "Delivery": "delivery",
+    "Installation": "installation",
+    "Description": "description",
+    "Price": "price",
+}
+
+# One pattern for both entry starts ("Page 3 | ") and field labels (" Material: ").
+# re.split on it yields [prefix, page, label, value, page, label, value, ...].
+_TOKEN = re.compile(
+    r"Page (\d+) \|\s|\s(" + "|".join(re.escape(label) for label in LABEL_FIELDS) + r"):\s"
+)
+_PAGE = re.compile(r"Page \d+ \|\s")
+
+LABEL_INFO = {label: (field, FIELD_RANK[field]) for label, field in LABEL_FIELDS.items()}
+
+# XLSX header (lowercased, stripped) -> entry field
+COLUMN_FIELDS = {
+    "page": "page",
+    "page no": "page",
+    "page number": "page",
+    "product": "product",
+    "product name": "product",
+    "name": "product",
+    "layout": "product",
+    "layout size": "size",
+    **{field: field for field in FIELD_ORDER},
+}
+
+
+def _clean(value):
+    return value.strip().replace("\n", " ")
+
+
+def parse_txt_entries(text):
+    """
+    Parses complete catalog entries of the form
+
+        Page 1 | Kitchen Layout 1-1 Style: Urban Material: ... Price: ...
+
+    in one pass over the text. Each field's value runs to the next label of
+    a later field, so label words inside a description stay in the
+    description. Entries without a Style label are not products and are
+    skipped.
+    """
+    parts = _TOKEN.split(text)
+    entries = []
+    entry = field = value = None
+    rank = -1
+    for i in range(1, len(parts), 3):
+        page, label, text_after = parts[i], parts[i + 1], parts[i + 2]
+        if page is not None:
+            if entry is not None and rank >= 0:
+                entry[field] = _clean(value)
+                entries.append(entry)
+            entry, field, rank, value = {"page": int(page)}, "product", -1, text_after
+            continue
+
+        if entry is None:
+            continue
+        next_field, next_rank = LABEL_INFO[label]
+        # The product name runs to "Style:"; later labels must move forward
+        if (rank < 0 and next_field != "style") or next_rank <= rank:
+            value = f"{value} {label}: {text_after}"
+            continue
+        entry[field] = _clean(value)
+        field, rank, value = next_field, next_rank, text_after
+
+    if entry is not None and rank >= 0:
+        entry[field] = _clean(value)
+        entries.append(entry)
+    return entries
+
+
+class TxtCatalogTokenizer:
+    """
+    Incremental TXT catalog parser. feed() takes the next chunk of text (""
+    at end of file) and returns the entries completed so far; text from the
+    last "Page N |" marker on is held back until the next marker or EOF.
+    """
+
+    def __init__(self):
+        self._buf = ""
+
+    def feed(self, chunk):
+        if not chunk:
+            buf, self._buf = self._buf, ""
+            return parse_txt_entries(buf)
+
+        self._buf += chunk
+        cut = self._last_entry_start()
+        if cut <= 0:
+            return []
+        buf, self._buf = self._buf[:cut], self._buf[cut:]
+        return parse_txt_entries(buf)
+
+    def _last_entry_start(self):
+        pos = len(self._buf)
+        while True:
+            pos = self._buf.rfind("Page ", 0, pos)
+            if pos < 0 or _PAGE.match(self._buf, pos):
+                return pos
+
+
+def iter_txt_catalog(file_path, chunk_size=CHUNK_SIZE):
+    """
+    Streams entries from a TXT catalog without reading the whole file.
+    """
+    if not os.path.exists(file_path):
+        return
+    tokenizer = TxtCatalogTokenizer()
+    with open(file_path, "r", encoding="utf-8") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            yield from tokenizer.feed(chunk)
+            if not chunk:
+                break
+
+
+def parse_txt_catalog(file_path):
+    return list(iter_txt_catalog(file_path))
+
+
+def _cell_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip().replace("\n", " ")
+
+
+def xlsx_columns(header):
+    """
+    Maps header cells to entry fields: [(column index, field), ...].
+    """
+    columns, seen = [], set()
+    for idx, cell in enumerate(header):
+        field = COLUMN_FIELDS.get(_cell_text(cell).lower().rstrip(":"))
+        if field and field not in seen:
+            columns.append((idx, field))
+            seen.add(field)
+    return columns
+
+
+def iter_xlsx_catalog(file_path, sheet=None):
+    """
+    Streams entries from an XLSX catalog whose first row names the columns
+    (Page, Product, Style, Material, ...). Uses openpyxl's read-only mode so
+    rows are read lazily from the sheet XML.
+    """
+    if openpyxl is None:
+        raise ImportError("openpyxl is required to read XLSX catalogs")
+    if not os.path.exists(file_path):
+        return
+
+    wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet] if sheet else wb.active
+        rows = ws.iter_rows(values_only=True)
+        columns = xlsx_columns(next(rows, ()))
+        fields = {field for _, field in columns}
+        if not {"page", "product"} <= fields:
+            raise ValueError(f"{file_path}: header needs Page and Product columns, found {sorted(fields)}")
+        missing = [field for field in FIELD_ORDER if field not in fields]
+        if missing:
+            print(f"Warning: {file_path} has no column for {', '.join(missing)}; those fields will be empty")
+
+        for row in rows:
+            entry = {field: _cell_text(row[idx]) if idx < len(row) else "" for idx, field in columns}
+            try:
+                entry["page"] = int(float(entry["page"]))
+            except ValueError:
+                continue
+            if entry["product"]:
+                yield entry
+    finally:
+        wb.close()
+
+
+def iter_catalog(job, source=None):
+    """
+    Entries for an ingestion job: the TXT export, or the job's XLSX sheet
+    when `source` (default CATALOG_SOURCE) is "xlsx" and the sheet is readable.
+    """
+    source = (source or CATALOG_SOURCE).lower()
+    xls_path = job.get("xls")
+    if source == "xlsx" and not xls_path:
+        print(f"CATALOG_SOURCE=xlsx but job has no sheet; reading {job['txt']}")
+    elif source == "xlsx" and openpyxl is None:
+        print(f"CATALOG_SOURCE=xlsx but openpyxl is not installed; reading {job['txt']}")
+    elif source == "xlsx" and not os.path.exists(xls_path):
+        print(f"CATALOG_SOURCE=xlsx but {xls_path} does not exist; reading {job['txt']}")
+    elif source == "xlsx":
+        try:
+            entries = iter_xlsx_catalog(xls_path)
+            first = next(entries, None)
+            if first is not None:
+                print(f"Reading catalog entries from {xls_path}")
+                yield first
+                yield from entries
+                return
+            print(f"{xls_path} has no entries; reading {job['txt']}")
+        except ValueError as e:
+            print(f"Falling back to TXT catalog: {e}")
+    yield from iter_txt_catalog(job["txt"])
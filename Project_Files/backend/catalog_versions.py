@@ -0,0 +1,254 @@
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+from pymongo.errors import OperationFailure
+from pymongo.operations import SearchIndexModel
+from .embedding_versions import LEGACY_VERSIONS, FILTER_PATHS, search_index_template
+
+ALIAS_COLLECTION = "catalog_aliases"
+VERSION_SEP = "__v"
+
+# Images, OCR text and page renders; versioned collections get their own subdirectory
+PROCESSED_DIR = "Data/processed"
+
+# Used when the live collection has no search indexes to copy
+DEFAULT_SEARCH_INDEXES = [search_index_template(v) for v in LEGACY_VERSIONS.values()]
+
+
+def asset_dir(name):
+    """
+    Asset directory written by ingest for collection `name`: Data/processed/<name>
+    for blue/green versions, Data/processed itself for an unversioned collection.
+    """
+    return f"{PROCESSED_DIR}/{name}" if VERSION_SEP in name else PROCESSED_DIR
+
+
+def _field_set(definition):
+    return {(f.get("type"), f.get("path")) for f in definition.get("fields", [])}
+
+
+class CatalogVersions:
+    """
+    Blue/green versions of a catalog collection behind an alias.
+
+    Each rebuild writes to a fresh `<alias>__v<timestamp>` collection and its
+    files to asset_dir(<collection>). The alias document in `catalog_aliases`
+    names the live version and its asset directory; switching is a
+    single-document update, so readers move from one complete version to
+    the next. Without an alias document the unversioned `<alias>` collection
+    and Data/processed are live, which keeps existing deployments working.
+    """
+
+    def __init__(self, db, alias="unified_nodes"):
+        self.db = db
+        self.alias = alias
+        self.aliases = db[ALIAS_COLLECTION]
+
+    # ---------------- Alias ----------------
+
+    def _alias_doc(self):
+        return self.aliases.find_one({"_id": self.alias}) or {}
+
+    def live(self):
+        """
+        (collection, asset directory) currently served.
+        """
+        doc = self._alias_doc()
+        return doc.get("collection", self.alias), doc.get("assets") or PROCESSED_DIR
+
+    def live_name(self):
+        return self.live()[0]
+
+    def building(self):
+        return self._alias_doc().get("building")
+
+    def switch(self, name, assets=None):
+        previous = self.live_name()
+        assets = assets or self.version_assets(name)
+        self.aliases.update_one(
+            {"_id": self.alias},
+            {"$set": {"collection": name, "assets": assets, "previous": previous,
+                      "switched_at": datetime.now(timezone.utc)},
+             "$unset": {"building": ""}},
+            upsert=True,
+        )
+        print(f"Alias '{self.alias}': {previous} -> {name} (assets: {assets})")
+        return previous
+
+    def rollback(self):
+        previous = self._alias_doc().get("previous")
+        if not previous or previous not in self.db.list_collection_names():
+            raise RuntimeError(f"No previous version of '{self.alias}' to roll back to")
+        return self.switch(previous)
+
+    # ---------------- Versions ----------------
+
+    def versions(self):
+        prefix = f"{self.alias}{VERSION_SEP}"
+        return sorted(n for n in self.db.list_collection_names() if n.startswith(prefix))
+
+    def new_version(self):
+        name = f"{self.alias}{VERSION_SEP}{time.strftime('%Y%m%d%H%M%S')}"
+        self.db.create_collection(name)
+        self.aliases.update_one({"_id": self.alias}, {"$set": {"building": name}}, upsert=True)
+        return name
+
+    def version_assets(self, name):
+        """
+        Asset directory the nodes of `name` point at. Nodes restored from a
+        snapshot keep the directory of the build that exported them; nodes
+        without the field predate per-version directories.
+        """
+        node = self.db[name].find_one({"assets": {"$exists": True}}, {"assets": 1})
+        return node["assets"] if node else PROCESSED_DIR
+
+    def discard(self, name):
+        if name == self.live_name():
+            raise RuntimeError(f"Refusing to drop live collection {name}")
+        self.db.drop_collection(name)
+        self.aliases.update_one({"_id": self.alias, "building": name}, {"$unset": {"building": ""}})
+        print(f"Dropped {name}")
+
+        # Its asset directory goes too, unless the live or a remaining version still serves it
+        path = asset_dir(name)
+        in_use = {self.live()[1]} | {self.version_assets(n) for n in self.versions()}
+        if path != PROCESSED_DIR and path not in in_use and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+            print(f"Removed {path}")
+
+    def prune(self, keep=2):
+        """
+        Drops old versions and their asset directories, keeping the live one
+        plus the newest `keep - 1` others (the rollback targets) and any
+        build in progress.
+        """
+        live, building = self.live_name(), self.building()
+        others = [n for n in self.versions() if n not in (live, building)]
+        retained = others[-(keep - 1):] if keep > 1 else []
+        for name in others:
+            if name not in retained:
+                self.discard(name)
+
+    # ---------------- Search indexes ----------------
+
+    @staticmethod
+    def with_filter_paths(template):
+        """
+        Adds any missing FILTER_PATHS to a vector index definition, so
+        indexes copied from an older version gain new pre-filters.
+        """
+        if template.get("type") != "vectorSearch":
+            return template
+        fields = list(template["definition"].get("fields", []))
+        present = {f["path"] for f in fields if f.get("type") == "filter"}
+        fields += [{"type": "filter", "path": p} for p in FILTER_PATHS if p not in present]
+        return {**template, "definition": {**template["definition"], "fields": fields}}
+
+    def index_templates(self):
+        """
+        Search index definitions of the live collection, or the defaults.
+        """
+        try:
+            live = [
+                {"name": ix["name"], "type": ix.get("type", "vectorSearch"), "definition": ix["latestDefinition"]}
+                for ix in self.db[self.live_name()].list_search_indexes()
+            ]
+        except OperationFailure:
+            live = []
+        return [self.with_filter_paths(t) for t in live] or DEFAULT_SEARCH_INDEXES
+
+    def ensure_search_indexes(self, name, templates=None, timeout=900, poll=5):
+        coll = self.db[name]
+        templates = templates or self.index_templates()
+        existing = {ix["name"]: ix for ix in coll.list_search_indexes()}
+        missing = [t for t in templates if t["name"] not in existing]
+        if missing:
+            coll.create_search_indexes([
+                SearchIndexModel(definition=t["definition"], name=t["name"], type=t["type"]) for t in missing
+            ])
+            print(f"Creating search indexes on {name}: {', '.join(t['name'] for t in missing)}")
+
+        # Existing indexes with a different definition are updated; Atlas keeps
+        # serving the old definition until the new one is built.
+        updated = set()
+        for t in templates:
+            current = existing.get(t["name"])
+            if current and _field_set(current.get("latestDefinition", {})) != _field_set(t["definition"]):
+                coll.update_search_index(t["name"], t["definition"])
+                updated.add(t["name"])
+        if updated:
+            print(f"Updating search indexes on {name}: {', '.join(sorted(updated))}")
+
+        wanted = {t["name"] for t in templates}
+        deadline = time.time() + timeout
+        while True:
+            status = {ix["name"]: ix for ix in coll.list_search_indexes() if ix["name"] in wanted}
+            pending = [n for n in wanted if not status.get(n, {}).get("queryable")
+                       or (n in updated and status[n].get("status") != "READY")]
+            if not pending:
+                return
+            failed = [n for n in pending if status.get(n, {}).get("status") == "FAILED"]
+            if failed:
+                raise RuntimeError(f"Search index build failed on {name}: {', '.join(failed)}")
+            if time.time() > deadline:
+                raise TimeoutError(f"Search indexes not ready on {name} after {timeout}s: {', '.join(pending)}")
+            time.sleep(poll)
+
+    # ---------------- Validation ----------------
+
+    def recall_probe(self, name, sample=20, k=10, index="vector_index", path="embedding"):
+        """
+        Fraction of sampled documents found in the top `k` results of a
+        vector search for their own embedding.
+        """
+        coll = self.db[name]
+        probes = list(coll.aggregate([
+            {"$match": {path: {"$exists": True}}},
+            {"$sample": {"size": sample}},
+            {"$project": {"_id": 1, path: 1}},
+        ]))
+        if not probes:
+            return 0.0
+        hits = 0
+        for doc in probes:
+            results = coll.aggregate([
+                {"$vectorSearch": {"index": index, "path": path, "queryVector": doc[path],
+                                   "numCandidates": max(100, k * 10), "limit": k}},
+                {"$project": {"_id": 1}},
+            ])
+            hits += any(r["_id"] == doc["_id"] for r in results)
+        return hits / len(probes)
+
+    def validate(self, name, expected, min_ratio=0.98, max_shrink=0.9, min_recall=0.9,
+                 probe_size=20, timeout=300, poll=10, index="vector_index", path="embedding"):
+        """
+        Checks a built version before it goes live: document count against
+        the parsed catalog and the live version, then a recall probe on
+        `index`/`path` (pass the served text version's). The probe is
+        retried until `timeout` because a new index can still be catching
+        up with the collection right after it turns queryable.
+        """
+        count = self.db[name].count_documents({})
+        live = self.live_name()
+        live_count = self.db[live].count_documents({}) if live != name else 0
+        report = {"collection": name, "count": count, "expected": expected, "live_count": live_count, "recall": None}
+
+        problems = []
+        if count == 0 or count < expected * min_ratio:
+            problems.append(f"{count} documents, expected about {expected}")
+        if live_count and count < live_count * max_shrink:
+            problems.append(f"{count} documents vs {live_count} live")
+        if problems:
+            report["problems"] = problems
+            return False, report
+
+        deadline = time.time() + timeout
+        while True:
+            report["recall"] = self.recall_probe(name, sample=probe_size, index=index, path=path)
+            if report["recall"] >= min_recall:
+                return True, report
+            if time.time() > deadline:
+                report["problems"] = [f"recall {report['recall']:.2f} below {min_recall}"]
+                return False, report
+            time.sleep(poll)
@@ -1,19 +1,79 @@
+import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from langchain_groq import ChatGroq
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.output_parsers import StrOutputParser
-from .database import DatabaseHandler
+from .database import DatabaseHandler, keyword_query
 from .rag_tools import RAGTools
+from .embedding_versions import TEXT_EMBEDDING_VERSION, CLIP_EMBEDDING_VERSION, get_version
+from .image_derivatives import derivative_name
+from .page_previews import catalog_slug
+from .product_index import ProductIndex, format_answer
+from .attributes import extract_constraints, describe_constraints
+from .neighbor_graph import SimilarImageIndex, image_id, NEIGHBOR_K
+from .image_query import ImageEmbeddingCache, decode_upload, dhash
+from .telemetry import get_logger, log_event, span, STAGE_RESULTS, FALLBACKS, ANSWER_SOURCES
+
+logger = get_logger("remodel.chat_engine")
+
+# Serve search from an exported snapshot directory instead of Atlas
+CATALOG_SNAPSHOT = os.getenv("CATALOG_SNAPSHOT")
+
+# Answer price/warranty/... questions about named products straight from the catalog fields
+EXTRACTIVE_ANSWERS = os.getenv("EXTRACTIVE_ANSWERS", "true").lower() == "true"
+PRODUCT_INDEX_TTL = float(os.getenv("PRODUCT_INDEX_TTL", "300"))
+
+# Questions of one ask_many batch answered concurrently (retrieval + Groq calls)
+ASK_BATCH_CONCURRENCY = int(os.getenv("ASK_BATCH_CONCURRENCY", "8"))
+
+# Answer text when the LLM call fails; such results carry "generation_failed" and must not be cached
+GENERATION_ERROR_ANSWER = "I'm sorry, I'm having trouble with my architectural brain right now."
+
+KITCHEN_SYNONYMS = ["kitchen", "cooking", "pantry", "hob", "cabinet", "dining", "sink"]
+BEDROOM_SYNONYMS = ["bedroom", "bed", "sleep", "wardrobe", "queen", "king", "mattress", "dresser"]
+
+
+def normalize_question(question: str) -> str:
+    # Key for de-duplicating batch questions: case, spacing and end punctuation ignored
+    return " ".join(question.lower().split()).rstrip("?!. ")
+
+
+def detect_category(question: str):
+    q_lower = question.lower()
+    if any(s in q_lower for s in KITCHEN_SYNONYMS):
+        return "kitchen"
+    if any(s in q_lower for s in BEDROOM_SYNONYMS):
+        return "bedroom"
+    return None
 
 class ChatEngine:
-    def __init__(self):
-        self.llm = ChatGroq(
+    def __init__(self, llm=None, db=None, rag_tools=None):
+        # Dependencies can be injected (benchmarks, load tests); defaults hit Groq/Atlas
+        self.llm = llm or ChatGroq(
             temperature=0,
             model_name="llama-3.1-8b-instant",
             api_key=os.getenv("GROQ_API_KEY")
         )
-        self.db = DatabaseHandler()
-        self.rag_tools = RAGTools()
+        self.db = db or (self._snapshot_handler() if CATALOG_SNAPSHOT else DatabaseHandler())
+        # Queries are encoded with the models of the embedding versions the handler searches
+        text_version = getattr(self.db, "text_version", TEXT_EMBEDDING_VERSION)
+        clip_version = getattr(self.db, "clip_version", CLIP_EMBEDDING_VERSION)
+        self.rag_tools = rag_tools or RAGTools(text_model=get_version(text_version, "text")["model"],
+                                               clip_model=get_version(clip_version, "clip")["model"])
+        self.clip_field = getattr(self.db, "clip_field", "clip_embedding")
+        self.product_index = (
+            ProductIndex(lambda: self.db.unified_collection, ttl=PRODUCT_INDEX_TTL) if EXTRACTIVE_ANSWERS else None
+        )
+        # "More like this" from the neighbor graph stored at ingest
+        self.similar_images = SimilarImageIndex(lambda: self.db.unified_collection, ttl=PRODUCT_INDEX_TTL)
+        # Uploaded-photo embeddings by perceptual hash
+        self.image_cache = ImageEmbeddingCache()
+
+        # Optional callable(stage_name, seconds) invoked after each stage of ask()
+        self.stage_observer = None
         
         self.system_prompt = (
             "You are an expert interior design consultant. "
@@ -29,8 +89,244 @@ class ChatEngine:
         
         self.chain = self.prompt | self.llm | StrOutputParser()
 
+        self.rewrite_prompt = ChatPromptTemplate.from_messages([
+            ("system", "Given the chat history, rewrite the new question to be standalone and searchable. Just return the rewritten question."),
+            MessagesPlaceholder("history"),
+            ("human", "New question: {question}"),
+        ])
+
+        self.rewrite_chain = self.rewrite_prompt | self.llm | StrOutputParser()
+
+    @staticmethod
+    def _snapshot_handler():
+        from .snapshot import SnapshotDatabaseHandler
+        models = {"text": get_version(TEXT_EMBEDDING_VERSION)["model"], "clip": get_version(CLIP_EMBEDDING_VERSION)["model"]}
+        return SnapshotDatabaseHandler(CATALOG_SNAPSHOT, expected_models=models)
+
+    def rewrite_question(self, question: str, history=None):
+        """
+        Makes a follow-up question standalone using the session history.
+        `history` is a list of {"role": "user" | "assistant", "content": str}.
+        """
+        if not history:
+            return question
+        messages = [
+            ("human" if m["role"] == "user" else "ai", m["content"])
+            for m in history
+        ]
+        try:
+            rewritten = self.rewrite_chain.invoke({"history": messages, "question": question}).strip()
+        except Exception as e:
+            log_event(logger, logging.WARNING, "question rewrite failed", error=str(e))
+            return question
+        return rewritten or question
+
+    @contextmanager
+    def _stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            with span(name, logger):
+                yield
+        finally:
+            if self.stage_observer is not None:
+                self.stage_observer(name, time.perf_counter() - start)
+
+    def chat(self, question: str, history=None):
+        """
+        Conversational turn: rewrite -> retrieve -> generate.
+        """
+        search_question = self.rewrite_question(question, history)
+        result = self.ask(search_question)
+        result["search_question"] = search_question
+        return result
+
+    def _extractive_answer(self, question: str):
+        """
+        Template answer from the product index, or None to run the full pipeline.
+        """
+        try:
+            with self._stage("extractive"):
+                hit = self.product_index.lookup(question)
+                answer = format_answer(hit[0], hit[1]) if hit else None
+        except Exception as e:
+            log_event(logger, logging.WARNING, "extractive lookup failed", error=str(e))
+            return None
+        if answer is None:
+            return None
+
+        fields, nodes, how = hit
+        images = []
+        for node in nodes[:3]:
+            for img_obj in node["related_images"]:
+                if img_obj.get("path") and len(images) < 4:
+                    images.append(self._image_entry(img_obj, node, 1.0))
+        ANSWER_SOURCES.inc(source="catalog")
+        log_event(logger, logging.INFO, "extractive answer", match=how, fields=fields, products=len(nodes))
+        return {"answer": answer, "images": images}
+
     def ask(self, question: str):
+        return self._ask(question)
+
+    def similar(self, image: str, limit: int = NEIGHBOR_K):
+        """
+        Precomputed nearest catalog images of `image` (an image_id), or None
+        if it is unknown. No encoder, vector search or LLM call.
+        """
+        neighbors = self.similar_images.neighbors(image, limit)
+        if neighbors is None:
+            return None
+        return {
+            "image_id": image,
+            "images": [self._image_entry(n["image"], n["node"], score) for n, score in neighbors],
+        }
+
+    def ask_image(self, data: bytes, question: str = None, category: str = None):
+        """
+        Catalog images that look like an uploaded photo, plus an answer when
+        a question comes with it. The CLIP embedding is cached by perceptual
+        hash, so a re-upload (or a resized/recompressed copy) skips the
+        encoder. Raises ImageRejected for unusable uploads and DecoderBusy
+        when every decode worker is taken.
+        """
+        import numpy as np
+
+        with self._stage("image_decode"):
+            img = decode_upload(data)
+        phash = dhash(img)
+        embedding = self.image_cache.get(phash)
+        if embedding is None:
+            with self._stage("image_embedding"):
+                embedding = self.rag_tools.get_clip_image_embedding(img)
+            self.image_cache.put(phash, embedding)
+
+        category = category or (detect_category(question) if question else None)
+        constraints = self._extract_constraints(question) if question else {}
+        with self._stage("strict_visual_search"):
+            docs = self.db.strict_visual_search(embedding, category, limit=16, constraints=constraints)
+        STAGE_RESULTS.inc(len(docs), stage="strict_visual_search")
+
+        q_vec = np.array(embedding)
+        q_norm = np.linalg.norm(q_vec)
+        images, seen_paths = [], set()
+        for doc in docs:
+            for img_obj in doc.get("related_images", []):
+                img_cat = img_obj.get("category_source")
+                if category and img_cat and img_cat != category:
+                    continue
+                img_emb, path = img_obj.get(self.clip_field), img_obj.get("path")
+                if img_emb and path and path not in seen_paths:
+                    i_vec = np.array(img_emb)
+                    score = np.dot(q_vec, i_vec) / (q_norm * np.linalg.norm(i_vec) + 1e-8)
+                    images.append(self._image_entry(img_obj, doc, score))
+                    seen_paths.add(path)
+        images.sort(key=lambda x: x["score"], reverse=True)
+        response = {"images": images[:12], "answer": None}
+
+        if question:
+            # The matched products are the context, as for a text question
+            context = "\n\n".join(d.get("combined_text", "") for d in docs[:10]) or "No specific catalog items found."
+            try:
+                with self._stage("generation"):
+                    response["answer"] = self.chain.invoke({
+                        "context": context,
+                        "question": f"{question}\n(The user attached a photo; the context lists the catalog items that look most like it.)",
+                    })
+                ANSWER_SOURCES.inc(source="llm")
+            except Exception as e:
+                log_event(logger, logging.ERROR, "generation failed", error=str(e))
+                response["answer"] = GENERATION_ERROR_ANSWER
+                response["generation_failed"] = True
+        return response
+
+    def ask_many(self, questions, max_concurrency=ASK_BATCH_CONCURRENCY):
+        """
+        Answers a batch of questions, yielding (index, result) as each one
+        completes. Questions equal after normalize_question are answered
+        once. Both encoders run batched over the whole batch; retrieval runs
+        as one multi-query pass when the handler has one (snapshots), else
+        on up to `max_concurrency` threads together with generation.
+        A failed question yields {"error": ...} instead of a result.
+        """
+        groups = {}
+        for i, question in enumerate(questions):
+            groups.setdefault(normalize_question(question), []).append(i)
+        log_event(logger, logging.INFO, "ask batch", questions=len(questions), unique=len(groups))
+
+        pending = []
+        for indexes in groups.values():
+            question = questions[indexes[0]]
+            extractive = self._extractive_answer(question) if self.product_index is not None else None
+            if extractive is None:
+                pending.append((question, indexes))
+                continue
+            for i in indexes:
+                yield i, extractive
+        if not pending:
+            return
+
+        texts = [q for q, _ in pending]
+        try:
+            with self._stage("batch_encoders"):
+                text_embs = self.rag_tools.get_embeddings_batch(texts)
+                clip_embs = self.rag_tools.get_clip_text_embeddings([self._refine_query_for_clip(q) for q in texts])
+            encoded = list(zip(text_embs, clip_embs))
+            prefetched = self._prefetch_many(texts, text_embs, clip_embs)
+        except Exception as e:
+            # Each question then encodes on its own, and a failure becomes that question's error line
+            FALLBACKS.inc(fallback="batch_encoders")
+            log_event(logger, logging.WARNING, "batch encoding failed", error=str(e))
+            encoded = prefetched = [None] * len(pending)
+
+        pool = ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix="ask-batch")
+        try:
+            futures = {
+                pool.submit(self._ask_one, q, enc, p): indexes
+                for (q, indexes), enc, p in zip(pending, encoded, prefetched)
+            }
+            for future in as_completed(futures):
+                result = future.result()
+                for i in futures[future]:
+                    yield i, result
+        finally:
+            # A closed stream (client gone) drops the questions not started yet
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _ask_one(self, question, encoded, prefetched):
+        try:
+            return self._ask(question, encoded=encoded, prefetched=prefetched, extractive=False)
+        except Exception as e:
+            log_event(logger, logging.ERROR, "batch question failed", error=str(e))
+            return {"error": str(e)}
+
+    def _prefetch_many(self, questions, text_embs, clip_embs):
+        """
+        Retrieval for a whole batch in one pass on in-process indexes;
+        [None, ...] when the handler only searches one query at a time.
+        """
+        if not hasattr(self.db, "unified_search_many"):
+            return [None] * len(questions)
+        plans = [(detect_category(q), self._extract_constraints(q)) for q in questions]
+        try:
+            with self._stage("batch_search"):
+                unified = self.db.unified_search_many(text_embs, limit=10, plans=plans)
+                visual = self.db.strict_visual_search_many(clip_embs, limit=16, plans=plans)
+        except Exception as e:
+            log_event(logger, logging.WARNING, "batch search failed", error=str(e))
+            return [None] * len(questions)
+        return [{"unified": u, "visual": v} for u, v in zip(unified, visual)]
+
+    def _ask(self, question: str, encoded=None, prefetched=None, extractive=True):
+        """
+        ask() body. `encoded` is a precomputed (text, CLIP) query embedding
+        pair and `prefetched` precomputed search results, from ask_many.
+        """
         import numpy as np
+
+        # Structured field questions about named products skip search and the LLM
+        if extractive and self.product_index is not None:
+            extractive_result = self._extractive_answer(question)
+            if extractive_result is not None:
+                return extractive_result
         
         # 0. Relevance Guardrail
         q_lower = question.lower()
@@ -46,7 +342,9 @@ class ChatEngine:
                 f"Query: '{question}'\n"
                 f"Answer exactly 'YES' or 'NO'."
             )
-            relevance_check = self.llm.invoke(check_prompt).content.strip().upper()
+            FALLBACKS.inc(fallback="guardrail_llm")
+            with self._stage("guardrail"):
+                relevance_check = self.llm.invoke(check_prompt).content.strip().upper()
             if "NO" in relevance_check:
                 return {
                     "answer": "We provide only the remodel designs of kitchen and bedroom. Please share your vision for your kitchen or bedroom!",
@@ -54,15 +352,10 @@ class ChatEngine:
                 }
 
         # 1. Broadened Category Detection
-        category = None
-        
-        kitchen_synonyms = ["kitchen", "cooking", "pantry", "hob", "cabinet", "dining", "sink"]
-        bedroom_synonyms = ["bedroom", "bed", "sleep", "wardrobe", "queen", "king", "mattress", "dresser"]
-        
-        if any(s in q_lower for s in kitchen_synonyms): 
-            category = "kitchen"
-        elif any(s in q_lower for s in bedroom_synonyms): 
-            category = "bedroom"
+        category = detect_category(question)
+
+        # Price/size/material/color constraints, applied as vector search pre-filters
+        constraints = self._extract_constraints(question)
 
         # Keywords for regex fallback
         stop_words = {"show", "me", "find", "some", "the", "a", "an", "with", "for", "modern", "design", "designs", "ideas", "of", "in", "is", "where", "can", "i", "get"}
@@ -70,15 +363,20 @@ class ChatEngine:
         keywords = [w for w in words if w not in stop_words and len(w) > 2]
         
         # Remove category names from specific keywords for broad matching
-        all_cat_synonyms = kitchen_synonyms + bedroom_synonyms
+        all_cat_synonyms = KITCHEN_SYNONYMS + BEDROOM_SYNONYMS
         specific_keywords = [kw for kw in keywords if kw not in all_cat_synonyms]
         if not specific_keywords: specific_keywords = keywords
             
         # 2. Get embeddings (Text & CLIP)
-        query_emb = self.rag_tools.get_embeddings(question)
-        
-        refined_query = self._refine_query_for_clip(question)
-        clip_query_emb = self.rag_tools.get_clip_text_embedding(refined_query)
+        if encoded is not None:
+            query_emb, clip_query_emb = encoded
+        else:
+            with self._stage("text_encoder"):
+                query_emb = self.rag_tools.get_embeddings(question)
+
+            refined_query = self._refine_query_for_clip(question)
+            with self._stage("clip_encoder"):
+                clip_query_emb = self.rag_tools.get_clip_text_embedding(refined_query)
         q_vec = np.array(clip_query_emb)
         
         # 3. UNIFIED SEARCH
@@ -88,121 +386,151 @@ class ChatEngine:
         
         u_filter = {"category": category} if category else None
 
+        # Both vector legs and the fallbacks in one round trip, when the handler can
+        if prefetched is None and hasattr(self.db, "multi_search"):
+            try:
+                with self._stage("multi_search"):
+                    legs = self.db.multi_search(query_emb, clip_query_emb, category=category, constraints=constraints,
+                                                text_limit=10, visual_limit=16, keywords=specific_keywords)
+                prefetched = {"unified": legs["text"], "visual": legs["visual"],
+                              "regex": legs["regex"], "featured": legs["featured"]}
+            except Exception as e:
+                log_event(logger, logging.WARNING, "multi search failed", error=str(e))
+
         # SEARCH 1: Vector text search for context
         try:
-            unified_results = self.db.unified_search(query_emb, limit=10, filter_dict=u_filter)
-            print(f"DEBUG: Vector text search found {len(unified_results)} results")
+            if prefetched is not None:
+                unified_results = prefetched["unified"]
+            else:
+                with self._stage("unified_search"):
+                    unified_results = self.db.unified_search(query_emb, limit=10, filter_dict=u_filter,
+                                                             constraints=constraints)
+            STAGE_RESULTS.inc(len(unified_results), stage="unified_search")
         except Exception as e:
-            print(f"DEBUG: Vector search failed: {e}")
+            log_event(logger, logging.WARNING, "vector search failed", error=str(e))
+
+        # Nothing satisfies the constraints: the fallbacks below are unconstrained, so tell the LLM
+        constraint_note = None
+        if constraints and not unified_results:
+            FALLBACKS.inc(fallback="constraints_unmet")
+            constraint_note = (f"Note: no catalog items match the requested {describe_constraints(constraints)}. "
+                               "The items below are the closest alternatives; say so in the answer.")
 
         # SEARCH 2: CLIP-based for Visuals
         try:
-            visual_results = self.db.strict_visual_search(clip_query_emb, category, limit=16)
-            print(f"DEBUG: Strict visual search found {len(visual_results)} results for category: {category}")
-            for doc in visual_results:
-                for img_obj in doc.get("related_images", []):
-                    # Hard Category Enforcement
-                    img_cat = img_obj.get("category_source")
-                    if category and img_cat and img_cat != category:
-                        continue
+            if prefetched is not None:
+                visual_results = prefetched["visual"]
+            else:
+                with self._stage("strict_visual_search"):
+                    visual_results = self.db.strict_visual_search(clip_query_emb, category, limit=16,
+                                                                  constraints=constraints)
+            STAGE_RESULTS.inc(len(visual_results), stage="strict_visual_search")
+            with self._stage("image_scoring"):
+                for doc in visual_results:
+                    for img_obj in doc.get("related_images", []):
+                        # Hard Category Enforcement
+                        img_cat = img_obj.get("category_source")
+                        if category and img_cat and img_cat != category:
+                            continue
 
-                    img_emb = img_obj.get("clip_embedding")
-                    path = img_obj.get("path")
-                    if img_emb and path and path not in seen_paths:
-                        # Re-calculate score for precision
-                        i_vec = np.array(img_emb)
-                        score = np.dot(q_vec, i_vec) / (np.linalg.norm(q_vec) * np.linalg.norm(i_vec) + 1e-8)
-                        
-                        if score > 0.25: # Higher Accuracy Threshold
-                            full_pdf_path = img_obj.get("pdf_path", "").replace("\\", "/")
-                            # Clean the path to work with the /data mount
-                            clean_pdf_path = full_pdf_path.replace("Data/", "").replace("Data\\", "")
-                            pg = img_obj.get("page_source")
-                            pdf_url = f"http://localhost:8000/data/{clean_pdf_path}#page={pg}" if clean_pdf_path else None
+                        img_emb = img_obj.get(self.clip_field)
+                        path = img_obj.get("path")
+                        if img_emb and path and path not in seen_paths:
+                            # Re-calculate score for precision
+                            i_vec = np.array(img_emb)
+                            score = np.dot(q_vec, i_vec) / (np.linalg.norm(q_vec) * np.linalg.norm(i_vec) + 1e-8)
                             
-                            candidate_images.append({
-                                "image_path": self._format_image_path(path),
-                                "ocr_text": img_obj.get("ocr_text", ""),
-                                "score": float(score),
-                                "page": pg,
-                                "pdf": img_cat or doc.get("category"),
-                                "pdf_url": pdf_url
-                            })
-                            seen_paths.add(path)
+                            if score > 0.25: # Higher Accuracy Threshold
+                                candidate_images.append(self._image_entry(img_obj, doc, score))
+                                seen_paths.add(path)
+            STAGE_RESULTS.inc(len(candidate_images), stage="image_scoring")
         except Exception as e:
-            print(f"DEBUG: CLIP visual search failed: {e}")
+            log_event(logger, logging.WARNING, "CLIP visual search failed", error=str(e))
 
         # REGEX FALLBACK (If Vector yields nothing)
         if not unified_results and specific_keywords:
-            print(f"DEBUG: Falling back to REGEX search for: {specific_keywords}")
-            regex_queries = [{"combined_text": {"$regex": kw, "$options": "i"}} for kw in specific_keywords]
-            regex_query = {"$or": regex_queries}
-            if category: regex_query = {"$and": [regex_query, {"category": category}]}
-                
+            FALLBACKS.inc(fallback="regex")
+            log_event(logger, logging.INFO, "regex fallback", keywords=specific_keywords)
+            regex_query = keyword_query(specific_keywords, category)
+
             try:
-                unified_results = list(self.db.unified_collection.find(regex_query).limit(10))
+                if prefetched is not None and "regex" in prefetched:
+                    unified_results = prefetched["regex"]
+                else:
+                    with self._stage("regex_fallback"):
+                        unified_results = list(self.db.unified_collection.find(regex_query).limit(10))
+                STAGE_RESULTS.inc(len(unified_results), stage="regex_fallback")
             except Exception as e:
-                print(f"DEBUG: Regex fallback failed: {e}")
+                log_event(logger, logging.WARNING, "regex fallback failed", error=str(e))
 
         # 4. Final Fallback: Featured samples
         if not unified_results:
+            FALLBACKS.inc(fallback="featured")
             try: 
                 fallback_filter = {"category": category} if category else {}
-                unified_results = list(self.db.unified_collection.find(fallback_filter).limit(4))
+                if prefetched is not None and "featured" in prefetched:
+                    unified_results = prefetched["featured"]
+                else:
+                    with self._stage("featured_fallback"):
+                        unified_results = list(self.db.unified_collection.find(fallback_filter).limit(4))
             except: pass
 
         # 5. Extract Context and Additional Images
-        context_parts = []
-        for doc in unified_results:
-            context_parts.append(doc.get("combined_text", ""))
+        with self._stage("context_build"):
+            context_parts = []
+            for doc in unified_results:
+                context_parts.append(doc.get("combined_text", ""))
             
-            # Pick best images from text matches
-            for img_obj in doc.get("related_images", []):
-                # Hard Category Enforcement
-                img_cat = img_obj.get("category_source")
-                if category and img_cat and img_cat != category:
-                    continue
+                # Pick best images from text matches
+                for img_obj in doc.get("related_images", []):
+                    # Hard Category Enforcement
+                    img_cat = img_obj.get("category_source")
+                    if category and img_cat and img_cat != category:
+                        continue
 
-                path = img_obj.get("path")
-                if path and path not in seen_paths:
-                    img_emb = img_obj.get("clip_embedding")
-                    score = 0.22 # Default score for text match if no embedding
-                    if img_emb:
-                        i_vec = np.array(img_emb)
-                        score = np.dot(q_vec, i_vec) / (np.linalg.norm(q_vec) * np.linalg.norm(i_vec) + 1e-8)
+                    path = img_obj.get("path")
+                    if path and path not in seen_paths:
+                        img_emb = img_obj.get(self.clip_field)
+                        score = 0.22 # Default score for text match if no embedding
+                        if img_emb:
+                            i_vec = np.array(img_emb)
+                            score = np.dot(q_vec, i_vec) / (np.linalg.norm(q_vec) * np.linalg.norm(i_vec) + 1e-8)
                     
-                    if score > 0.22: # Higher threshold for linked images
-                        full_pdf_path = img_obj.get("pdf_path", "").replace("\\", "/")
-                        clean_pdf_path = full_pdf_path.replace("Data/", "").replace("Data\\", "")
-                        pg = img_obj.get("page_source")
-                        pdf_url = f"http://localhost:8000/data/{clean_pdf_path}#page={pg}" if clean_pdf_path else None
-
-                        candidate_images.append({
-                            "image_path": self._format_image_path(path),
-                            "ocr_text": img_obj.get("ocr_text", ""),
-                            "score": float(score),
-                            "page": pg,
-                            "pdf": img_cat or doc.get("category"),
-                            "pdf_url": pdf_url
-                        })
-                        seen_paths.add(path)
-
-        context = "\n\n".join(context_parts) if context_parts else "No specific catalog items found."
+                        if score > 0.22: # Higher threshold for linked images
+                            candidate_images.append(self._image_entry(img_obj, doc, score))
+                            seen_paths.add(path)
+
+            context = "\n\n".join(context_parts) if context_parts else "No specific catalog items found."
+            if constraint_note:
+                context = f"{constraint_note}\n\n{context}"
         
-        # 6. Sort and Filter candidate images by score
-        candidate_images.sort(key=lambda x: x["score"], reverse=True)
-        final_images = candidate_images[:12]
+            # 6. Sort and Filter candidate images by score
+            candidate_images.sort(key=lambda x: x["score"], reverse=True)
+            final_images = candidate_images[:12]
+        STAGE_RESULTS.inc(len(final_images), stage="final_images")
 
         # 7. Generate Answer
+        response = {"images": final_images}
         try:
-            answer = self.chain.invoke({"context": context, "question": question})
+            with self._stage("generation"):
+                response["answer"] = self.chain.invoke({"context": context, "question": question})
+            ANSWER_SOURCES.inc(source="llm")
         except Exception as e:
-            answer = "I'm sorry, I'm having trouble with my architectural brain right now."
+            log_event(logger, logging.ERROR, "generation failed", error=str(e))
+            response["answer"] = GENERATION_ERROR_ANSWER
+            response["generation_failed"] = True
 
-        return {
-            "answer": answer,
-            "images": final_images
-        }
+        return response
+
+    def _extract_constraints(self, question: str):
+        try:
+            constraints = extract_constraints(question)
+        except Exception as e:
+            log_event(logger, logging.WARNING, "constraint extraction failed", error=str(e))
+            return {}
+        if constraints:
+            log_event(logger, logging.INFO, "query constraints", constraints=describe_constraints(constraints))
+        return constraints
 
     def _refine_query_for_clip(self, query: str) -> str:
         q = query.lower()
@@ -210,6 +538,38 @@ class ChatEngine:
             return f"An interior design photo of {query}"
         return query
 
+    def _image_entry(self, img_obj, doc, score):
+        full_pdf_path = img_obj.get("pdf_path", "").replace("\\", "/")
+        # Clean the path to work with the /data mount
+        clean_pdf_path = full_pdf_path.replace("Data/", "").replace("Data\\", "")
+        pg = img_obj.get("page_source")
+        full_pdf_url = f"http://localhost:8000/data/{clean_pdf_path}#page={pg}" if clean_pdf_path else None
+
+        # Single-page PDF and raster preview instead of the whole catalog
+        page_base = f"http://localhost:8000/pages/{catalog_slug(clean_pdf_path)}/{pg}" if clean_pdf_path and pg else None
+        pdf_url = f"{page_base}.pdf" if page_base else full_pdf_url
+        page_preview_url = f"{page_base}.webp" if page_base else None
+
+        path = img_obj.get("path")
+        original_path = self._format_image_path(path)
+        # Content hash in the URL lets /images serve derivatives as immutable
+        version = (img_obj.get("content_hash") or "")[:12]
+        suffix = f"?v={version}" if version else ""
+
+        return {
+            "image_id": image_id(path),
+            "image_path": f"images/{derivative_name(path, 'medium')}{suffix}",
+            "thumb_path": f"images/{derivative_name(path, 'thumb')}{suffix}",
+            "original_path": original_path,
+            "ocr_text": img_obj.get("ocr_text", ""),
+            "score": float(score),
+            "page": pg,
+            "pdf": img_obj.get("category_source") or doc.get("category"),
+            "pdf_url": pdf_url,
+            "page_preview_url": page_preview_url,
+            "full_pdf_url": full_pdf_url
+        }
+
     def _format_image_path(self, path: str):
         clean_path = path.replace("\\", "/")
         if "images/" in clean_path:
@@ -0,0 +1,136 @@
+import json
+import os
+import shutil
+import threading
+
+STATE_DIR = "Data/ingest_state"
+
+
+def _atomic_write_json(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    # A kill mid-write leaves the previous checkpoint intact
+    os.replace(tmp_path, path)
+
+
+class CheckpointStore:
+    """
+    Per-page ingestion checkpoints under `state_dir/<job>/page_<n>.json`.
+
+    A page file records completed OCR text and CLIP vectors (keyed by image
+    path), the node ids the page produces and the ids already acknowledged
+    by Mongo. A page is complete once every node id has been written. Pages
+    in flight are kept in memory and dropped once complete. `target.json`
+    names the collection the checkpoints were written to.
+    """
+
+    def __init__(self, state_dir=STATE_DIR):
+        self.state_dir = state_dir
+        self._pages = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.state_dir, exist_ok=True)
+
+    def reset(self):
+        with self._lock:
+            self._pages.clear()
+            shutil.rmtree(self.state_dir, ignore_errors=True)
+            os.makedirs(self.state_dir, exist_ok=True)
+
+    def _target_path(self):
+        return os.path.join(self.state_dir, "target.json")
+
+    def bind_target(self, name):
+        """
+        Ties the checkpoints to collection `name`. Checkpoints written for
+        another collection are discarded, since their pages never reached
+        this one. Returns True when existing checkpoints were kept.
+        """
+        with self._lock:
+            current = None
+            if os.path.exists(self._target_path()):
+                with open(self._target_path(), encoding="utf-8") as f:
+                    current = json.load(f).get("target")
+        if current == name:
+            return True
+        if current is not None or os.listdir(self.state_dir):
+            print(f"Checkpoints in {self.state_dir} belong to {current or 'an unknown collection'}, "
+                  f"not {name}; starting over")
+        self.reset()
+        _atomic_write_json(self._target_path(), {"target": name})
+        return False
+
+    # ---------------- Jobs ----------------
+
+    def _job_dir(self, job):
+        path = os.path.join(self.state_dir, job)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def job_complete(self, job):
+        return os.path.exists(os.path.join(self._job_dir(job), "complete.json"))
+
+    def mark_job_complete(self, job, summary=None):
+        _atomic_write_json(os.path.join(self._job_dir(job), "complete.json"), summary or {})
+
+    # ---------------- Pages ----------------
+
+    def _page_path(self, job, page_no):
+        return os.path.join(self._job_dir(job), f"page_{page_no}.json")
+
+    def _state(self, job, page_no):
+        key = (job, page_no)
+        state = self._pages.get(key)
+        if state is None:
+            path = self._page_path(job, page_no)
+            state = {"ocr": None, "clip": None, "nodes": None, "written": [], "complete": False}
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    state.update(json.load(f))
+            self._pages[key] = state
+        return state
+
+    def _save(self, job, page_no, state):
+        _atomic_write_json(self._page_path(job, page_no), state)
+        if state["complete"]:
+            self._pages.pop((job, page_no), None)
+
+    def load_page(self, job, page_no):
+        with self._lock:
+            return dict(self._state(job, page_no))
+
+    def page_complete(self, job, page_no):
+        with self._lock:
+            complete = self._state(job, page_no)["complete"]
+            if complete:
+                self._pages.pop((job, page_no), None)
+            return complete
+
+    def save_ocr(self, job, page_no, ocr_by_path):
+        with self._lock:
+            state = self._state(job, page_no)
+            state["ocr"] = ocr_by_path
+            self._save(job, page_no, state)
+
+    def save_clip(self, job, page_no, clip_by_path):
+        with self._lock:
+            state = self._state(job, page_no)
+            state["clip"] = clip_by_path
+            self._save(job, page_no, state)
+
+    def save_nodes(self, job, page_no, node_ids):
+        with self._lock:
+            state = self._state(job, page_no)
+            state["nodes"] = list(node_ids)
+            state["complete"] = set(state["nodes"]) <= set(state["written"])
+            self._save(job, page_no, state)
+
+    def mark_written(self, job, page_no, node_ids):
+        with self._lock:
+            state = self._state(job, page_no)
+            state["written"] = sorted(set(state["written"]) | set(node_ids))
+            if state["nodes"] is not None:
+                state["complete"] = set(state["nodes"]) <= set(state["written"])
+            self._save(job, page_no, state)
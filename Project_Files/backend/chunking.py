@@ -0,0 +1,142 @@
+import re
+from collections import deque
+from itertools import islice
+
+BLOCK_SIZE = 1 << 16
+# Text with no sentence boundary for this long is cut at whitespace
+MAX_SENTENCE_CHARS = 4000
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+
+
+def iter_text_blocks(source, block_size=BLOCK_SIZE):
+    """
+    Text from a string, a file object or any iterable of strings, in blocks.
+    """
+    if isinstance(source, str):
+        for i in range(0, len(source), block_size):
+            yield source[i:i + block_size]
+    elif hasattr(source, "read"):
+        while True:
+            block = source.read(block_size)
+            if not block:
+                return
+            yield block
+    else:
+        yield from source
+
+
+def iter_sentences(blocks, max_chars=MAX_SENTENCE_CHARS):
+    """
+    Splits streamed text on sentence ends and blank lines. Only the
+    unfinished sentence is held between blocks.
+    """
+    buf = ""
+    for block in blocks:
+        buf += block
+        start = 0
+        for m in _SENTENCE_END.finditer(buf):
+            # A boundary at the very end may continue into the next block
+            if m.end() == len(buf):
+                break
+            sentence = buf[start:m.start()].strip()
+            if sentence:
+                yield sentence
+            start = m.end()
+        buf = buf[start:]
+
+        while len(buf) > max_chars:
+            cut = buf.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            yield buf[:cut].strip()
+            buf = buf[cut:].lstrip()
+
+    if buf.strip():
+        yield buf.strip()
+
+
+class TokenChunker:
+    """
+    Packs whole sentences into chunks of at most `max_tokens` tokens as
+    counted by `tokenizer` (a Hugging Face tokenizer), carrying up to
+    `overlap` tokens of trailing sentences into the next chunk. Sentences
+    longer than a chunk are split at word boundaries, and words longer than
+    a chunk at token boundaries. Sentences are
+    tokenized in batches and memory stays bounded by one chunk plus one
+    text block, whatever the document size.
+    """
+
+    def __init__(self, tokenizer, max_tokens=254, overlap=32, batch_sentences=256):
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.overlap = min(overlap, max_tokens // 2)
+        self.batch_sentences = batch_sentences
+
+    def count_tokens(self, texts):
+        return [len(ids) for ids in self.tokenizer(list(texts), add_special_tokens=False)["input_ids"]]
+
+    def _split_word(self, word):
+        """
+        Cuts a word longer than a chunk (URLs, serials, base64) at token
+        boundaries, using the tokenizer's character offsets.
+        """
+        offsets = self.tokenizer(word, add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"]
+        bounds = [0] + [offsets[i][0] for i in range(self.max_tokens, len(offsets), self.max_tokens)] + [len(word)]
+        parts = [word[a:b] for a, b in zip(bounds, bounds[1:]) if a < b]
+        for part, n in zip(parts, self.count_tokens(parts)):
+            # A part starting mid-word can tokenize a little longer on its own; cut it again
+            if n > self.max_tokens and len(part) < len(word):
+                yield from self._split_word(part)
+            else:
+                yield part, n
+
+    def _split_long(self, sentence):
+        words = sentence.split()
+        piece, total = [], 0
+        for word, n in zip(words, self.count_tokens(words)):
+            parts = self._split_word(word) if n > self.max_tokens else [(word, n)]
+            for part, m in parts:
+                if piece and total + m > self.max_tokens:
+                    yield " ".join(piece), total
+                    piece, total = [], 0
+                piece.append(part)
+                total += m
+        if piece:
+            yield " ".join(piece), total
+
+    def _pieces(self, sentences):
+        it = iter(sentences)
+        while True:
+            batch = list(islice(it, self.batch_sentences))
+            if not batch:
+                return
+            for sentence, n in zip(batch, self.count_tokens(batch)):
+                if n <= self.max_tokens:
+                    yield sentence, n
+                else:
+                    yield from self._split_long(sentence)
+
+    def chunks(self, source):
+        """
+        Lazily yields chunk strings from a string, file object or iterable
+        of strings.
+        """
+        window, total, fresh = deque(), 0, False
+        for piece, n in self._pieces(iter_sentences(iter_text_blocks(source))):
+            if window and total + n > self.max_tokens:
+                yield " ".join(s for s, _ in window)
+                # Keep the trailing sentences that fit in the overlap
+                carry, carried = deque(), 0
+                while window and carried + window[-1][1] <= self.overlap:
+                    s = window.pop()
+                    carry.appendleft(s)
+                    carried += s[1]
+                window, total, fresh = carry, carried, False
+                while window and total + n > self.max_tokens:
+                    total -= window.popleft()[1]
+            window.append((piece, n))
+            total += n
+            fresh = True
+
+        if fresh:
+            yield " ".join(s for s, _ in window)
@@ -0,0 +1,63 @@
+import threading
+import time
+
+
+class CollectionIndex:
+    """
+    In-memory index over the live unified_nodes collection, built from a
+    projected scan. The first lookup builds it; after that it is rebuilt on
+    a background thread every `ttl` seconds and whenever the catalog alias
+    points at another collection, while lookups keep using the current one.
+
+    Subclasses set `label` and implement projection() and build(docs),
+    which replaces the index contents and returns the number of entries.
+    """
+
+    label = "Collection index"
+
+    def __init__(self, get_collection, ttl=300):
+        self.get_collection = get_collection
+        self.ttl = ttl
+        self._source = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def projection(self):
+        raise NotImplementedError
+
+    def build(self, docs):
+        raise NotImplementedError
+
+    def refresh(self):
+        collection = self.get_collection()
+        start = time.perf_counter()
+        count = self.build(collection.find({}, self.projection()))
+        self._source = getattr(collection, "name", None)
+        self._built_at = time.monotonic()
+        print(f"{self.label}: {count} entries from {self._source or 'catalog'} "
+              f"in {time.perf_counter() - start:.2f}s")
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"{self.label} refresh failed: {e}")
+        finally:
+            self._refreshing = False
+
+    def ensure_fresh(self):
+        if not self._built_at:
+            with self._lock:
+                if not self._built_at:
+                    self.refresh()
+            return
+        stale = time.monotonic() - self._built_at > self.ttl
+        moved = getattr(self.get_collection(), "name", None) != self._source
+        if (stale or moved) and not self._refreshing:
+            with self._lock:
+                if self._refreshing:
+                    return
+                self._refreshing = True
+            threading.Thread(target=self._background_refresh, name=self.label.lower().replace(" ", "-"),
+                             daemon=True).start()
@@ -1,18 +1,97 @@
 from pymongo import MongoClient
+from pymongo.errors import OperationFailure, PyMongoError
+import logging
 import os
+import time
 from dotenv import load_dotenv
+from .catalog_versions import CatalogVersions, PROCESSED_DIR
+from .attributes import vector_filter
+from .embedding_versions import (
+    TEXT_EMBEDDING_VERSION, CLIP_EMBEDDING_VERSION, get_version, embedding_field, vector_path, index_name,
+)
+from .telemetry import get_logger, log_event, FALLBACKS
 
 load_dotenv()
 
+# How often the catalog alias is re-read, so blue/green switches reach running servers
+CATALOG_ALIAS_REFRESH = float(os.getenv("CATALOG_ALIAS_REFRESH", "30"))
+
+# Result partitions of multi_search, in fallback order
+MULTI_SEARCH_LEGS = ["text", "visual", "regex", "featured"]
+# Seconds multi_search uses separate calls after a transient combined-search failure
+MULTI_SEARCH_RETRY = float(os.getenv("MULTI_SEARCH_RETRY", "60"))
+
+logger = get_logger("remodel.database")
+
+
+def unionwith_unsupported(error):
+    """
+    True when the server rejects a search stage inside $unionWith, as
+    opposed to a transient failure (index still building, timeout, interrupt).
+    """
+    message = str(error)
+    return "$unionWith" in message and ("vectorSearch" in message or "mongot" in message.lower())
+
+
+def keyword_query(keywords, category=None):
+    """
+    Case-insensitive combined_text match on any keyword, for the regex fallback.
+    """
+    query = {"$or": [{"combined_text": {"$regex": kw, "$options": "i"}} for kw in keywords]}
+    return {"$and": [query, {"category": category}]} if category else query
+
+
 class DatabaseHandler:
-    def __init__(self, uri: str = None, db_name: str = "remodel_catalog"):
+    def __init__(self, uri: str = None, db_name: str = "remodel_catalog",
+                 text_version: str = None, clip_version: str = None):
         self.uri = uri or os.getenv("MONGO_URI")
         print(f"Connecting to MongoDB with URI: {self.uri}")
         self.client = MongoClient(self.uri)
         self.db = self.client[db_name]
         self.embeddings = self.db.embeddings_v1
         self.image_embeddings = self.db.image_embeddings
-        self.unified_collection = self.db.unified_nodes
+        self.catalog_versions = CatalogVersions(self.db, "unified_nodes")
+        self._unified_name = None
+        self._asset_dir = None
+        self._unified_resolved_at = 0.0
+
+        # Embedding versions searched in unified_nodes (TEXT/CLIP_EMBEDDING_VERSION)
+        self.text_version = text_version or TEXT_EMBEDDING_VERSION
+        self.clip_version = clip_version or CLIP_EMBEDDING_VERSION
+        get_version(self.text_version, "text")
+        get_version(self.clip_version, "clip")
+        self.clip_field = embedding_field(self.clip_version)
+        # monotonic time before which multi_search uses separate calls; inf once the server rejects it
+        self._multi_search_retry_at = 0.0
+
+    @property
+    def unified_collection(self):
+        """
+        The live unified_nodes version, resolved through the catalog alias.
+        """
+        self._resolve_alias()
+        return self.db[self._unified_name]
+
+    @property
+    def asset_dir(self):
+        """
+        Directory holding the live version's images, OCR text and page renders.
+        """
+        self._resolve_alias()
+        return self._asset_dir
+
+    def _resolve_alias(self):
+        now = time.monotonic()
+        if self._unified_name is None or now - self._unified_resolved_at > CATALOG_ALIAS_REFRESH:
+            try:
+                name, assets = self.catalog_versions.live()
+            except PyMongoError as e:
+                print(f"Could not resolve catalog alias ({e}), keeping {self._unified_name}")
+                name = self._unified_name or self.catalog_versions.alias
+                assets = self._asset_dir or PROCESSED_DIR
+            if name != self._unified_name:
+                print(f"Serving catalog from collection: {name} (assets: {assets})")
+            self._unified_name, self._asset_dir, self._unified_resolved_at = name, assets, now
 
     def vector_search(self, query_embedding, limit=5, filter_dict=None):
         search_params = {
@@ -45,33 +124,118 @@ class DatabaseHandler:
         pipeline = [{"$vectorSearch": search_params}]
         return list(self.image_embeddings.aggregate(pipeline))
 
-    def unified_search(self, query_embedding, limit=5, filter_dict=None):
+    def _text_search_stage(self, query_embedding, limit, filter_dict=None, constraints=None):
+        if constraints:
+            extra = vector_filter(constraints=constraints)
+            filter_dict = {"$and": [filter_dict, extra]} if filter_dict else extra
         search_params = {
-            "index": "vector_index", 
-            "path": "embedding",
+            "index": index_name(self.text_version),
+            "path": vector_path(self.text_version),
             "queryVector": query_embedding,
             "numCandidates": 100,
             "limit": limit
         }
         if filter_dict:
             search_params["filter"] = filter_dict
-            
-        pipeline = [{"$vectorSearch": search_params}]
-        return list(self.unified_collection.aggregate(pipeline))
+        return {"$vectorSearch": search_params}
 
-    def strict_visual_search(self, clip_text_embedding, category, limit=5):
-        """
-        Search with hard category filtering at the vector index level.
-        """
+    def _visual_search_stage(self, clip_text_embedding, category, limit, constraints=None):
         search_params = {
-            "index": "unified_clip_index",
-            "path": "related_images.clip_embedding",
+            "index": index_name(self.clip_version),
+            "path": vector_path(self.clip_version),
             "queryVector": clip_text_embedding,
             "numCandidates": 100,
             "limit": limit
         }
-        if category:
-            search_params["filter"] = {"category": category}
-            
-        pipeline = [{"$vectorSearch": search_params}]
+        filter_dict = vector_filter(category, constraints)
+        if filter_dict:
+            search_params["filter"] = filter_dict
+        return {"$vectorSearch": search_params}
+
+    def unified_search(self, query_embedding, limit=5, filter_dict=None, constraints=None):
+        """
+        `constraints` (see attributes.extract_constraints) are applied as
+        $vectorSearch pre-filters together with `filter_dict`.
+        """
+        pipeline = [self._text_search_stage(query_embedding, limit, filter_dict, constraints)]
         return list(self.unified_collection.aggregate(pipeline))
+
+    def strict_visual_search(self, clip_text_embedding, category, limit=5, constraints=None):
+        """
+        Search with hard category (and constraint) filtering at the vector index level.
+        """
+        pipeline = [self._visual_search_stage(clip_text_embedding, category, limit, constraints)]
+        return list(self.unified_collection.aggregate(pipeline))
+
+    def multi_search(self, query_embedding, clip_text_embedding, category=None, constraints=None,
+                     text_limit=10, visual_limit=16, keywords=None, featured_limit=4):
+        """
+        Text and CLIP vector search plus the featured fallback in one
+        aggregation: each leg is a tagged $unionWith branch, and a $facet
+        partitions them. The featured leg is a $limit of `featured_limit`
+        documents, emptied in the pipeline when the text leg found any.
+        The regex fallback is an unindexed scan of combined_text, so it is
+        not part of the aggregation: it runs as its own query only when the
+        text leg comes back empty. Returns {"text", "visual", "regex",
+        "featured"} lists, holding only what ChatEngine would have fetched.
+        Servers that reject $vectorSearch inside $unionWith get the same
+        legs as separate calls for the life of the handler; any other
+        failure falls back for MULTI_SEARCH_RETRY seconds.
+        """
+        if time.monotonic() < self._multi_search_retry_at:
+            return self._multi_search_separate(query_embedding, clip_text_embedding, category, constraints,
+                                               text_limit, visual_limit, keywords, featured_limit)
+
+        coll = self.unified_collection
+        category_filter = {"category": category} if category else {}
+        legs = {
+            "visual": [self._visual_search_stage(clip_text_embedding, category, visual_limit, constraints)],
+            "featured": [{"$match": category_filter}, {"$limit": featured_limit}],
+        }
+        pipeline = [
+            self._text_search_stage(query_embedding, text_limit, category_filter or None, constraints),
+            {"$addFields": {"_leg": "text"}},
+        ]
+        for leg, stages in legs.items():
+            pipeline.append({"$unionWith": {"coll": coll.name,
+                                            "pipeline": stages + [{"$addFields": {"_leg": leg}}]}})
+        pipeline += [
+            {"$facet": {leg: [{"$match": {"_leg": leg}}, {"$unset": "_leg"}] for leg in ["text", *legs]}},
+            {"$project": {
+                "text": 1,
+                "visual": 1,
+                "featured": {"$cond": [{"$gt": [{"$size": "$text"}, 0]}, [], "$featured"]},
+            }},
+        ]
+        try:
+            result = next(coll.aggregate(pipeline), None) or {}
+        except OperationFailure as e:
+            if unionwith_unsupported(e):
+                log_event(logger, logging.WARNING, "combined search not supported, using separate calls",
+                          error=str(e))
+                self._multi_search_retry_at = float("inf")
+            else:
+                log_event(logger, logging.WARNING, "combined search failed, using separate calls",
+                          error=str(e), code=e.code, retry_seconds=MULTI_SEARCH_RETRY)
+                self._multi_search_retry_at = time.monotonic() + MULTI_SEARCH_RETRY
+            FALLBACKS.inc(fallback="multi_search")
+            return self.multi_search(query_embedding, clip_text_embedding, category, constraints,
+                                     text_limit, visual_limit, keywords, featured_limit)
+        result = {leg: result.get(leg, []) for leg in MULTI_SEARCH_LEGS}
+        if not result["text"] and keywords:
+            result["regex"] = list(coll.find(keyword_query(keywords, category)).limit(10))
+            if result["regex"]:
+                result["featured"] = []
+        return result
+
+    def _multi_search_separate(self, query_embedding, clip_text_embedding, category, constraints,
+                               text_limit, visual_limit, keywords, featured_limit):
+        category_filter = {"category": category} if category else {}
+        result = {leg: [] for leg in MULTI_SEARCH_LEGS}
+        result["text"] = self.unified_search(query_embedding, text_limit, category_filter or None, constraints)
+        result["visual"] = self.strict_visual_search(clip_text_embedding, category, visual_limit, constraints)
+        if not result["text"] and keywords:
+            result["regex"] = list(self.unified_collection.find(keyword_query(keywords, category)).limit(10))
+        if not result["text"] and not result["regex"]:
+            result["featured"] = list(self.unified_collection.find(category_filter).limit(featured_limit))
+        return result
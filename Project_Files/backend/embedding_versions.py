@@ -0,0 +1,71 @@
+import os
+from .attributes import ATTRIBUTE_FIELDS
+
+# Registered embedding versions. The legacy version of each kind is stored in
+# the original unversioned fields (embedding, related_images.clip_embedding),
+# so documents ingested before versioning need no migration.
+EMBEDDING_VERSIONS = {
+    "minilm-v1": {"kind": "text", "model": "all-MiniLM-L6-v2", "dims": 384},
+    "mpnet-v1": {"kind": "text", "model": "all-mpnet-base-v2", "dims": 768},
+    "clip-b32-v1": {"kind": "clip", "model": "openai/clip-vit-base-patch32", "dims": 512},
+    "clip-l14-v1": {"kind": "clip", "model": "openai/clip-vit-large-patch14", "dims": 768},
+}
+LEGACY_VERSIONS = {"text": "minilm-v1", "clip": "clip-b32-v1"}
+
+# Versions queried (and used to encode queries) by the serving path
+TEXT_EMBEDDING_VERSION = os.getenv("TEXT_EMBEDDING_VERSION", LEGACY_VERSIONS["text"])
+CLIP_EMBEDDING_VERSION = os.getenv("CLIP_EMBEDDING_VERSION", LEGACY_VERSIONS["clip"])
+
+# Pre-filter paths of every vector index: category plus the parsed numeric/token attributes
+FILTER_PATHS = ["category"] + ATTRIBUTE_FIELDS
+
+_BASE_FIELDS = {"text": "embedding", "clip": "clip_embedding"}
+_BASE_INDEXES = {"text": "vector_index", "clip": "unified_clip_index"}
+
+
+def get_version(name, kind=None):
+    spec = EMBEDDING_VERSIONS.get(name)
+    if spec is None:
+        raise ValueError(f"Unknown embedding version '{name}', expected one of {sorted(EMBEDDING_VERSIONS)}")
+    if kind and spec["kind"] != kind:
+        raise ValueError(f"Embedding version '{name}' is a {spec['kind']} version, not {kind}")
+    return spec
+
+
+def embedding_field(name):
+    """
+    Field holding the vector: on the node for text versions, on each
+    related_images entry for CLIP versions.
+    """
+    kind = get_version(name)["kind"]
+    if name == LEGACY_VERSIONS[kind]:
+        return _BASE_FIELDS[kind]
+    return f"{_BASE_FIELDS[kind]}@{name}"
+
+
+def vector_path(name):
+    field = embedding_field(name)
+    return field if get_version(name)["kind"] == "text" else f"related_images.{field}"
+
+
+def index_name(name):
+    kind = get_version(name)["kind"]
+    if name == LEGACY_VERSIONS[kind]:
+        return _BASE_INDEXES[kind]
+    return f"{_BASE_INDEXES[kind]}_{name.replace('-', '_')}"
+
+
+def search_index_template(name):
+    """
+    Atlas vector search index definition for a version, in the template
+    shape CatalogVersions.ensure_search_indexes takes.
+    """
+    spec = get_version(name)
+    return {
+        "name": index_name(name),
+        "type": "vectorSearch",
+        "definition": {"fields": [
+            {"type": "vector", "path": vector_path(name), "numDimensions": spec["dims"], "similarity": "cosine"},
+            *({"type": "filter", "path": path} for path in FILTER_PATHS),
+        ]},
+    }
@@ -0,0 +1,120 @@
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from .telemetry import CACHE_EVENTS
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, max-age=3600"
+RANGE_CHUNK_SIZE = 256 * 1024
+
+_range_pattern = re.compile(r"bytes=(\d*)-(\d*)$")
+
+# (path, mtime, size) -> sha256; avoids re-hashing files on every request
+_etag_cache = {}
+_etag_lock = threading.Lock()
+
+
+def file_etag(path: str):
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    with _etag_lock:
+        etag = _etag_cache.get(key)
+    if etag:
+        return etag
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    etag = f'"{digest.hexdigest()[:32]}"'
+
+    with _etag_lock:
+        _etag_cache[key] = etag
+    return etag
+
+
+def content_version_matches(path: str, version: str):
+    """
+    True when `version` (the ?v= of a URL) is a prefix of the file's
+    sha256, i.e. the URL names exactly these bytes and may be cached forever.
+    """
+    if not version or len(version) < 8 or path is None:
+        return False
+    return file_etag(path).strip('"').startswith(version.lower())
+
+
+def cached_file_response(request: Request, path: str, media_type: str = None,
+                         cache_control: str = IMMUTABLE_CACHE_CONTROL):
+    """
+    FileResponse with a content-hash ETag, 304 on If-None-Match and
+    long-lived cache headers.
+    """
+    etag = file_etag(path)
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [t.strip() for t in if_none_match.split(",")] or if_none_match.strip() == "*":
+        CACHE_EVENTS.inc(cache="http_etag", outcome="hit")
+        return Response(status_code=304, headers=headers)
+
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+
+def _iter_file_range(path: str, start: int, length: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            block = f.read(min(RANGE_CHUNK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+def ranged_file_response(request: Request, path: str, media_type: str = None,
+                         cache_control: str = REVALIDATE_CACHE_CONTROL):
+    """
+    Serves a file honouring a single `Range: bytes=start-end` request so PDF
+    viewers can fetch only the pages they display.
+    """
+    media_type = media_type or mimetypes.guess_type(path)[0] or "application/octet-stream"
+    size = os.path.getsize(path)
+    etag = file_etag(path)
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Accept-Ranges": "bytes"}
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if not range_header or (if_range and if_range != etag):
+        return cached_file_response(request, path, media_type, cache_control)
+
+    match = _range_pattern.match(range_header.strip())
+    if not match or match.groups() == ("", ""):
+        # Multi-range or malformed: fall back to the full body
+        return cached_file_response(request, path, media_type, cache_control)
+
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the last N bytes
+        start = max(size - int(last), 0)
+        end = size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+
+    if start >= size or start > end:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}", **headers})
+
+    length = end - start + 1
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(length)
+    return StreamingResponse(
+        _iter_file_range(path, start, length),
+        status_code=206,
+        media_type=media_type,
+        headers=headers,
+    )
@@ -0,0 +1,99 @@
+import hashlib
+import os
+import threading
+from PIL import Image
+
+# Longest edge in pixels for each derivative served to clients
+DERIVATIVE_SIZES = {
+    "thumb": 320,
+    "medium": 960,
+}
+WEBP_QUALITY = 80
+
+
+def content_hash(data: bytes):
+    return hashlib.sha256(data).hexdigest()
+
+
+def derivative_name(img_name: str, variant: str):
+    """
+    Kitchen_p3_i0.jpeg -> Kitchen_p3_i0.medium.webp
+    """
+    stem = os.path.splitext(os.path.basename(img_name))[0]
+    return f"{stem}.{variant}.webp"
+
+
+def parse_derivative_name(filename: str):
+    """
+    Returns (stem, variant) for a derivative filename, or None for originals.
+    """
+    base, ext = os.path.splitext(filename)
+    if ext.lower() != ".webp":
+        return None
+    stem, _, variant = base.rpartition(".")
+    if not stem or variant not in DERIVATIVE_SIZES:
+        return None
+    return stem, variant
+
+
+def make_derivatives(pil_img, img_name: str, output_dir: str):
+    """
+    Writes every derivative of `pil_img` next to the original.
+    Returns {variant: path}.
+    """
+    img = pil_img if pil_img.mode in ("RGB", "RGBA") else pil_img.convert("RGB")
+    paths = {}
+    # Largest first so each smaller size is resampled from an already reduced image
+    for variant, size in sorted(DERIVATIVE_SIZES.items(), key=lambda kv: -kv[1]):
+        img = img.copy()
+        img.thumbnail((size, size), Image.LANCZOS)
+        path = os.path.join(output_dir, derivative_name(img_name, variant))
+        # Concurrent /images requests may render the same file; readers never see a half-written one
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        img.save(tmp_path, "WEBP", quality=WEBP_QUALITY, method=4)
+        os.replace(tmp_path, path)
+        paths[variant] = path.replace("\\", "/")
+    return paths
+
+
+# Extensions PyMuPDF reports for extracted images, most common first
+ORIGINAL_EXTENSIONS = ["jpeg", "png", "jpg", "jpx", "jb2", "bmp", "tiff", "tif", "gif", "pnm", "pam", "psd", "jxr"]
+
+
+def find_original(stem: str, image_dir: str):
+    # One stat per known extension; never a directory listing per request
+    for ext in ORIGINAL_EXTENSIONS:
+        path = os.path.join(image_dir, f"{stem}.{ext}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def original_for(filename: str, image_dir: str):
+    """
+    Path of the original a served image comes from (itself for originals).
+    """
+    parsed = parse_derivative_name(filename)
+    if parsed is None:
+        path = os.path.join(image_dir, filename)
+        return path if os.path.exists(path) else None
+    return find_original(parsed[0], image_dir)
+
+
+def ensure_derivative(filename: str, image_dir: str):
+    """
+    Returns the path of a derivative, rendering it from the original if it
+    was never generated (e.g. nodes ingested before derivatives existed).
+    """
+    path = os.path.join(image_dir, filename)
+    if os.path.exists(path):
+        return path
+    parsed = parse_derivative_name(filename)
+    if parsed is None:
+        return None
+    original = find_original(parsed[0], image_dir)
+    if original is None:
+        return None
+    with Image.open(original) as pil_img:
+        make_derivatives(pil_img, original, image_dir)
+    return path if os.path.exists(path) else None
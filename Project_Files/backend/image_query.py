@@ -0,0 +1,138 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from io import BytesIO
+from PIL import Image, UnidentifiedImageError
+from .telemetry import CACHE_EVENTS
+
+# Upload limits for /ask/image
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(8 * 1024 * 1024)))
+MAX_UPLOAD_PIXELS = int(os.getenv("MAX_UPLOAD_PIXELS", str(40_000_000)))
+DECODE_TIMEOUT = float(os.getenv("IMAGE_DECODE_TIMEOUT", "2.0"))
+ALLOWED_FORMATS = {"JPEG", "PNG", "WEBP"}
+
+# CLIP resizes to 224; decoding to about twice that keeps its center crop sharp
+DECODE_SIZE = 448
+
+# Perceptual-hash embedding cache: entries, and the Hamming distance that counts as the same photo
+IMAGE_CACHE_SIZE = int(os.getenv("IMAGE_EMBEDDING_CACHE_SIZE", "2048"))
+PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", "4"))
+
+
+class ImageRejected(ValueError):
+    """
+    Upload refused: not an image, unsupported format, too large or too slow to decode.
+    """
+
+
+class DecoderBusy(RuntimeError):
+    """
+    Every decode worker is busy; the upload was not queued.
+    """
+
+
+def _decode(data, size):
+    img = Image.open(BytesIO(data))
+    if img.format not in ALLOWED_FORMATS:
+        raise ImageRejected(f"Unsupported image format {img.format}")
+    # Header only so far: refuse decompression bombs before any pixel is decoded
+    if img.width * img.height > MAX_UPLOAD_PIXELS:
+        raise ImageRejected(f"Image is {img.width}x{img.height}, over {MAX_UPLOAD_PIXELS} pixels")
+
+    # JPEG: decode at 1/2, 1/4 or 1/8 scale straight from the DCT coefficients
+    img.draft("RGB", (size, size))
+    img.load()
+    # Other formats: cheap integer box reduction before the final resample
+    factor = min(img.width, img.height) // size
+    if factor >= 2:
+        img = img.reduce(factor)
+    img = img.convert("RGB")
+    img.thumbnail((size, size), Image.BICUBIC)
+    return img
+
+
+DECODE_WORKERS = int(os.getenv("IMAGE_DECODE_WORKERS", "2"))
+_decoder = ThreadPoolExecutor(max_workers=DECODE_WORKERS, thread_name_prefix="decode")
+# One slot per worker, held until the decode really ends (also after a timeout),
+# so a submitted decode starts at once and the timeout measures decoding only
+_decode_slots = threading.BoundedSemaphore(DECODE_WORKERS)
+
+
+def decode_upload(data, size=DECODE_SIZE, timeout=DECODE_TIMEOUT):
+    """
+    Decodes uploaded bytes to an RGB image no larger than `size` on its
+    longest edge, without a temp file. Raises ImageRejected, or
+    DecoderBusy when no worker is free.
+    """
+    if len(data) > MAX_UPLOAD_BYTES:
+        raise ImageRejected(f"Upload is {len(data)} bytes, over {MAX_UPLOAD_BYTES}")
+    if not _decode_slots.acquire(blocking=False):
+        raise DecoderBusy("All image decoders are busy")
+    try:
+        future = _decoder.submit(_decode, data, size)
+    except Exception:
+        _decode_slots.release()
+        raise
+    future.add_done_callback(lambda _: _decode_slots.release())
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeout:
+        # The decoder thread finishes on its own and keeps its slot until then
+        raise ImageRejected(f"Image took longer than {timeout}s to decode")
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise ImageRejected(f"Cannot decode image: {e}")
+
+
+def dhash(img, size=8):
+    """
+    64-bit difference hash: robust to re-encoding, resizing and small edits.
+    """
+    gray = img.convert("L").resize((size + 1, size), Image.BILINEAR)
+    pixels = list(gray.getdata())
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            right = pixels[row * (size + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
+
+
+class ImageEmbeddingCache:
+    """
+    LRU of CLIP embeddings keyed by perceptual hash. An exact hash hit is a
+    dict lookup; otherwise the closest cached hash within `max_distance`
+    bits counts as the same photo (re-uploads, crops, recompression).
+    """
+
+    def __init__(self, max_entries=IMAGE_CACHE_SIZE, max_distance=PHASH_MAX_DISTANCE):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, phash):
+        with self._lock:
+            if phash in self._entries:
+                self._entries.move_to_end(phash)
+                CACHE_EVENTS.inc(cache="image_embedding", outcome="hit")
+                return self._entries[phash]
+            best, best_distance = None, self.max_distance + 1
+            for key in self._entries:
+                distance = bin(key ^ phash).count("1")
+                if distance < best_distance:
+                    best, best_distance = key, distance
+            if best is not None:
+                self._entries.move_to_end(best)
+                CACHE_EVENTS.inc(cache="image_embedding", outcome="near_hit")
+                return self._entries[best]
+        CACHE_EVENTS.inc(cache="image_embedding", outcome="miss")
+        return None
+
+    def put(self, phash, embedding):
+        with self._lock:
+            self._entries[phash] = embedding
+            self._entries.move_to_end(phash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
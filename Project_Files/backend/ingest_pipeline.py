@@ -0,0 +1,110 @@
+import queue
+import threading
+import time
+
+_STOP = object()
+
+
+class Stage:
+    """
+    One step of a StreamingPipeline. `fn(item)` returns the item to pass
+    downstream, or None to drop it.
+    """
+
+    def __init__(self, name, fn, workers=1):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+
+
+class StreamingPipeline:
+    """
+    Runs stages on their own threads connected by bounded queues, so slow
+    stages apply backpressure upstream and at most `queue_size` items wait
+    between any two stages. I/O-bound and compute-bound stages overlap.
+    """
+
+    def __init__(self, stages, queue_size=8):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.stats = {
+            s.name: {"processed": 0, "dropped": 0, "errors": 0, "busy_seconds": 0.0}
+            for s in stages
+        }
+        self._lock = threading.Lock()
+
+    def _worker(self, stage, inbox, outbox, remaining):
+        stats = self.stats[stage.name]
+        while True:
+            item = inbox.get()
+            if item is _STOP:
+                # Let sibling workers see the sentinel too
+                inbox.put(_STOP)
+                with self._lock:
+                    remaining[stage.name] -= 1
+                    last = remaining[stage.name] == 0
+                if last and outbox is not None:
+                    outbox.put(_STOP)
+                return
+
+            start = time.perf_counter()
+            try:
+                result = stage.fn(item)
+            except Exception as e:
+                print(f"Pipeline stage '{stage.name}' failed: {e}")
+                result = None
+                with self._lock:
+                    stats["errors"] += 1
+            elapsed = time.perf_counter() - start
+
+            with self._lock:
+                stats["busy_seconds"] += elapsed
+                if result is None:
+                    stats["dropped"] += 1
+                else:
+                    stats["processed"] += 1
+
+            if result is not None and outbox is not None:
+                outbox.put(result)
+
+    def run(self, source):
+        """
+        Feeds every item of `source` (any iterable, consumed lazily) through
+        the stages and blocks until the last stage has drained.
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        remaining = {s.name: s.workers for s in self.stages}
+        threads = []
+        for i, stage in enumerate(self.stages):
+            outbox = queues[i + 1] if i + 1 < len(queues) else None
+            for w in range(stage.workers):
+                t = threading.Thread(
+                    target=self._worker,
+                    args=(stage, queues[i], outbox, remaining),
+                    name=f"{stage.name}-{w}",
+                    daemon=True,
+                )
+                t.start()
+                threads.append(t)
+
+        start = time.perf_counter()
+        try:
+            for item in source:
+                queues[0].put(item)
+        finally:
+            queues[0].put(_STOP)
+            for t in threads:
+                t.join()
+
+        self.stats["wall_seconds"] = time.perf_counter() - start
+        return self.stats
+
+    def report(self):
+        lines = [f"Pipeline wall time: {self.stats.get('wall_seconds', 0.0):.1f}s"]
+        for stage in self.stages:
+            s = self.stats[stage.name]
+            lines.append(
+                f"  {stage.name:<10} processed={s['processed']:<6} dropped={s['dropped']:<4} "
+                f"errors={s['errors']:<4} busy={s['busy_seconds']:.1f}s ({stage.workers} workers)"
+            )
+        return "\n".join(lines)
@@ -1,10 +1,31 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
+from typing import List, Optional
+import json
+import logging
 import os
+import time
+import uuid
 
-from .chat_engine import ChatEngine
+from .chat_engine import ChatEngine, ASK_BATCH_CONCURRENCY
+from .session_store import SessionStore
+from .image_derivatives import ensure_derivative, original_for
+from .image_query import DecoderBusy, ImageRejected, MAX_UPLOAD_BYTES
+from .file_serving import (
+    cached_file_response, ranged_file_response, content_version_matches,
+    IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL,
+)
+from .page_previews import PageCache, find_catalogs
+from .telemetry import (
+    get_logger, log_event, new_trace_id, trace_id_var,
+    REGISTRY, HTTP_SECONDS, PROMETHEUS_CONTENT_TYPE,
+)
+
+logger = get_logger("remodel.api")
 
 app = FastAPI()
 
@@ -15,28 +36,191 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    # Reuse an upstream trace id when present so logs line up across services
+    trace_id = request.headers.get("x-trace-id") or new_trace_id()
+    token = trace_id_var.set(trace_id)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Trace-Id"] = trace_id
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_SECONDS.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=status,
+        )
+        trace_id_var.reset(token)
+
 # Initialize ChatEngine
 engine = ChatEngine()
 
+# Per-session chat histories for /chat, bounded by total bytes
+sessions = SessionStore(
+    max_bytes=int(os.getenv("SESSION_STORE_MAX_BYTES", str(64 * 1024 * 1024))),
+    max_messages=int(os.getenv("SESSION_MAX_MESSAGES", "20")),
+    idle_ttl=int(os.getenv("SESSION_IDLE_TTL", "3600")),
+    collection=engine.db.db.chat_sessions if os.getenv("SESSION_PERSIST", "false").lower() == "true" else None,
+)
+
 class QuestionRequest(BaseModel):
     question: str
 
+class ChatRequest(BaseModel):
+    question: str
+    session_id: Optional[str] = None
+
+class BatchQuestionRequest(BaseModel):
+    questions: List[str]
+    max_concurrency: Optional[int] = None
+
+# Largest batch accepted by /ask/batch
+ASK_BATCH_MAX = int(os.getenv("ASK_BATCH_MAX", "500"))
+
 @app.post("/ask")
 async def ask_question(request: QuestionRequest):
-    print(f"MAIN_API: Received question: {request.question}")
+    log_event(logger, logging.INFO, "ask received", question=request.question)
     try:
         response = engine.ask(request.question)
-        print(f"MAIN_API: Got response with {len(response.get('images', []))} images")
+        log_event(logger, logging.INFO, "ask answered", images=len(response.get("images", [])))
+        return response
+    except Exception as e:
+        log_event(logger, logging.ERROR, "ask failed", error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/ask/batch")
+def ask_batch(request: BatchQuestionRequest):
+    """
+    Many /ask questions in one call, streamed back as NDJSON in completion
+    order: one {"index", "question", "answer", "images"} (or "error") line each.
+    """
+    if len(request.questions) > ASK_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {ASK_BATCH_MAX} questions per batch")
+    concurrency = min(request.max_concurrency or ASK_BATCH_CONCURRENCY, ASK_BATCH_CONCURRENCY)
+    log_event(logger, logging.INFO, "ask batch received", questions=len(request.questions))
+
+    def lines():
+        for i, result in engine.ask_many(request.questions, max_concurrency=concurrency):
+            yield json.dumps({"index": i, "question": request.questions[i], **result}, default=str) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.post("/ask/image")
+async def ask_image(request: Request, question: Optional[str] = None, category: Optional[str] = None):
+    """
+    Catalog images that look like an uploaded photo, plus an answer when a
+    question is sent with it. The body is the raw image (Content-Type
+    image/jpeg, image/png or image/webp); question and category are query
+    parameters. The body is read straight into memory and refused past
+    MAX_UPLOAD_BYTES, before it is fully received.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Image larger than {MAX_UPLOAD_BYTES} bytes")
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"Image larger than {MAX_UPLOAD_BYTES} bytes")
+    if not body:
+        raise HTTPException(status_code=422, detail="Empty request body; send the image bytes as the body")
+    log_event(logger, logging.INFO, "ask image received", bytes=len(body), question=question)
+    try:
+        response = await run_in_threadpool(engine.ask_image, bytes(body), question, category)
+    except ImageRejected as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except DecoderBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        log_event(logger, logging.ERROR, "ask image failed", error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+    log_event(logger, logging.INFO, "ask image answered", images=len(response["images"]))
+    return response
+
+@app.get("/similar/{image_id}")
+def similar_images(image_id: str, limit: int = 12):
+    """
+    Catalog images most similar to a result image, from the neighbor graph
+    precomputed at ingest.
+    """
+    response = engine.similar(image_id, limit=max(1, min(limit, 50)))
+    if response is None:
+        raise HTTPException(status_code=404, detail=f"Unknown image {image_id}")
+    return response
+
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+@app.post("/chat")
+def chat(request: ChatRequest):
+    # Sync handler: FastAPI runs it in the threadpool so concurrent sessions don't block the loop
+    session_id = request.session_id or uuid.uuid4().hex
+    try:
+        history = sessions.get_history(session_id)
+        response = engine.chat(request.question, history)
+        sessions.append(session_id, "user", request.question)
+        sessions.append(session_id, "assistant", response["answer"])
+        response["session_id"] = session_id
         return response
     except Exception as e:
-        print(f"Error in /ask: {e}")
+        log_event(logger, logging.ERROR, "chat failed", error=str(e), session_id=session_id)
         raise HTTPException(status_code=500, detail=str(e))
 
-# Mount data for access to PDFs
-app.mount("/data", StaticFiles(directory="Data"), name="data")
+@app.delete("/chat/{session_id}")
+def end_chat(session_id: str):
+    sessions.delete(session_id)
+    return {"session_id": session_id, "deleted": True}
+
+@app.on_event("shutdown")
+def flush_sessions():
+    sessions.close()
+
+DATA_DIR = "Data"
+
+# Per-page previews / single-page PDFs; pages not rendered at ingest are cached on demand
+page_cache = PageCache(
+    find_catalogs(DATA_DIR),
+    max_bytes=int(os.getenv("PAGE_CACHE_MAX_BYTES", str(512 * 1024 * 1024))),
+)
+
+@app.get("/pages/{catalog}/{page}.{ext}")
+def get_page(catalog: str, page: int, ext: str, request: Request):
+    kind = {"webp": "preview", "pdf": "pdf"}.get(ext)
+    path = page_cache.get(catalog, page, kind, os.path.join(engine.db.asset_dir, "pages")) if kind else None
+    if path is None:
+        raise HTTPException(status_code=404, detail="Page not found")
+    # Page URLs are not versioned: a re-rendered catalog must reach clients via the ETag
+    return cached_file_response(request, path, cache_control=REVALIDATE_CACHE_CONTROL)
+
+# Data files (full catalog PDFs) with HTTP range support
+@app.get("/data/{file_path:path}")
+def get_data_file(file_path: str, request: Request):
+    data_root = os.path.realpath(DATA_DIR)
+    path = os.path.realpath(os.path.join(data_root, file_path))
+    if not path.startswith(data_root + os.sep) or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="File not found")
+    return ranged_file_response(request, path)
 
-# Mount images for access from HTML
-app.mount("/images", StaticFiles(directory="Data/processed/images"), name="images")
+# Images (originals and WebP derivatives) of the live catalog version, with content-hash
+# ETags. Only URLs whose ?v= matches the original's content hash are immutable; the rest revalidate.
+@app.get("/images/{filename}")
+def get_image(filename: str, request: Request, v: Optional[str] = None):
+    if filename != os.path.basename(filename) or filename.startswith("."):
+        raise HTTPException(status_code=404, detail="Image not found")
+    image_dir = os.path.join(engine.db.asset_dir, "images")
+    path = ensure_derivative(filename, image_dir)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    versioned = v is not None and content_version_matches(original_for(filename, image_dir), v)
+    cache_control = IMMUTABLE_CACHE_CONTROL if versioned else REVALIDATE_CACHE_CONTROL
+    return cached_file_response(request, path, cache_control=cache_control)
 
 # Serve the frontend at root - MOUNT THIS LAST so it doesn't intercept API routes
 app.mount("/", StaticFiles(directory="frontend", html=True), name="frontend")
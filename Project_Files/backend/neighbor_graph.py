@@ -0,0 +1,138 @@
+import time
+import numpy as np
+from pymongo import UpdateOne
+from .bulk_writer import BulkWriter
+from .collection_index import CollectionIndex
+from .product_index import IMAGE_FIELDS
+
+# Neighbors stored per image
+NEIGHBOR_K = 12
+
+# Memory for one block of rows in _top_neighbors: float32 scores, their negated
+# copy and argpartition's int64 indices, 16 bytes per (row, image) pair
+NEIGHBOR_BLOCK_BYTES = 256 * 1024 * 1024
+
+
+def image_id(path):
+    """
+    Public id of a catalog image: its file name, unique per catalog page.
+    """
+    return (path or "").replace("\\", "/").rsplit("/", 1)[-1]
+
+
+def _top_neighbors(vectors, hashes, k, max_bytes=NEIGHBOR_BLOCK_BYTES):
+    """
+    Exact cosine top-k per row of L2-normalized `vectors`, excluding the
+    row itself and byte-identical copies of the same image. Rows are scored
+    in blocks sized from `n`, so peak memory stays near `max_bytes`.
+    """
+    n = len(vectors)
+    take = min(k + 4, n - 1)
+    if take <= 0:
+        return [[] for _ in range(n)]
+    block = max(1, min(n, max_bytes // (16 * n)))
+    out = []
+    for start in range(0, n, block):
+        scores = vectors[start:start + block] @ vectors.T
+        rows = np.arange(start, start + len(scores))
+        scores[rows - start, rows] = -np.inf
+        top = np.argpartition(-scores, take - 1, axis=1)[:, :take]
+        for r, candidates in enumerate(top):
+            row = scores[r]
+            candidates = candidates[np.argsort(-row[candidates])]
+            own = hashes[start + r]
+            picked = [(int(j), float(row[j])) for j in candidates if not (own and hashes[j] == own)]
+            out.append(picked[:k])
+    return out
+
+
+def build_neighbor_graph(collection, k=NEIGHBOR_K, clip_field="clip_embedding"):
+    """
+    Computes, per category, the `k` nearest catalog images of every image
+    by CLIP cosine similarity and stores them on the image entry as
+    `neighbors: [{"image_id", "score"}]`. Runs after ingest, when every
+    vector of the category is known.
+    """
+    start = time.perf_counter()
+    by_category = {}
+    projection = {"_id": 1, "category": 1, "related_images.path": 1, "related_images.content_hash": 1,
+                  f"related_images.{clip_field}": 1}
+    for doc in collection.find({}, projection):
+        for i, img in enumerate(doc.get("related_images", [])):
+            vector = img.get(clip_field)
+            if not vector or not img.get("path"):
+                continue
+            group = by_category.setdefault(doc.get("category"), {"refs": [], "vectors": [], "hashes": []})
+            group["refs"].append((doc["_id"], i, image_id(img["path"])))
+            group["vectors"].append(vector)
+            group["hashes"].append(img.get("content_hash"))
+
+    updates = {}
+    for category, group in by_category.items():
+        vectors = np.asarray(group["vectors"], dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-8
+        refs = group["refs"]
+        for (node_id, i, _), neighbors in zip(refs, _top_neighbors(vectors, group["hashes"], k)):
+            updates.setdefault(node_id, {})[f"related_images.{i}.neighbors"] = [
+                {"image_id": refs[j][2], "score": round(score, 4)} for j, score in neighbors
+            ]
+        print(f"Neighbor graph: {len(refs)} {category} images, k={k}")
+
+    writer = BulkWriter(collection, key="_id", to_op=lambda u: UpdateOne({"_id": u["_id"]}, {"$set": u["set"]}))
+    for node_id, fields in updates.items():
+        writer.add({"_id": node_id, "set": fields})
+    writer.close()
+    print(f"Neighbor graph stored on {len(updates)} nodes in {time.perf_counter() - start:.1f}s")
+    return writer.stats["failed"] == 0
+
+
+class SimilarImageIndex(CollectionIndex):
+    """
+    In-memory image_id -> (image, node fields, neighbors) map over the
+    graph stored by build_neighbor_graph, so "more like this" lookups are
+    a dict access. Refreshed in the background (see CollectionIndex).
+    """
+
+    label = "Similar-image index"
+
+    def __init__(self, get_collection, ttl=300):
+        super().__init__(get_collection, ttl)
+        self._images = {}
+
+    def projection(self):
+        projection = {"id": 1, "category": 1, "product": 1, "related_images.neighbors": 1}
+        projection.update({f"related_images.{f}": 1 for f in IMAGE_FIELDS})
+        return projection
+
+    def build(self, docs):
+        images = {}
+        for doc in docs:
+            node = {"id": doc.get("id"), "category": doc.get("category"), "product": doc.get("product")}
+            for img in doc.get("related_images", []):
+                if img.get("path"):
+                    images[image_id(img["path"])] = {
+                        "image": {f: img.get(f) for f in IMAGE_FIELDS if f in img},
+                        "node": node,
+                        "neighbors": img.get("neighbors") or [],
+                    }
+        self._images = images
+        return len(images)
+
+    def get(self, image):
+        return self._images.get(image)
+
+    def neighbors(self, image, limit=NEIGHBOR_K):
+        """
+        [(entry, score)] for the stored neighbors of `image`, or None when
+        the image is unknown.
+        """
+        self.ensure_fresh()
+        entry = self._images.get(image)
+        if entry is None:
+            return None
+        found = []
+        for n in entry["neighbors"][:limit]:
+            neighbor = self._images.get(n["image_id"])
+            if neighbor is not None:
+                found.append((neighbor, n["score"]))
+        return found
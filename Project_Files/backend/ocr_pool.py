@@ -0,0 +1,150 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image
+
+try:
+    # C API binding: one initialized engine per thread, no subprocess or temp files
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+import pytesseract
+
+TARGET_DPI = 300
+MIN_SCALE, MAX_SCALE = 0.25, 4.0
+# Longest side after rescaling; bounds the cost of huge scans
+MAX_OCR_SIDE = 4000
+
+
+# Text-presence detector thresholds (see likely_has_text)
+TEXT_EDGE_THRESHOLD = 40
+TEXT_EDGE_DENSITY = 0.04
+TEXT_ROW_CONTRAST = 0.03
+TEXT_DETECT_SIDE = 512
+
+
+def likely_has_text(pil_img):
+    """
+    Cheap check for rendered text before paying for OCR.
+
+    Glyphs produce many sharp horizontal intensity changes packed into
+    lines, so text regions show a high density of strong edges and a
+    strongly alternating per-row edge profile (text line / gap / text line).
+    Photos and renders have softer gradients spread evenly across rows.
+    """
+    img = pil_img.convert("L")
+    img.thumbnail((TEXT_DETECT_SIDE, TEXT_DETECT_SIDE))
+    arr = np.asarray(img, dtype=np.int16)
+    if arr.shape[0] < 8 or arr.shape[1] < 8:
+        return False
+    strong = np.abs(np.diff(arr, axis=1)) > TEXT_EDGE_THRESHOLD
+    density = strong.mean()
+    row_contrast = strong.mean(axis=1).std()
+    return density >= TEXT_EDGE_DENSITY and row_contrast >= TEXT_ROW_CONTRAST
+
+
+def estimate_dpi(width_px, bbox_width_pt):
+    """
+    Effective resolution of an image placed on a PDF page (72 pt per inch).
+    """
+    if not bbox_width_pt or bbox_width_pt <= 0:
+        return None
+    return width_px / (bbox_width_pt / 72.0)
+
+
+def prepare_image(pil_img, source_dpi=None, target_dpi=TARGET_DPI):
+    """
+    Grayscale and rescale so text renders at roughly `target_dpi`.
+    """
+    img = pil_img.convert("L")
+    scale = 1.0
+    if source_dpi:
+        scale = min(max(target_dpi / source_dpi, MIN_SCALE), MAX_SCALE)
+    longest = max(img.size) * scale
+    if longest > MAX_OCR_SIDE:
+        scale *= MAX_OCR_SIDE / longest
+    # Small adjustments cost more than they gain
+    if abs(scale - 1.0) > 0.15:
+        size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+        img = img.resize(size, Image.LANCZOS)
+    return img
+
+
+class OCRPool:
+    """
+    Pool of long-lived Tesseract engines for ingestion.
+
+    With tesserocr installed each worker thread keeps an initialized
+    PyTessBaseAPI (language data loaded once) and recognition runs without
+    the GIL. Without it, pytesseract is used from the same threads so
+    batches still run in parallel.
+    """
+
+    def __init__(self, workers=None, lang="eng", target_dpi=TARGET_DPI, tesseract_cmd=None):
+        self.workers = workers or int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 2)))
+        self.lang = lang
+        self.target_dpi = target_dpi
+        if tesseract_cmd:
+            pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+
+        self.backend = "tesserocr" if tesserocr is not None else "pytesseract"
+        if self.backend == "tesserocr":
+            print(f"OCR backend: tesserocr ({self.workers} workers)")
+        else:
+            print(f"OCR backend: pytesseract ({self.workers} workers, one tesseract process per image; "
+                  f"pip install -r requirements-ocr.txt for tesserocr)")
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ocr")
+        self._local = threading.local()
+        self._apis = []
+        self._apis_lock = threading.Lock()
+
+    def _api(self):
+        api = getattr(self._local, "api", None)
+        if api is None:
+            api = tesserocr.PyTessBaseAPI(lang=self.lang)
+            self._local.api = api
+            with self._apis_lock:
+                self._apis.append(api)
+        return api
+
+    def _ocr_one(self, pil_img, source_dpi):
+        start = time.perf_counter()
+        try:
+            img = prepare_image(pil_img, source_dpi, self.target_dpi)
+            if self.backend == "tesserocr":
+                api = self._api()
+                try:
+                    api.SetImage(img)
+                    api.SetSourceResolution(self.target_dpi)
+                    text = api.GetUTF8Text()
+                finally:
+                    api.Clear()
+            else:
+                text = pytesseract.image_to_string(img, lang=self.lang, config=f"--dpi {self.target_dpi}")
+        except Exception as e:
+            # One bad image must not cost the rest of the page its OCR
+            print(f"OCR failed for one image: {e}")
+            return {"text": "", "seconds": time.perf_counter() - start, "error": str(e)}
+        return {"text": text.strip(), "seconds": time.perf_counter() - start}
+
+    def ocr_batch(self, images, source_dpis=None):
+        """
+        OCR a batch of in-memory PIL images. Returns one
+        {"text": str, "seconds": float} per image, in order; an image that
+        fails gets empty text and an "error" key.
+        """
+        source_dpis = source_dpis or [None] * len(images)
+        return list(self._executor.map(self._ocr_one, images, source_dpis))
+
+    def ocr(self, pil_img, source_dpi=None):
+        return self._executor.submit(self._ocr_one, pil_img, source_dpi).result()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        with self._apis_lock:
+            for api in self._apis:
+                api.End()
+            self._apis.clear()
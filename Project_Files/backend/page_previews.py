@@ -0,0 +1,216 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+import fitz
+from PIL import Image
+from .telemetry import CACHE_EVENTS
+
+PAGE_OUTPUT_DIR = "Data/processed/pages"
+PAGE_CACHE_DIR = "Data/processed/page_cache"
+PREVIEW_DPI = 100
+PREVIEW_QUALITY = 70
+
+# kind -> file extension
+PAGE_KINDS = {"preview": "webp", "pdf": "pdf"}
+
+# Seconds an evicted page stays on disk, so responses already handed its path can finish
+EVICT_GRACE_SECONDS = 120
+
+
+def catalog_slug(pdf_path: str):
+    """
+    Data/kitchen_data/Kitchen Book.pdf -> Kitchen_Book
+    """
+    stem = os.path.splitext(os.path.basename(pdf_path.replace("\\", "/")))[0]
+    return re.sub(r'[^a-zA-Z0-9]', '_', stem)
+
+
+def page_filename(page_no: int, kind: str):
+    return f"p{page_no}.{PAGE_KINDS[kind]}"
+
+
+def render_page(doc, page_no: int, kind: str, out_path: str):
+    """
+    Renders one page of an open fitz document to `out_path`.
+    preview: compressed WebP raster, pdf: standalone single-page PDF.
+    """
+    # Per process and thread: concurrent renders of one page never share a temp file
+    tmp_path = f"{out_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    if kind == "preview":
+        pix = doc[page_no - 1].get_pixmap(dpi=PREVIEW_DPI, alpha=False)
+        img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+        img.save(tmp_path, "WEBP", quality=PREVIEW_QUALITY, method=4)
+    else:
+        single = fitz.open()
+        single.insert_pdf(doc, from_page=page_no - 1, to_page=page_no - 1)
+        single.save(tmp_path, garbage=4, deflate=True)
+        single.close()
+    # Readers never see a half-written file
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def prerender_page(doc, pdf_path: str, page_no: int, output_dir: str = PAGE_OUTPUT_DIR):
+    """
+    Renders one page of `doc` (preview + single-page PDF) during ingest.
+    """
+    out_dir = os.path.join(output_dir, catalog_slug(pdf_path))
+    os.makedirs(out_dir, exist_ok=True)
+    for kind in PAGE_KINDS:
+        render_page(doc, page_no, kind, os.path.join(out_dir, page_filename(page_no, kind)))
+    return out_dir
+
+
+def prerender_pages(doc, pdf_path: str, output_dir: str = PAGE_OUTPUT_DIR):
+    """
+    Renders every page of `doc` (preview + single-page PDF) during ingest.
+    """
+    for page_no in range(1, len(doc) + 1):
+        prerender_page(doc, pdf_path, page_no, output_dir)
+    return os.path.join(output_dir, catalog_slug(pdf_path))
+
+
+def find_catalogs(data_dir: str = "Data"):
+    """
+    slug -> PDF path for every catalog PDF under `data_dir`.
+    """
+    catalogs = {}
+    for root, _, files in os.walk(data_dir):
+        if os.path.abspath(root).startswith(os.path.abspath(os.path.join(data_dir, "processed"))):
+            continue
+        for name in files:
+            if name.lower().endswith(".pdf"):
+                path = os.path.join(root, name)
+                catalogs[catalog_slug(path)] = path
+    return catalogs
+
+
+class PageCache:
+    """
+    Serves pre-rendered pages and renders missing ones on demand into an
+    LRU disk cache bounded by `max_bytes`. Evicted files are deleted only
+    after EVICT_GRACE_SECONDS, since a response may still be streaming them.
+    """
+
+    def __init__(self, catalogs, output_dir=PAGE_OUTPUT_DIR, cache_dir=PAGE_CACHE_DIR,
+                 max_bytes=512 * 1024 * 1024):
+        self.catalogs = catalogs
+        self.output_dir = output_dir
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+        self._entries = OrderedDict()  # path -> size, least recently used first
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._render_locks = {}
+        self._page_counts = {}  # slug -> pages in the catalog PDF
+        self._evicted = {}  # path -> monotonic time after which it is deleted
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_existing()
+
+    def _load_existing(self):
+        existing = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                if name.endswith(".tmp"):
+                    os.remove(path)
+                    continue
+                stat = os.stat(path)
+                existing.append((stat.st_atime, path, stat.st_size))
+        for _, path, size in sorted(existing):
+            self._entries[path] = size
+            self._total_bytes += size
+
+    def page_count(self, slug: str):
+        count = self._page_counts.get(slug)
+        if count is None:
+            doc = fitz.open(self.catalogs[slug])
+            try:
+                count = len(doc)
+            finally:
+                doc.close()
+            self._page_counts[slug] = count
+        return count
+
+    def get(self, slug: str, page_no: int, kind: str, output_dir: str = None):
+        """
+        Returns a path for the requested page, or None if the catalog or page
+        does not exist. `output_dir` overrides where pre-rendered pages are
+        looked up (the live catalog version's pages directory).
+        """
+        pdf_path = self.catalogs.get(slug)
+        if pdf_path is None or kind not in PAGE_KINDS or page_no < 1:
+            return None
+
+        filename = page_filename(page_no, kind)
+        prerendered = os.path.join(output_dir or self.output_dir, slug, filename)
+        if os.path.exists(prerendered):
+            CACHE_EVENTS.inc(cache="page", outcome="prerendered")
+            return prerendered
+
+        # Out-of-range pages never reach the render locks or open the PDF again
+        if page_no > self.page_count(slug):
+            return None
+
+        cached = os.path.join(self.cache_dir, slug, filename)
+        with self._lock:
+            if cached in self._entries and os.path.exists(cached):
+                self._entries.move_to_end(cached)
+                CACHE_EVENTS.inc(cache="page", outcome="hit")
+                return cached
+            render_lock = self._render_locks.setdefault(cached, threading.Lock())
+
+        try:
+            with render_lock:
+                # Another request may have rendered it while we waited
+                if not os.path.exists(cached):
+                    CACHE_EVENTS.inc(cache="page", outcome="miss")
+                    doc = fitz.open(pdf_path)
+                    try:
+                        os.makedirs(os.path.dirname(cached), exist_ok=True)
+                        render_page(doc, page_no, kind, cached)
+                    finally:
+                        doc.close()
+        finally:
+            with self._lock:
+                self._render_locks.pop(cached, None)
+
+        with self._lock:
+            # Requested again during its grace period: back in the cache
+            self._evicted.pop(cached, None)
+            if cached not in self._entries:
+                size = os.path.getsize(cached)
+                self._entries[cached] = size
+                self._total_bytes += size
+            self._entries.move_to_end(cached)
+            self._evict(keep=cached)
+        return cached
+
+    def _evict(self, keep=None):
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            path, size = next(iter(self._entries.items()))
+            if path == keep:
+                self._entries.move_to_end(path)
+                continue
+            del self._entries[path]
+            self._total_bytes -= size
+            self._evicted[path] = time.monotonic() + EVICT_GRACE_SECONDS
+        self._delete_evicted()
+
+    def _delete_evicted(self):
+        now = time.monotonic()
+        for path, deadline in list(self._evicted.items()):
+            if deadline > now:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                # Still open (Windows); retry on a later eviction
+                continue
+            del self._evicted[path]
@@ -0,0 +1,244 @@
+import re
+from difflib import SequenceMatcher
+from .catalog_parser import FIELD_ORDER
+from .collection_index import CollectionIndex
+
+# Words that turn a field lookup into an open-ended question for the LLM
+OPEN_ENDED = re.compile(
+    r"\b(suggest|recommend|ideas?|inspir\w*|compare|comparison|versus|vs|better|best|cheap\w*|"
+    r"should|why|difference|similar|alternatives?|under|below|above|between|match(es|ing)?)\b"
+)
+
+# Field lookups the catalog answers directly, in answer order
+FIELD_INTENTS = {
+    "price": re.compile(r"\b(prices?|priced|costs?|how much)\b"),
+    "warranty": re.compile(r"\b(warrant(y|ies)|guarantee[ds]?)\b"),
+    "delivery": re.compile(r"\b(deliver(y|ed|s)?|shipping|ship|lead time)\b"),
+    "installation": re.compile(r"\b(install(ation|ed|ing)?|fitting)\b"),
+    "material": re.compile(r"\b(materials?|made (of|from)|built from)\b"),
+    "color": re.compile(r"\b(colou?rs?|finish(es)?)\b"),
+    "size": re.compile(r"\b(sizes?|dimensions?|how big|measurements?)\b"),
+    "style": re.compile(r"\bstyles?\b"),
+}
+
+FIELD_TEMPLATES = {
+    "price": "The price of {product} is {value}.",
+    "warranty": "{product} comes with a warranty of {value}.",
+    "delivery": "Delivery for {product}: {value}.",
+    "installation": "Installation for {product}: {value}.",
+    "material": "{product} is made of {value}.",
+    "color": "{product} comes in {value}.",
+    "size": "The size of {product} is {value}.",
+    "style": "{product} is a {value} style design.",
+}
+
+# Ignored when a question names a group of products instead of one
+FILLER_WORDS = {
+    "what", "whats", "which", "is", "are", "the", "a", "an", "of", "on", "for", "in", "to", "do", "does",
+    "you", "your", "it", "its", "me", "tell", "about", "and", "with", "please", "there", "any", "all",
+    "collection", "collections", "range", "series", "line", "products", "product", "designs", "design",
+    "items", "offer", "have", "get", "give", "list", "catalog", "how", "much", "long", "made", "from", "time",
+    "lead", "big",
+}
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+_DIGIT = re.compile(r"\d")
+
+INDEX_FIELDS = ["id", "product", "category", "page", *FIELD_ORDER]
+IMAGE_FIELDS = ["path", "pdf_path", "page_source", "category_source", "content_hash", "ocr_text"]
+
+
+def tokens(text):
+    return _TOKEN.findall((text or "").lower())
+
+
+def detect_field_intent(question):
+    """
+    Catalog fields a question asks for, or [] when it is open-ended.
+    """
+    q = question.lower()
+    if OPEN_ENDED.search(q):
+        return []
+    return [field for field, pattern in FIELD_INTENTS.items() if pattern.search(q)]
+
+
+def _same_numbers(a, b):
+    # "Layout 1-1" must never fuzzy-match "Layout 1-2"
+    return [t for t in a if _DIGIT.search(t)] == [t for t in b if _DIGIT.search(t)]
+
+
+class ProductIndex(CollectionIndex):
+    """
+    In-memory product-name index over unified_nodes for extractive
+    answers. Names are matched exactly on word windows of the question,
+    then fuzzily (difflib ratio >= `fuzzy_cutoff`, numbers must agree).
+    Only the structured fields and image references are kept, no
+    vectors. Refreshed in the background (see CollectionIndex).
+    """
+
+    label = "Product index"
+
+    def __init__(self, get_collection, ttl=300, fuzzy_cutoff=0.85):
+        super().__init__(get_collection, ttl)
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self._by_name = {}       # normalized name -> [node]
+        self._by_token = {}      # token -> set of normalized names
+        self._lengths = []       # distinct name lengths in tokens, longest first
+
+    # ---------------- Build ----------------
+
+    def projection(self):
+        projection = {f: 1 for f in INDEX_FIELDS}
+        projection.update({f"related_images.{f}": 1 for f in IMAGE_FIELDS})
+        return projection
+
+    def build(self, docs):
+        by_name, by_token = {}, {}
+        for doc in docs:
+            key = " ".join(tokens(doc.get("product")))
+            if not key:
+                continue
+            node = {f: doc.get(f, "") for f in INDEX_FIELDS}
+            node["related_images"] = [
+                {f: img.get(f) for f in IMAGE_FIELDS if f in img} for img in doc.get("related_images", [])
+            ]
+            by_name.setdefault(key, []).append(node)
+            for t in key.split():
+                by_token.setdefault(t, set()).add(key)
+        self._by_name, self._by_token = by_name, by_token
+        self._lengths = sorted({len(k.split()) for k in by_name}, reverse=True)
+        return len(by_name)
+
+    # ---------------- Lookup ----------------
+
+    def _windows(self, words, n):
+        for i in range(len(words) - n + 1):
+            yield i, words[i:i + n]
+
+    def match_exact(self, words):
+        """
+        (nodes, used word positions) for every product named exactly in
+        `words`, longest names first and without overlaps, or None.
+        """
+        nodes, used = [], set()
+        for n in self._lengths:
+            for i, window in self._windows(words, n):
+                span = set(range(i, i + n))
+                if span & used:
+                    continue
+                found = self._by_name.get(" ".join(window))
+                if found:
+                    nodes.extend(found)
+                    used |= span
+        return (nodes, used) if nodes else None
+
+    def match_fuzzy(self, words):
+        candidates = set()
+        for t in words:
+            candidates |= self._by_token.get(t, set())
+        best, best_span, best_ratio = None, None, self.fuzzy_cutoff
+        for key in candidates:
+            name = key.split()
+            for n in {len(name) - 1, len(name), len(name) + 1}:
+                n = max(n, 1)
+                for i, window in self._windows(words, n):
+                    if not _same_numbers(window, name):
+                        continue
+                    matcher = SequenceMatcher(None, " ".join(window), key)
+                    if matcher.quick_ratio() < best_ratio:
+                        continue
+                    ratio = matcher.ratio()
+                    if ratio > best_ratio:
+                        best, best_span, best_ratio = key, set(range(i, i + n)), ratio
+        return (self._by_name[best], best_span) if best else None
+
+    def match_group(self, words, intent_words):
+        """
+        Products whose names contain every remaining word of the question,
+        e.g. "warranty on the wardrobe collection".
+        """
+        wanted = {w for w in words if w not in FILLER_WORDS and w not in intent_words}
+        if not wanted:
+            return None
+        keys = None
+        for w in wanted:
+            keys = self._by_token.get(w, set()) if keys is None else keys & self._by_token.get(w, set())
+        if not keys:
+            # A bare category ("kitchen") selects the whole category
+            if len(wanted) == 1:
+                category = next(iter(wanted))
+                nodes = [n for ns in self._by_name.values() for n in ns if n["category"] == category]
+                return nodes or None
+            return None
+        return [n for k in sorted(keys) for n in self._by_name[k]]
+
+    def lookup(self, question):
+        """
+        (fields, nodes, how) for a structured field question about named
+        products, or None when the question should go to the LLM.
+        """
+        fields = detect_field_intent(question)
+        if not fields:
+            return None
+        self.ensure_fresh()
+        if not self._by_name:
+            return None
+        words = tokens(question)
+        intent_words = {w for w in words for p in FIELD_INTENTS.values() if p.fullmatch(w)}
+
+        match, how = self.match_exact(words), "exact"
+        if match is None:
+            match, how = self.match_fuzzy(words), "fuzzy"
+        if match is not None:
+            nodes, used = match
+            # "layout 1-1 and 1-2": a number outside the matched names may be
+            # another product the index could not resolve, so let the LLM answer
+            if any(_DIGIT.search(w) for i, w in enumerate(words) if i not in used):
+                return None
+        else:
+            nodes, how = self.match_group(words, intent_words), "group"
+        if not nodes:
+            return None
+        return fields, nodes, how
+
+
+def format_answer(fields, nodes, max_lines=10):
+    """
+    Template answer from the stored fields, or None when none of the
+    requested fields is filled in (the OCR text may still have it) or a
+    group has too many different values to list.
+    """
+    if not any(str(node.get(field) or "").strip() for field in fields for node in nodes):
+        return None
+    if len(nodes) == 1:
+        node = nodes[0]
+        sentences = []
+        for field in fields:
+            value = str(node.get(field) or "").strip()
+            if value:
+                sentences.append(FIELD_TEMPLATES[field].format(product=node["product"], value=value))
+            else:
+                sentences.append(f"The catalog does not list a {field} for {node['product']}.")
+        return " ".join(sentences)
+
+    parts = []
+    for field in fields:
+        values = {}
+        for node in nodes:
+            value = str(node.get(field) or "").strip()
+            if value:
+                values.setdefault(value, []).append(node["product"])
+        if not values:
+            parts.append(f"The catalog does not list a {field} for these {len(nodes)} products.")
+        elif len(values) == 1:
+            value = next(iter(values))
+            parts.append(f"All {len(nodes)} matching products have the same {field}: {value}.")
+        else:
+            if len(nodes) > max_lines:
+                return None
+            lines = [f"{field.capitalize()} by product:"]
+            for node in nodes:
+                value = str(node.get(field) or "").strip() or "not listed"
+                lines.append(f"- {node['product']}: {value}")
+            parts.append("\n".join(lines))
+    return "\n\n".join(parts)
@@ -1,19 +1,29 @@
+from itertools import islice
 import torch
 from PIL import Image
 from sentence_transformers import SentenceTransformer
 from transformers import CLIPProcessor, CLIPModel
+from .chunking import TokenChunker
 
 
 class RAGTools:
 
-    def __init__(self):
+    # Recorded in catalog snapshots so vectors are never mixed across models
+    TEXT_MODEL = "all-MiniLM-L6-v2"
+    CLIP_MODEL = "openai/clip-vit-base-patch32"
 
-        print("Loading Text Embedding Model (MiniLM)...")
-        self.text_model = SentenceTransformer("all-MiniLM-L6-v2")  # 384 dims
+    def __init__(self, text_model=None, clip_model=None):
 
-        print("Loading CLIP Model...")
-        self.clip_model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
-        self.clip_processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
+        # Other models are picked through backend.embedding_versions
+        self.text_model_name = text_model or self.TEXT_MODEL
+        self.clip_model_name = clip_model or self.CLIP_MODEL
+
+        print(f"Loading Text Embedding Model ({self.text_model_name})...")
+        self.text_model = SentenceTransformer(self.text_model_name)  # 384 dims for MiniLM
+
+        print(f"Loading CLIP Model ({self.clip_model_name})...")
+        self.clip_model = CLIPModel.from_pretrained(self.clip_model_name)
+        self.clip_processor = CLIPProcessor.from_pretrained(self.clip_model_name)
 
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         self.clip_model.to(self.device)
@@ -26,27 +36,46 @@ class RAGTools:
     def get_embeddings(self, text: str):
         return self.text_model.encode(text).tolist()
 
+    def get_embeddings_batch(self, texts, batch_size=64):
+        if not texts:
+            return []
+        return self.text_model.encode(list(texts), batch_size=batch_size).tolist()
+
 
     # ---------------- Chunking ----------------
 
-    def get_chunks(self, text, chunk_size=500, overlap=100):
+    @property
+    def max_chunk_tokens(self):
+        # Text model window minus [CLS] and [SEP]
+        return self.text_model.max_seq_length - 2
+
+    def get_chunks(self, source, chunk_size=None, overlap=32):
 
-        words = text.split()
-        chunks = []
+        # Generator over a string, file object or iterable of strings.
+        # chunk_size/overlap are MiniLM tokens; chunks never exceed the model window.
+        max_tokens = min(chunk_size or self.max_chunk_tokens, self.max_chunk_tokens)
+        chunker = TokenChunker(self.text_model.tokenizer, max_tokens=max_tokens, overlap=overlap)
+        return chunker.chunks(source)
 
-        for i in range(0, len(words), chunk_size - overlap):
-            chunk = " ".join(words[i:i + chunk_size])
-            if chunk.strip():
-                chunks.append(chunk)
+    def embed_chunks(self, chunks, batch_size=64):
 
-        return chunks
+        # Pulls chunks lazily and yields (chunk, vector), one encode call per batch
+        it = iter(chunks)
+        while True:
+            batch = list(islice(it, batch_size))
+            if not batch:
+                return
+            yield from zip(batch, self.get_embeddings_batch(batch, batch_size=batch_size))
 
 
     # ---------------- CLIP Image Embeddings ----------------
 
-    def get_clip_image_embedding(self, image_path):
+    def get_clip_image_embedding(self, image):
 
-        image = Image.open(image_path).convert("RGB")
+        # Accepts a file path or an already decoded PIL image
+        if isinstance(image, str):
+            image = Image.open(image)
+        image = image.convert("RGB")
 
         inputs = self.clip_processor(images=image, return_tensors="pt").to(self.device)
 
@@ -57,6 +86,23 @@ class RAGTools:
 
         return emb.cpu().numpy()[0].tolist()
 
+    def get_clip_image_embeddings(self, images, batch_size=16):
+
+        # Batched forward passes over in-memory PIL images
+        vectors = []
+
+        for i in range(0, len(images), batch_size):
+            batch = [img.convert("RGB") for img in images[i:i + batch_size]]
+            inputs = self.clip_processor(images=batch, return_tensors="pt").to(self.device)
+
+            with torch.no_grad():
+                emb = self.clip_model.get_image_features(**inputs)
+
+            emb = emb / emb.norm(dim=-1, keepdim=True)
+            vectors.extend(emb.cpu().numpy().tolist())
+
+        return vectors
+
 
     # ---------------- CLIP Text Embedding (Optional) ----------------
 
@@ -70,3 +116,20 @@ class RAGTools:
         emb = emb / emb.norm(dim=-1, keepdim=True)
 
         return emb.cpu().numpy()[0].tolist()
+
+    def get_clip_text_embeddings(self, texts, batch_size=64):
+
+        # Batched get_clip_text_embedding, for ask_many
+        vectors = []
+
+        for i in range(0, len(texts), batch_size):
+            inputs = self.clip_processor(text=list(texts[i:i + batch_size]), return_tensors="pt",
+                                         padding=True, truncation=True).to(self.device)
+
+            with torch.no_grad():
+                emb = self.clip_model.get_text_features(**inputs)
+
+            emb = emb / emb.norm(dim=-1, keepdim=True)
+            vectors.extend(emb.cpu().numpy().tolist())
+
+        return vectors
@@ -0,0 +1,153 @@
+import os
+import threading
+from PIL import Image
+from pymongo import UpdateOne
+from .bulk_writer import BulkWriter
+from .ingest_pipeline import StreamingPipeline, Stage
+from .embedding_versions import get_version, embedding_field
+
+# Images are decoded at no more than this size; CLIP resizes to 224 anyway
+DECODE_SIZE = (448, 448)
+
+
+def load_image(path, image_root=None):
+    """
+    Decoded RGB image, or None when the file is missing or unreadable.
+    """
+    full = os.path.join(image_root, path) if image_root and not os.path.isabs(path) else path
+    try:
+        with Image.open(full) as img:
+            img.draft("RGB", DECODE_SIZE)  # JPEG decodes at reduced scale
+            img = img.convert("RGB")
+            img.thumbnail(DECODE_SIZE)
+            return img
+    except (OSError, ValueError) as e:
+        print(f"Re-embed: cannot read {full}: {e}")
+        return None
+
+
+class ReembedJob:
+    """
+    Adds an embedding version to an existing collection in place.
+
+    Nodes missing the version's field are streamed from Mongo in batches,
+    their stored combined_text (text versions) or image files (CLIP
+    versions) go through the batched encoders, and the vectors are $set
+    next to the existing ones. Nothing is re-OCRed and the current fields
+    keep serving until DatabaseHandler is pointed at the new version.
+    Only nodes still missing the field are selected, so an interrupted
+    job picks up where it stopped. Images that cannot be read get a null
+    vector, which the search index skips.
+    """
+
+    def __init__(self, collection, version, rag_tools, batch_size=64, write_batch_size=200,
+                 image_root=None, load_workers=2, force=False):
+        self.collection = collection
+        self.version = version
+        self.kind = get_version(version)["kind"]
+        self.field = embedding_field(version)
+        self.rag_tools = rag_tools
+        self.batch_size = batch_size
+        self.write_batch_size = write_batch_size
+        self.image_root = image_root
+        self.load_workers = load_workers
+        self.force = force
+        self.stats = {"nodes": 0, "images": 0, "unreadable": 0}
+        self._lock = threading.Lock()
+        self.pipeline = None
+        self.writer = None
+
+    def _count(self, **deltas):
+        with self._lock:
+            for key, n in deltas.items():
+                self.stats[key] += n
+
+    def pending_filter(self):
+        if self.force:
+            return {}
+        if self.kind == "text":
+            return {self.field: {"$exists": False}}
+        return {"related_images": {"$elemMatch": {self.field: {"$exists": False}}}}
+
+    def pending_count(self):
+        return self.collection.count_documents(self.pending_filter())
+
+    def _batches(self):
+        if self.kind == "text":
+            projection = {"_id": 1, "combined_text": 1}
+        else:
+            projection = {"_id": 1, "related_images.path": 1}
+        cursor = self.collection.find(self.pending_filter(), projection).batch_size(self.batch_size * 4)
+        batch = []
+        for doc in cursor:
+            batch.append(doc)
+            if len(batch) == self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    # ---------------- Stages ----------------
+
+    def _load_images(self, batch):
+        for doc in batch:
+            doc["_images"] = [load_image(img.get("path", ""), self.image_root)
+                              for img in doc.get("related_images", [])]
+        return batch
+
+    def _encode(self, batch):
+        if self.kind == "text":
+            vectors = self.rag_tools.get_embeddings_batch([d.get("combined_text", "") for d in batch],
+                                                          batch_size=self.batch_size)
+            updates = [{"_id": d["_id"], "set": {self.field: v}} for d, v in zip(batch, vectors)]
+            self._count(nodes=len(batch))
+            return updates
+
+        images = [img for d in batch for img in d["_images"] if img is not None]
+        vectors = iter(self.rag_tools.get_clip_image_embeddings(images))
+        updates, unreadable = [], 0
+        for d in batch:
+            fields = {}
+            for i, img in enumerate(d["_images"]):
+                # Positional paths keep each vector on its own related_images entry
+                fields[f"related_images.{i}.{self.field}"] = next(vectors) if img is not None else None
+                unreadable += img is None
+            if fields:
+                updates.append({"_id": d["_id"], "set": fields})
+        self._count(nodes=len(batch), images=len(images), unreadable=unreadable)
+        return updates
+
+    def _write(self, updates):
+        self.writer.add_many(updates)
+        return updates
+
+    # ---------------- Run ----------------
+
+    def run(self):
+        print(f"Re-embedding {self.collection.name} as {self.version} ({self.field}): "
+              f"{self.pending_count()} nodes pending")
+        self.writer = BulkWriter(self.collection, key="_id", batch_size=self.write_batch_size,
+                                 to_op=lambda u: UpdateOne({"_id": u["_id"]}, {"$set": u["set"]}))
+        stages = [Stage("encode", self._encode), Stage("write", self._write)]
+        if self.kind == "clip":
+            stages.insert(0, Stage("load", self._load_images, workers=self.load_workers))
+        self.pipeline = StreamingPipeline(stages, queue_size=4)
+        self.pipeline.run(self._batches())
+        self.writer.close()
+        print(self.pipeline.report())
+        print(self.writer.report())
+        print(f"Re-embedded {self.stats['nodes']} nodes, {self.stats['images']} images "
+              f"({self.stats['unreadable']} unreadable)")
+        return self.complete()
+
+    def complete(self):
+        stage_errors = sum(self.pipeline.stats[s.name]["errors"] for s in self.pipeline.stages)
+        return stage_errors == 0 and self.writer.stats["failed"] == 0
+
+    def start(self):
+        """
+        Runs the job on a daemon thread, e.g. next to a serving process.
+        """
+        thread = threading.Thread(target=self.run, name=f"reembed-{self.version}", daemon=True)
+        thread.start()
+        return thread
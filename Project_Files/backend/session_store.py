@@ -0,0 +1,250 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from pymongo import DeleteOne, UpdateOne
+from .telemetry import get_logger, log_event, SESSION_WRITES_DROPPED
+
+logger = get_logger("remodel.session_store")
+
+# Rough per-message bookkeeping cost (dict, strings, list slot)
+MESSAGE_OVERHEAD_BYTES = 200
+
+
+class _Session:
+    __slots__ = ("messages", "size", "last_access")
+
+    def __init__(self, messages=None):
+        self.messages = messages or []
+        self.size = sum(_message_size(m) for m in self.messages)
+        self.last_access = time.monotonic()
+
+
+def _message_size(message):
+    return len(message["content"].encode("utf-8")) + MESSAGE_OVERHEAD_BYTES
+
+
+def _snapshot_size(messages):
+    # None is a queued delete
+    return sum(_message_size(m) for m in messages) if messages is not None else 0
+
+
+class SessionStore:
+    """
+    In-memory chat histories keyed by session id.
+
+    Total memory is bounded by `max_bytes`: the least recently used sessions
+    are evicted first, and sessions idle for longer than `idle_ttl` seconds
+    are dropped on the next write. Each session keeps at most `max_messages`
+    messages. When a Mongo collection is given, changed sessions and deletes
+    are written behind in batches, in order, and evicted sessions are
+    reloaded on demand. Snapshots waiting for Mongo are bounded separately
+    by `max_pending_bytes` (default a quarter of `max_bytes`); past it the
+    oldest pending writes are dropped and counted.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_messages=20, idle_ttl=3600,
+                 collection=None, flush_interval=5.0, max_pending_bytes=None):
+        self.max_bytes = max_bytes
+        self.max_pending_bytes = max_pending_bytes if max_pending_bytes is not None else max_bytes // 4
+        self.max_messages = max_messages
+        self.idle_ttl = idle_ttl
+        self.collection = collection
+        self.flush_interval = flush_interval
+
+        self._sessions = OrderedDict()
+        self._total_bytes = 0
+        self._dirty = OrderedDict()  # session id -> messages snapshot, or None for a delete; oldest first
+        self._dirty_bytes = 0
+        self._flushing = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flusher = None
+
+        if self.collection is not None:
+            self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+            self._flusher.start()
+
+    # ---------------- Public API ----------------
+
+    def get_history(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._touch(session_id, session)
+                return list(session.messages)
+
+        session = self._load(session_id)
+        if session is None:
+            return []
+
+        with self._lock:
+            if session_id not in self._sessions:
+                self._insert(session_id, session)
+            return list(self._sessions[session_id].messages)
+
+    def append(self, session_id, role, content):
+        message = {"role": role, "content": content}
+
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = _Session()
+                self._insert(session_id, session)
+            else:
+                self._touch(session_id, session)
+
+            session.messages.append(message)
+            added = _message_size(message)
+            session.size += added
+            self._total_bytes += added
+
+            while len(session.messages) > self.max_messages:
+                removed = _message_size(session.messages.pop(0))
+                session.size -= removed
+                self._total_bytes -= removed
+
+            self._mark_dirty(session_id, session)
+            self._evict_idle()
+            self._evict_to_budget(keep=session_id)
+
+    def delete(self, session_id):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self._total_bytes -= session.size
+            if self.collection is not None:
+                # Queued behind any in-flight upsert of the session, so it cannot come back
+                self._queue_write(session_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "pending_writes": len(self._dirty),
+                "pending_bytes": self._dirty_bytes,
+            }
+
+    def close(self):
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=self.flush_interval + 1)
+        self.flush()
+
+    # ---------------- Eviction ----------------
+
+    def _insert(self, session_id, session):
+        self._sessions[session_id] = session
+        self._total_bytes += session.size
+
+    def _touch(self, session_id, session):
+        session.last_access = time.monotonic()
+        self._sessions.move_to_end(session_id)
+
+    def _evict(self, session_id):
+        session = self._sessions.pop(session_id)
+        self._total_bytes -= session.size
+
+    def _evict_idle(self):
+        cutoff = time.monotonic() - self.idle_ttl
+        # Oldest sessions sit at the front of the OrderedDict
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_access >= cutoff:
+                break
+            self._evict(session_id)
+
+    def _evict_to_budget(self, keep=None):
+        while self._total_bytes > self.max_bytes and len(self._sessions) > 1:
+            session_id = next(iter(self._sessions))
+            if session_id == keep:
+                self._sessions.move_to_end(session_id)
+                continue
+            self._evict(session_id)
+
+    # ---------------- Write-behind persistence ----------------
+
+    def _mark_dirty(self, session_id, session):
+        if self.collection is not None:
+            # Snapshot the messages so the flusher never reads a list being mutated
+            self._queue_write(session_id, list(session.messages))
+
+    def _queue_write(self, session_id, messages):
+        old = self._dirty.pop(session_id, None)
+        self._dirty_bytes -= _snapshot_size(old)
+        self._dirty[session_id] = messages
+        self._dirty_bytes += _snapshot_size(messages)
+        self._trim_pending(keep=session_id)
+
+    def _trim_pending(self, keep=None):
+        # While Mongo is unreachable, pending snapshots are the only copy of evicted sessions
+        for session_id in list(self._dirty):
+            if self._dirty_bytes <= self.max_pending_bytes:
+                break
+            messages = self._dirty[session_id]
+            if session_id == keep or messages is None:
+                continue
+            del self._dirty[session_id]
+            self._dirty_bytes -= _snapshot_size(messages)
+            SESSION_WRITES_DROPPED.inc(reason="pending_budget")
+            log_event(logger, logging.WARNING, "pending session write dropped", session_id=session_id)
+
+    def _load(self, session_id):
+        if self.collection is None:
+            return None
+        # An evicted or deleted session may have writes Mongo has not seen yet
+        with self._lock:
+            for queue in (self._dirty, self._flushing):
+                if session_id in queue:
+                    pending = queue[session_id]
+                    return _Session(list(pending)) if pending is not None else None
+        doc = self.collection.find_one({"_id": session_id}, {"messages": 1})
+        if not doc:
+            return None
+        return _Session(doc.get("messages", [])[-self.max_messages:])
+
+    def flush(self):
+        if self.collection is None:
+            return 0
+
+        with self._lock:
+            pending, self._dirty = self._dirty, OrderedDict()
+            self._dirty_bytes = 0
+            self._flushing = pending
+
+        if not pending:
+            return 0
+
+        ops = [
+            DeleteOne({"_id": session_id}) if messages is None else UpdateOne(
+                {"_id": session_id},
+                {"$set": {"messages": messages, "updated_at": time.time()}},
+                upsert=True,
+            )
+            for session_id, messages in pending.items()
+        ]
+        try:
+            self.collection.bulk_write(ops, ordered=False)
+        except Exception as e:
+            log_event(logger, logging.WARNING, "write-behind flush failed", error=str(e), sessions=len(ops))
+            with self._lock:
+                # Re-queue as the oldest entries, unless the session was written or deleted meanwhile
+                requeued = OrderedDict(
+                    (session_id, messages) for session_id, messages in pending.items()
+                    if session_id not in self._dirty
+                )
+                requeued.update(self._dirty)
+                self._dirty = requeued
+                self._dirty_bytes = sum(_snapshot_size(m) for m in requeued.values())
+                self._flushing = {}
+                self._trim_pending()
+            return 0
+        with self._lock:
+            self._flushing = {}
+        return len(ops)
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
@@ -0,0 +1,495 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import numpy as np
+
+try:
+    # Optional: only needed to export or load snapshots
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pc = pq = None
+
+from .bulk_writer import BulkWriter
+from .attributes import RANGE_FIELDS, node_attributes
+from .catalog_versions import PROCESSED_DIR
+
+FORMAT_VERSION = 1
+SNAPSHOT_DIR = "Data/snapshots"
+
+NODES_FILE = "nodes.parquet"
+IMAGES_FILE = "images.parquet"
+TEXT_VECTORS_FILE = "text_vectors.f32"
+CLIP_VECTORS_FILE = "clip_vectors.f32"
+MANIFEST_FILE = "manifest.json"
+
+# Node and image fields stored as typed columns; anything else goes to "extra" as JSON
+NODE_STRING_FIELDS = ["id", "category", "product", "style", "material", "color", "size", "price",
+                      "warranty", "delivery", "installation", "description", "combined_text"]
+IMAGE_STRING_FIELDS = ["path", "content_hash", "pdf_path", "category_source", "ocr_text", "text_source"]
+ROW_GROUP_SIZE = 10_000
+
+
+def _schemas():
+    nodes = pa.schema(
+        [(f, pa.string()) for f in NODE_STRING_FIELDS]
+        + [("page", pa.int32()), ("image_paths", pa.list_(pa.string())),
+           ("has_embedding", pa.bool_()), ("extra", pa.string())]
+    )
+    images = pa.schema(
+        [("node_row", pa.int32())]
+        + [(f, pa.string()) for f in IMAGE_STRING_FIELDS]
+        + [("page_source", pa.int32()), ("has_clip", pa.bool_()), ("extra", pa.string())]
+    )
+    return nodes, images
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("pyarrow is required for catalog snapshots")
+
+
+def _file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _str_or_none(value):
+    return None if value is None else str(value)
+
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _numpy(arr):
+    # Array or ChunkedArray (e.g. a compute result) to numpy; copies bool/null-bearing data
+    if isinstance(arr, pa.ChunkedArray):
+        arr = arr.combine_chunks()
+    return arr.to_numpy(zero_copy_only=False)
+
+
+def _vector_row(vector, dim, what):
+    if not vector:
+        return np.zeros(dim, dtype=np.float32), False
+    row = np.asarray(vector, dtype=np.float32)
+    if row.shape != (dim,):
+        raise ValueError(f"{what} has {row.shape[0]} dims, snapshot expects {dim}")
+    return row, True
+
+
+class _ColumnBuffer:
+    """
+    Rows accumulated column-wise and flushed to Parquet one row group at a time.
+    """
+
+    def __init__(self, path, schema):
+        self.schema = schema
+        self.writer = pq.ParquetWriter(path, schema)
+        self.columns = {name: [] for name in schema.names}
+        self.rows = 0
+
+    def append(self, row):
+        for name, values in self.columns.items():
+            values.append(row.get(name))
+        if len(self.columns["extra"]) >= ROW_GROUP_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.columns["extra"]:
+            self.writer.write_table(pa.table(self.columns, schema=self.schema))
+            self.rows += len(self.columns["extra"])
+            self.columns = {name: [] for name in self.schema.names}
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+# ---------------- Export ----------------
+
+def export_snapshot(docs, out_dir, models, text_dim=384, clip_dim=512, source=None):
+    """
+    Writes unified_nodes documents as a portable snapshot:
+
+        nodes.parquet       node fields, one row per node (row i = text vector i)
+        images.parquet      related_images, grouped by node (row j = CLIP vector j)
+        text_vectors.f32    float32 (nodes, text_dim), C order, no header
+        clip_vectors.f32    float32 (images, clip_dim)
+        manifest.json       models, shapes, file hashes
+
+    `docs` is any iterable (e.g. a Mongo cursor) and is consumed in one
+    pass. The snapshot is built next to `out_dir` and moved into place at
+    the end, so readers never see a partial one.
+    """
+    _require_pyarrow()
+    node_schema, image_schema = _schemas()
+    tmp_dir = f"{out_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    nodes = _ColumnBuffer(os.path.join(tmp_dir, NODES_FILE), node_schema)
+    images = _ColumnBuffer(os.path.join(tmp_dir, IMAGES_FILE), image_schema)
+    n_nodes = n_images = 0
+    with open(os.path.join(tmp_dir, TEXT_VECTORS_FILE), "wb") as text_out, \
+            open(os.path.join(tmp_dir, CLIP_VECTORS_FILE), "wb") as clip_out:
+        for doc in docs:
+            vector, has_embedding = _vector_row(doc.get("embedding"), text_dim, f"node {doc.get('id')}")
+            text_out.write(vector.tobytes())
+
+            for img in doc.get("related_images") or []:
+                clip, has_clip = _vector_row(img.get("clip_embedding"), clip_dim, f"image {img.get('path')}")
+                clip_out.write(clip.tobytes())
+                extra = {k: v for k, v in img.items()
+                         if k not in IMAGE_STRING_FIELDS and k not in ("page_source", "clip_embedding")}
+                images.append({
+                    "node_row": n_nodes,
+                    **{f: _str_or_none(img.get(f)) for f in IMAGE_STRING_FIELDS},
+                    "page_source": _int_or_none(img.get("page_source")),
+                    "has_clip": has_clip,
+                    "extra": json.dumps(extra, default=str),
+                })
+                n_images += 1
+
+            extra = {k: v for k, v in doc.items()
+                     if k not in NODE_STRING_FIELDS
+                     and k not in ("_id", "page", "image_paths", "related_images", "embedding")}
+            nodes.append({
+                **{f: _str_or_none(doc.get(f)) for f in NODE_STRING_FIELDS},
+                "page": _int_or_none(doc.get("page")),
+                "image_paths": [str(p) for p in doc.get("image_paths") or []],
+                "has_embedding": has_embedding,
+                "extra": json.dumps(extra, default=str),
+            })
+            n_nodes += 1
+    nodes.close()
+    images.close()
+
+    files = {}
+    for name in (NODES_FILE, IMAGES_FILE, TEXT_VECTORS_FILE, CLIP_VECTORS_FILE):
+        path = os.path.join(tmp_dir, name)
+        files[name] = {"sha256": _file_sha256(path), "bytes": os.path.getsize(path)}
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "source": source,
+        "models": models,
+        "nodes": n_nodes,
+        "images": n_images,
+        "vectors": {
+            "text": {"file": TEXT_VECTORS_FILE, "dtype": "<f4", "shape": [n_nodes, text_dim]},
+            "clip": {"file": CLIP_VECTORS_FILE, "dtype": "<f4", "shape": [n_images, clip_dim]},
+        },
+        "files": files,
+        "snapshot_id": hashlib.sha256(
+            "".join(files[name]["sha256"] for name in sorted(files)).encode()
+        ).hexdigest()[:16],
+    }
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+    os.replace(tmp_dir, out_dir)
+    print(f"Snapshot {manifest['snapshot_id']}: {n_nodes} nodes, {n_images} images -> {out_dir}")
+    return manifest
+
+
+# ---------------- Load ----------------
+
+class Snapshot:
+    """
+    Read-only view of an exported snapshot. Vector files are memory-mapped,
+    so every process opening the same snapshot shares one copy of the
+    vectors through the OS page cache; Parquet tables are memory-mapped too.
+    """
+
+    def __init__(self, path, verify=False, expected_models=None):
+        _require_pyarrow()
+        self.path = path
+        with open(os.path.join(path, MANIFEST_FILE), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported snapshot format {self.manifest.get('format_version')}")
+        if verify:
+            self.verify()
+        if expected_models:
+            mismatched = {k: v for k, v in expected_models.items() if self.manifest["models"].get(k) != v}
+            if mismatched:
+                raise ValueError(f"{path}: built with models {self.manifest['models']}, expected {expected_models}")
+
+        self.nodes = pq.read_table(os.path.join(path, NODES_FILE), memory_map=True)
+        self.images = pq.read_table(os.path.join(path, IMAGES_FILE), memory_map=True)
+        self.text_vectors = self._memmap("text")
+        self.clip_vectors = self._memmap("clip")
+
+        # images.parquet is grouped by node: node i owns rows offsets[i]:offsets[i + 1]
+        node_rows = _numpy(self.images["node_row"])
+        self.image_offsets = np.searchsorted(node_rows, np.arange(len(self) + 1)).astype(np.int64)
+
+    def _memmap(self, kind):
+        spec = self.manifest["vectors"][kind]
+        shape = tuple(spec["shape"])
+        if shape[0] == 0:
+            return np.zeros(shape, dtype=np.float32)
+        return np.memmap(os.path.join(self.path, spec["file"]), dtype=spec["dtype"], mode="r", shape=shape)
+
+    def __len__(self):
+        return self.manifest["nodes"]
+
+    @property
+    def snapshot_id(self):
+        return self.manifest["snapshot_id"]
+
+    def verify(self):
+        for name, info in self.manifest["files"].items():
+            digest = _file_sha256(os.path.join(self.path, name))
+            if digest != info["sha256"]:
+                raise ValueError(f"{self.path}: {name} does not match the manifest hash")
+
+    def document(self, i, with_vectors=True):
+        """
+        Node i in the unified_nodes document shape.
+        """
+        row = self.nodes.slice(i, 1).to_pylist()[0]
+        doc = {k: v for k, v in row.items() if k not in ("has_embedding", "extra") and v is not None}
+        doc.update(json.loads(row["extra"] or "{}"))
+        if with_vectors and row["has_embedding"]:
+            doc["embedding"] = self.text_vectors[i].tolist()
+
+        start, end = int(self.image_offsets[i]), int(self.image_offsets[i + 1])
+        related = []
+        for j, img in enumerate(self.images.slice(start, end - start).to_pylist(), start=start):
+            entry = {k: v for k, v in img.items() if k not in ("node_row", "has_clip", "extra") and v is not None}
+            entry.update(json.loads(img["extra"] or "{}"))
+            if with_vectors and img["has_clip"]:
+                entry["clip_embedding"] = self.clip_vectors[j].tolist()
+            related.append(entry)
+        doc["related_images"] = related
+        return doc
+
+    def iter_documents(self, with_vectors=True):
+        for i in range(len(self)):
+            yield self.document(i, with_vectors)
+
+
+def restore_mongo(snapshot, collection, batch_size=500, max_in_flight=4):
+    """
+    Upserts every node of `snapshot` into `collection` (keyed on "id").
+    """
+    writer = BulkWriter(collection, key="id", batch_size=batch_size, max_in_flight=max_in_flight)
+    writer.add_many(snapshot.iter_documents())
+    writer.close()
+    print(writer.report())
+    return writer.stats
+
+
+# ---------------- In-process search ----------------
+
+def _top_k(scores, limit):
+    limit = min(limit, len(scores))
+    if limit <= 0:
+        return np.empty(0, dtype=np.int64)
+    idx = np.argpartition(-scores, limit - 1)[:limit]
+    idx = idx[np.argsort(-scores[idx])]
+    return idx[np.isfinite(scores[idx])]
+
+
+class _SnapshotCursor:
+    def __init__(self, snapshot, rows):
+        self.snapshot = snapshot
+        self.rows = rows
+        self._limit = 0
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def __iter__(self):
+        rows = self.rows[:self._limit] if self._limit else self.rows
+        for i in rows:
+            yield self.snapshot.document(int(i))
+
+
+class SnapshotCollection:
+    """
+    The subset of pymongo's find() ChatEngine uses ($or, $and, $regex and
+    equality on node fields), evaluated with Arrow compute on the columns.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def _mask(self, query):
+        table = self.snapshot.nodes
+        mask = pa.array(np.ones(table.num_rows, dtype=bool))
+        for field, cond in (query or {}).items():
+            if field == "$or":
+                part = pa.array(np.zeros(table.num_rows, dtype=bool))
+                for q in cond:
+                    part = pc.or_(part, self._mask(q))
+            elif field == "$and":
+                part = mask
+                for q in cond:
+                    part = pc.and_(part, self._mask(q))
+            elif isinstance(cond, dict) and "$regex" in cond:
+                part = pc.match_substring_regex(
+                    table[field], cond["$regex"], ignore_case="i" in cond.get("$options", ""))
+            else:
+                part = pc.equal(table[field], cond)
+            mask = pc.and_(mask, pc.fill_null(part, False))
+        return mask
+
+    def find(self, query=None, projection=None):
+        rows = np.flatnonzero(_numpy(self._mask(query)))
+        return _SnapshotCursor(self.snapshot, rows)
+
+
+class SnapshotDatabaseHandler:
+    """
+    DatabaseHandler backed by a Snapshot instead of Atlas: brute-force
+    cosine search over the memory-mapped vectors. Suited to dev nodes and
+    catalogs that fit in the page cache; several workers opening the same
+    snapshot share its vector pages.
+    """
+
+    def __init__(self, path, expected_models=None):
+        self.snapshot = Snapshot(path, expected_models=expected_models)
+        self.unified_collection = SnapshotCollection(self.snapshot)
+        s = self.snapshot
+        # Files of the build that exported the snapshot (older snapshots: the shared layout)
+        self.asset_dir = (s.document(0, with_vectors=False).get("assets") if len(s) else None) or PROCESSED_DIR
+
+        # Per-process derived arrays (small next to the vectors themselves)
+        self._text_norms = np.linalg.norm(s.text_vectors, axis=1) if len(s) else np.zeros(0, dtype=np.float32)
+        self._has_embedding = _numpy(s.nodes["has_embedding"])
+        self._has_clip = _numpy(s.images["has_clip"])
+        counts = np.diff(s.image_offsets)
+        self._nodes_with_images = np.flatnonzero(counts > 0)
+        self._category_masks = {}
+        self._attributes = None
+        print(f"Serving catalog from snapshot {s.snapshot_id} ({len(s)} nodes, {s.manifest['images']} images)")
+
+    def _category_mask(self, category):
+        if not category:
+            return None
+        mask = self._category_masks.get(category)
+        if mask is None:
+            mask = _numpy(pc.fill_null(pc.equal(self.snapshot.nodes["category"], category), False))
+            self._category_masks[category] = mask
+        return mask
+
+    def _load_attributes(self):
+        # Parsed from the stored strings, so older snapshots get constraints too
+        nodes = self.snapshot.nodes
+        columns = {f: nodes[f].to_pylist() for f in ("price", "size", "material", "color")}
+        rows = [node_attributes({f: values[i] for f, values in columns.items()}) for i in range(len(self.snapshot))]
+        attributes = {
+            field: np.array([np.nan if r[field] is None else r[field] for r in rows], dtype=np.float64)
+            for field in RANGE_FIELDS.values()
+        }
+        for field in ("material_tokens", "color_tokens"):
+            attributes[field] = [set(r[field]) for r in rows]
+        return attributes
+
+    def _has_any(self, field, words):
+        return np.fromiter((bool(tokens & words) for tokens in self._attributes[field]),
+                           dtype=bool, count=len(self.snapshot))
+
+    def _constraint_mask(self, constraints):
+        """
+        Same semantics as attributes.constraint_clauses, on in-memory arrays.
+        """
+        if not constraints:
+            return None
+        if self._attributes is None:
+            self._attributes = self._load_attributes()
+        mask = np.ones(len(self.snapshot), dtype=bool)
+        for name, field in RANGE_FIELDS.items():
+            low, high = constraints.get(f"{name}_min"), constraints.get(f"{name}_max")
+            if low is not None:
+                mask &= self._attributes[field] >= low
+            if high is not None:
+                mask &= self._attributes[field] <= high
+        materials, colors = set(constraints.get("materials") or []), set(constraints.get("colors") or [])
+        shared = materials & colors
+        if shared:
+            mask &= self._has_any("material_tokens", shared) | self._has_any("color_tokens", shared)
+        if materials - shared:
+            mask &= self._has_any("material_tokens", materials - shared)
+        if colors - shared:
+            mask &= self._has_any("color_tokens", colors - shared)
+        return mask
+
+    def _filter_mask(self, category, constraints):
+        masks = [m for m in (self._category_mask(category), self._constraint_mask(constraints)) if m is not None]
+        if not masks:
+            return None
+        return masks[0] if len(masks) == 1 else masks[0] & masks[1]
+
+    def _documents(self, scores, limit, mask):
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+        return [self.snapshot.document(int(i)) for i in _top_k(scores, limit)]
+
+    def unified_search(self, query_embedding, limit=5, filter_dict=None, constraints=None):
+        q = np.asarray(query_embedding, dtype=np.float32)
+        scores = (self.snapshot.text_vectors @ q) / (self._text_norms * np.linalg.norm(q) + 1e-8)
+        scores = np.where(self._has_embedding, scores, -np.inf)
+        return self._documents(scores, limit, self._filter_mask((filter_dict or {}).get("category"), constraints))
+
+    def strict_visual_search(self, clip_text_embedding, category, limit=5, constraints=None):
+        s = self.snapshot
+        q = np.asarray(clip_text_embedding, dtype=np.float32)
+        image_scores = np.where(self._has_clip, s.clip_vectors @ q, -np.inf)
+
+        # Best image per node, like a vector index over related_images.clip_embedding
+        scores = np.full(len(s), -np.inf, dtype=np.float32)
+        if len(self._nodes_with_images):
+            scores[self._nodes_with_images] = np.maximum.reduceat(
+                image_scores, s.image_offsets[self._nodes_with_images])
+        return self._documents(scores, limit, self._filter_mask(category, constraints))
+
+    # ---------------- Multi-query ----------------
+
+    def unified_search_many(self, query_embeddings, limit=5, plans=None, block=64):
+        """
+        unified_search for a batch: one matrix product per `block` queries.
+        `plans` holds a (category, constraints) pair per query.
+        """
+        s = self.snapshot
+        q = np.asarray(query_embeddings, dtype=np.float32).reshape(-1, s.text_vectors.shape[1])
+        plans = plans or [(None, None)] * len(q)
+        q_norms = np.linalg.norm(q, axis=1)
+        results = []
+        for start in range(0, len(q), block):
+            scores = (q[start:start + block] @ s.text_vectors.T) / (
+                np.outer(q_norms[start:start + block], self._text_norms) + 1e-8)
+            scores = np.where(self._has_embedding, scores, -np.inf)
+            for row, (category, constraints) in zip(scores, plans[start:start + block]):
+                results.append(self._documents(row, limit, self._filter_mask(category, constraints)))
+        return results
+
+    def strict_visual_search_many(self, clip_text_embeddings, limit=5, plans=None, block=64):
+        s = self.snapshot
+        q = np.asarray(clip_text_embeddings, dtype=np.float32).reshape(-1, s.clip_vectors.shape[1])
+        plans = plans or [(None, None)] * len(q)
+        starts = s.image_offsets[self._nodes_with_images]
+        results = []
+        for start in range(0, len(q), block):
+            image_scores = np.where(self._has_clip, q[start:start + block] @ s.clip_vectors.T, -np.inf)
+            scores = np.full((len(image_scores), len(s)), -np.inf, dtype=np.float32)
+            if len(self._nodes_with_images):
+                scores[:, self._nodes_with_images] = np.maximum.reduceat(image_scores, starts, axis=1)
+            for row, (category, constraints) in zip(scores, plans[start:start + block]):
+                results.append(self._documents(row, limit, self._filter_mask(category, constraints)))
+        return results
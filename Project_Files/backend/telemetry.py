@@ -0,0 +1,202 @@
+import atexit
+import bisect
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Trace id of the request being served (set by the middleware in main.py)
+trace_id_var = contextvars.ContextVar("trace_id", default=None)
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def new_trace_id():
+    return uuid.uuid4().hex
+
+
+# ---------------- Structured, non-blocking logging ----------------
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        trace_id = getattr(record, "trace_id", None)
+        if trace_id:
+            payload["trace_id"] = trace_id
+        payload.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class _TraceQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Capture the trace id on the calling thread before the record changes threads
+        record.trace_id = trace_id_var.get()
+        return super().prepare(record)
+
+
+_listener = None
+
+
+def get_logger(name="remodel"):
+    """
+    Logger whose records are queued and written by a background thread, so
+    the request path never blocks on stdout. Output is one JSON object per line.
+    """
+    global _listener
+    logger = logging.getLogger(name)
+    if _listener is None:
+        log_queue = queue.SimpleQueue()
+        stream = logging.StreamHandler()
+        stream.setFormatter(JsonFormatter())
+        _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=False)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+        root = logging.getLogger("remodel")
+        root.addHandler(_TraceQueueHandler(log_queue))
+        root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+        root.propagate = False
+    return logger
+
+
+def log_event(logger, level, msg, **fields):
+    logger.log(level, msg, extra={"fields": fields})
+
+
+# ---------------- Metrics ----------------
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = list(zip(labelnames, key)) + (extra or [])
+    if not pairs:
+        return ""
+    escaped = [
+        (k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    ]
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if idx < len(self.buckets):
+                series[idx] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {key: list(series) for key, series in self._series.items()}
+        for key, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [("le", repr(float(bound)))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, [("le", "+Inf")])
+            lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "ask_stage_seconds", "Duration of each ChatEngine.ask stage", ["stage"]))
+STAGE_RESULTS = REGISTRY.register(Counter(
+    "ask_stage_results_total", "Documents or images produced per stage", ["stage"]))
+FALLBACKS = REGISTRY.register(Counter(
+    "ask_fallbacks_total", "Fallback paths taken by ChatEngine.ask", ["fallback"]))
+ANSWER_SOURCES = REGISTRY.register(Counter(
+    "ask_answer_sources_total", "Answers by source: catalog fields or LLM generation", ["source"]))
+CACHE_EVENTS = REGISTRY.register(Counter(
+    "cache_events_total", "Cache lookups by cache and outcome", ["cache", "outcome"]))
+SESSION_WRITES_DROPPED = REGISTRY.register(Counter(
+    "session_writes_dropped_total", "Pending session writes dropped to stay within the memory budget", ["reason"]))
+HTTP_SECONDS = REGISTRY.register(Histogram(
+    "http_request_seconds", "HTTP request latency", ["method", "route", "status"]))
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@contextmanager
+def span(stage, logger=None):
+    """
+    Times a block, records it in ask_stage_seconds and emits a debug log line.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        if logger is not None and logger.isEnabledFor(logging.DEBUG):
+            log_event(logger, logging.DEBUG, "stage", stage=stage, ms=round(elapsed * 1000, 3))
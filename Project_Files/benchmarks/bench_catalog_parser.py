@@ -0,0 +1,168 @@
+"""
+Catalog parsing throughput: legacy regex parser vs the streaming TXT
+tokenizer vs the read-only XLSX reader.
+
+    python -m benchmarks.bench_catalog_parser --entries 100000 --output benchmarks/results
+
+A synthetic catalog with `--entries` products is written once as TXT (and as
+XLSX when openpyxl is installed), then each parser is timed over `--repeat`
+runs and reported as entries/sec. The legacy parser is kept here as the
+baseline it replaced in ingest.py.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import tempfile
+import time
+
+from backend import catalog_parser
+from backend.catalog_parser import iter_txt_catalog, iter_xlsx_catalog
+
+STYLES = ["Urban", "Modern", "Classic", "Industrial", "Scandinavian", "Rustic"]
+MATERIALS = ["Plywood + Laminate", "MDF + Acrylic", "Solid Oak", "HDHMR + PU"]
+COLORS = ["White", "Grey Matte", "Walnut", "Navy Blue", "Sage Green"]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def synthetic_entries(n, seed=0):
+    rng = random.Random(seed)
+    for i in range(n):
+        yield {
+            "page": i // 4 + 1,
+            "product": f"Kitchen Layout {i // 4 + 1}-{i % 4 + 1}",
+            "style": rng.choice(STYLES),
+            "material": rng.choice(MATERIALS),
+            "color": rng.choice(COLORS),
+            "size": f"{rng.randint(8, 20)} x {rng.randint(8, 20)} ft",
+            "warranty": f"{rng.randint(1, 10)} years",
+            "delivery": f"{rng.randint(1, 6)} weeks",
+            "installation": rng.choice(["Included", "Extra"]),
+            "description": "Spacious layout with soft-close drawers,\ntall units and a breakfast counter.",
+            "price": f"Rs. {rng.randint(50, 900) * 1000:,}",
+        }
+
+
+def write_txt(path, entries):
+    with open(path, "w", encoding="utf-8") as f:
+        for e in entries:
+            size_label = "Layout Size" if e["page"] % 2 else "Size"
+            f.write(f"Page {e['page']} | {e['product']} Style: {e['style']} Material: {e['material']} "
+                    f"Color: {e['color']} {size_label}: {e['size']} Warranty: {e['warranty']} "
+                    f"Delivery: {e['delivery']} Installation: {e['installation']} "
+                    f"Description: {e['description']} Price: {e['price']}\n")
+
+
+def write_xlsx(path, entries):
+    wb = catalog_parser.openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("catalog")
+    columns = ["page", "product"] + catalog_parser.FIELD_ORDER
+    ws.append([c.title() for c in columns])
+    for e in entries:
+        ws.append([e[c] for c in columns])
+    wb.save(path)
+
+
+def legacy_parse_txt_catalog(file_path):
+    with open(file_path, "r", encoding="utf-8") as f:
+        content = f.read()
+    entries = []
+    for match in re.finditer(r"Page (\d+) \| (.*?)(?=Page \d+ \||\Z)", content, re.DOTALL):
+        block = match.group(2).strip()
+        entry = {"page": int(match.group(1))}
+        name_match = re.match(r"(.*?) Style:", block)
+        if not name_match:
+            continue
+        entry["product"] = name_match.group(1).strip()
+        fields = [
+            ("style", r"Style: (.*?) Material:"),
+            ("material", r"Material: (.*?) Color:"),
+            ("color", r"Color: (.*?) (?:Size|Layout Size):"),
+            ("size", r"(?:Size|Layout Size): (.*?) Warranty:"),
+            ("warranty", r"Warranty: (.*?) Delivery:"),
+            ("delivery", r"Delivery: (.*?) Installation:"),
+            ("installation", r"Installation: (.*?) Description:"),
+            ("description", r"Description: (.*?) Price:"),
+            ("price", r"Price: (.*?)$"),
+        ]
+        for key, field_pattern in fields:
+            f_match = re.search(field_pattern, block, re.DOTALL)
+            if f_match:
+                entry[key] = f_match.group(1).strip().replace("\n", " ")
+        entries.append(entry)
+    return entries
+
+
+def time_parser(name, parse, path, repeat):
+    runs = []
+    count = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        count = sum(1 for _ in parse(path))
+        runs.append(time.perf_counter() - started)
+    best = min(runs)
+    result = {
+        "entries": count,
+        "best_seconds": round(best, 3),
+        "entries_per_second": round(count / best) if best else None,
+        "mb_per_second": round(os.path.getsize(path) / 1e6 / best, 1) if best else None,
+    }
+    print(f"{name:<10} {count:>8,} entries  {best:7.2f}s  {result['entries_per_second']:>10,} entries/s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Catalog parser throughput benchmark")
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--chunk-size", type=int, default=catalog_parser.CHUNK_SIZE)
+    parser.add_argument("--skip-legacy", action="store_true", help="Skip the regex baseline")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmarks/results")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "results": {},
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        txt_path = os.path.join(workdir, "catalog.txt")
+        write_txt(txt_path, synthetic_entries(args.entries, args.seed))
+        print(f"Synthetic TXT catalog: {args.entries:,} entries, {os.path.getsize(txt_path) / 1e6:.1f} MB")
+
+        if not args.skip_legacy:
+            report["results"]["legacy_regex"] = time_parser("legacy", legacy_parse_txt_catalog, txt_path, args.repeat)
+        report["results"]["txt_stream"] = time_parser(
+            "txt", lambda p: iter_txt_catalog(p, args.chunk_size), txt_path, args.repeat)
+
+        if catalog_parser.openpyxl is not None:
+            xlsx_path = os.path.join(workdir, "catalog.xlsx")
+            write_xlsx(xlsx_path, synthetic_entries(args.entries, args.seed))
+            report["results"]["xlsx"] = time_parser("xlsx", iter_xlsx_catalog, xlsx_path, args.repeat)
+        else:
+            print("openpyxl not installed: skipping the XLSX reader")
+
+    os.makedirs(args.output, exist_ok=True)
+    out_path = os.path.join(args.output, f"catalog_parser_{commit}_{int(time.time())}.json")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Per-stage micro-benchmark for ChatEngine.ask without Atlas or Groq.
+
+    python -m benchmarks.bench_chat_engine --sizes 1000,10000,100000 --output benchmarks/results
+
+Every stage of ask() (guardrail, encoders, searches, scoring, context build,
+generation) is timed through ChatEngine.stage_observer. Results are written
+as JSON keyed by commit so runs can be compared across changes.
+Memory: ~(384 + images_per_node * 512) * 4 bytes per node, about 5.6 GB at 1M.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import time
+from collections import defaultdict
+import numpy as np
+
+from backend.chat_engine import ChatEngine
+from .standins import FakeChatGroq, FakeRAGTools, InMemoryDatabaseHandler, SyntheticCatalog, synthetic_queries
+
+
+def summarize(samples):
+    arr = np.array(samples) * 1000
+    return {
+        "count": len(samples),
+        "mean_ms": round(float(arr.mean()), 3),
+        "p50_ms": round(float(np.percentile(arr, 50)), 3),
+        "p95_ms": round(float(np.percentile(arr, 95)), 3),
+        "max_ms": round(float(arr.max()), 3),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def run_size(size, args, rag_tools, llm, queries):
+    print(f"\n--- {size:,} nodes ---")
+    started = time.perf_counter()
+    catalog = SyntheticCatalog(size, images_per_node=args.images_per_node, seed=args.seed, rag_tools=rag_tools)
+    print(f"Seeded catalog in {time.perf_counter() - started:.1f}s")
+
+    engine = ChatEngine(llm=llm, db=InMemoryDatabaseHandler(catalog), rag_tools=rag_tools)
+    timings = defaultdict(list)
+    engine.stage_observer = lambda name, seconds: timings[name].append(seconds)
+
+    # DEBUG prints in ask() are silenced so terminal I/O doesn't skew the cheap stages
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for q in queries[:args.warmup]:
+            engine.ask(q)
+        timings.clear()
+
+        for _ in range(args.repeat):
+            for q in queries:
+                t0 = time.perf_counter()
+                engine.ask(q)
+                timings["total"].append(time.perf_counter() - t0)
+
+    stages = {name: summarize(samples) for name, samples in timings.items()}
+    for name, stats in sorted(stages.items(), key=lambda kv: -kv[1]["mean_ms"]):
+        print(f"{name:<22} n={stats['count']:<5} mean={stats['mean_ms']:>9.2f}ms  p95={stats['p95_ms']:>9.2f}ms")
+    return stages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline per-stage benchmark for ChatEngine.ask")
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000", help="Comma separated catalog sizes")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--images-per-node", type=int, default=2)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Seconds per fake Groq call")
+    parser.add_argument("--text-latency", type=float, default=0.005, help="Seconds per fake MiniLM call")
+    parser.add_argument("--clip-latency", type=float, default=0.015, help="Seconds per fake CLIP call")
+    parser.add_argument("--real-encoders", action="store_true", help="Load MiniLM/CLIP instead of fakes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmarks/results")
+    args = parser.parse_args()
+
+    if args.real_encoders:
+        from backend.rag_tools import RAGTools
+        rag_tools = RAGTools()
+    else:
+        rag_tools = FakeRAGTools(args.text_latency, args.clip_latency)
+    llm = FakeChatGroq(latency=args.llm_latency)
+    queries = synthetic_queries(args.queries, args.seed)
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "results": {},
+    }
+    for size in [int(s) for s in args.sizes.split(",") if s]:
+        report["results"][str(size)] = run_size(size, args, rag_tools, llm, queries)
+
+    os.makedirs(args.output, exist_ok=True)
+    out_path = os.path.join(args.output, f"chat_engine_{commit}_{int(time.time())}.json")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
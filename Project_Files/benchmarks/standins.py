@@ -0,0 +1,355 @@
+"""
+Local stand-ins for Groq, Atlas and the encoders so ChatEngine.ask can be
+measured offline.
+"""
+import hashlib
+import random
+import re
+import time
+import numpy as np
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from backend.attributes import normalize_tokens
+
+TEXT_DIM = 384
+CLIP_DIM = 512
+
+CATEGORIES = ["kitchen", "bedroom"]
+STYLES = ["urban", "scandinavian", "industrial", "minimalist", "classic", "coastal", "rustic", "contemporary"]
+MATERIALS = ["plywood", "laminate", "oak", "walnut", "marble", "granite", "quartz", "lacquer", "veneer", "steel"]
+COLORS = ["grey", "white", "black", "navy", "sage", "beige", "copper", "gold", "teal", "walnut"]
+FEATURES = ["island", "pantry", "wardrobe", "headboard", "pendant", "backsplash", "dresser", "shelving", "drawers", "canopy"]
+VOCABULARY = CATEGORIES + STYLES + MATERIALS + COLORS + FEATURES
+
+
+# ---------------- Groq ----------------
+
+class FakeChatGroq(BaseChatModel):
+    """
+    Chat model that sleeps for `latency` seconds and returns a canned reply.
+    Triage prompts get "YES" so the full pipeline runs.
+    """
+    latency: float = 0.3
+    answer_words: int = 180
+
+    @property
+    def _llm_type(self):
+        return "fake-groq"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        prompt = " ".join(str(m.content) for m in messages)
+        if "Answer exactly 'YES' or 'NO'" in prompt:
+            content = "YES"
+        else:
+            content = " ".join(["design"] * self.answer_words)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+
+# ---------------- Encoders ----------------
+
+def _hashed_vector(token, dim, salt):
+    seed = int.from_bytes(hashlib.blake2b(f"{salt}:{token}".encode(), digest_size=8).digest(), "little")
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+
+
+class WordVectors:
+    """
+    Bag-of-words embedding: each vocabulary word has a fixed random vector.
+    Catalog nodes and queries that share words end up close together.
+    """
+
+    def __init__(self, dim, salt):
+        self.dim = dim
+        self.salt = salt
+        self.table = np.stack([_hashed_vector(w, dim, salt) for w in VOCABULARY])
+        self.index = {w: i for i, w in enumerate(VOCABULARY)}
+
+    def encode(self, text):
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for word in re.findall(r"[a-z]+", text.lower()):
+            i = self.index.get(word)
+            vec += self.table[i] if i is not None else 0.2 * _hashed_vector(word, self.dim, self.salt)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def encode_ids(self, word_ids, noise=0.0, rng=None):
+        """
+        Vectorized encode for synthetic nodes: word_ids is (n, k).
+        """
+        vecs = self.table[word_ids].sum(axis=1)
+        if noise:
+            vecs += noise * rng.standard_normal(vecs.shape).astype(np.float32)
+        vecs /= np.linalg.norm(vecs, axis=1, keepdims=True) + 1e-8
+        return vecs
+
+
+class FakeRAGTools:
+    """
+    Stand-in for RAGTools with configurable per-call latency.
+    """
+
+    def __init__(self, text_latency=0.005, clip_latency=0.015, text_model=None, clip_model=None):
+        # text_model / clip_model: accepted for RAGTools compatibility, ignored
+        self.text_latency = text_latency
+        self.clip_latency = clip_latency
+        self.text_vectors = WordVectors(TEXT_DIM, "minilm")
+        self.clip_vectors = WordVectors(CLIP_DIM, "clip")
+
+    def get_embeddings(self, text):
+        time.sleep(self.text_latency)
+        return self.text_vectors.encode(text).tolist()
+
+    def get_clip_text_embedding(self, text):
+        time.sleep(self.clip_latency)
+        return self.clip_vectors.encode(text).tolist()
+
+    def get_embeddings_batch(self, texts, batch_size=64):
+        # One forward pass per batch costs about one single call
+        time.sleep(self.text_latency * -(-len(texts) // batch_size))
+        return [self.text_vectors.encode(t).tolist() for t in texts]
+
+    def get_clip_text_embeddings(self, texts, batch_size=64):
+        time.sleep(self.clip_latency * -(-len(texts) // batch_size))
+        return [self.clip_vectors.encode(t).tolist() for t in texts]
+
+
+# ---------------- Catalog ----------------
+
+class SyntheticCatalog:
+    """
+    Columnar synthetic unified_nodes. Vectors live in float32 matrices and
+    documents are only materialized for the rows a search returns.
+    """
+
+    def __init__(self, size, images_per_node=2, seed=0, rag_tools=None):
+        rng = np.random.default_rng(seed)
+        self.size = size
+        self.images_per_node = images_per_node
+        tools = rag_tools if isinstance(rag_tools, FakeRAGTools) else FakeRAGTools(0, 0)
+
+        self.category = rng.integers(0, len(CATEGORIES), size)
+        self.style = rng.integers(0, len(STYLES), size)
+        self.material = rng.integers(0, len(MATERIALS), size)
+        self.color = rng.integers(0, len(COLORS), size)
+        self.feature = rng.integers(0, len(FEATURES), size)
+        self.price = rng.integers(800, 12000, size)
+
+        offsets = [0, len(CATEGORIES), len(CATEGORIES) + len(STYLES),
+                   len(CATEGORIES) + len(STYLES) + len(MATERIALS),
+                   len(CATEGORIES) + len(STYLES) + len(MATERIALS) + len(COLORS)]
+        word_ids = np.stack([
+            self.category + offsets[0], self.style + offsets[1], self.material + offsets[2],
+            self.color + offsets[3], self.feature + offsets[4],
+        ], axis=1)
+
+        # Build in blocks to keep peak memory near the final matrices
+        block = 100_000
+        self.text_emb = np.empty((size, TEXT_DIM), dtype=np.float32)
+        self.clip_emb = np.empty((size * images_per_node, CLIP_DIM), dtype=np.float32)
+        for start in range(0, size, block):
+            ids = word_ids[start:start + block]
+            self.text_emb[start:start + len(ids)] = tools.text_vectors.encode_ids(ids, 0.3, rng)
+            for j in range(images_per_node):
+                rows = slice((start * images_per_node) + j, (start + len(ids)) * images_per_node, images_per_node)
+                self.clip_emb[rows] = tools.clip_vectors.encode_ids(ids, 0.6, rng)
+
+    def category_mask(self, category):
+        if category is None:
+            return None
+        return self.category == CATEGORIES.index(category)
+
+    def _word_mask(self, words, kind):
+        names = MATERIALS if kind == "material" else COLORS
+        ids = [i for i, name in enumerate(names) if set(normalize_tokens(name)) & words]
+        if kind == "color":
+            return np.isin(self.color, ids)
+        # Nodes list two materials, see combined_text()
+        return np.isin(self.material, ids) | np.isin((self.material + 3) % len(MATERIALS), ids)
+
+    def constraint_mask(self, constraints):
+        """
+        Price and material/color constraints; the synthetic nodes have no sizes.
+        """
+        if not constraints:
+            return None
+        mask = np.ones(self.size, dtype=bool)
+        if constraints.get("price_min") is not None:
+            mask &= self.price >= constraints["price_min"]
+        if constraints.get("price_max") is not None:
+            mask &= self.price <= constraints["price_max"]
+        materials, colors = set(constraints.get("materials") or []), set(constraints.get("colors") or [])
+        shared = materials & colors
+        if shared:
+            mask &= self._word_mask(shared, "material") | self._word_mask(shared, "color")
+        if materials - shared:
+            mask &= self._word_mask(materials - shared, "material")
+        if colors - shared:
+            mask &= self._word_mask(colors - shared, "color")
+        return mask
+
+    def filter_mask(self, category, constraints):
+        masks = [m for m in (self.category_mask(category), self.constraint_mask(constraints)) if m is not None]
+        if not masks:
+            return None
+        return masks[0] if len(masks) == 1 else masks[0] & masks[1]
+
+    def combined_text(self, i):
+        category = CATEGORIES[self.category[i]]
+        return " | ".join([
+            f"Product: {category.title()} Layout {i // 10}-{i % 10}",
+            f"Category: {category}",
+            f"Style: {STYLES[self.style[i]]}",
+            f"Material: {MATERIALS[self.material[i]]} + {MATERIALS[(self.material[i] + 3) % len(MATERIALS)]}",
+            f"Color: {COLORS[self.color[i]]}",
+            "Size: 10ft x 12ft",
+            f"Description: A {STYLES[self.style[i]]} {category} with a {FEATURES[self.feature[i]]}, "
+            "soft-close hardware, integrated lighting and generous storage for everyday living.",
+            f"Price: ${self.price[i]:,}",
+            "Image Content: premium finish collection catalog reference",
+        ])
+
+    def document(self, i):
+        category = CATEGORIES[self.category[i]]
+        images = []
+        for j in range(self.images_per_node):
+            row = i * self.images_per_node + j
+            images.append({
+                "path": f"Data/processed/images/{category}_p{i}_i{j}.jpeg",
+                "content_hash": f"{row:064x}",
+                "ocr_text": "premium finish collection",
+                "pdf_path": f"Data/{category}_data/{category}_catalog.pdf",
+                "page_source": i // 4 + 1,
+                "category_source": category,
+                # ask() tests truthiness of the embedding, so it must be a list
+                "clip_embedding": self.clip_emb[row].tolist(),
+            })
+        return {
+            "id": f"{category}_{i}",
+            "category": category,
+            "page": i // 4 + 1,
+            "product": f"{category.title()} Layout {i // 10}-{i % 10}",
+            "price": f"${self.price[i]:,}",
+            "combined_text": self.combined_text(i),
+            "related_images": images,
+            "embedding": self.text_emb[i].tolist(),
+        }
+
+
+def _top_k(scores, limit):
+    limit = min(limit, len(scores))
+    if limit == 0:
+        return np.empty(0, dtype=np.int64)
+    idx = np.argpartition(-scores, limit - 1)[:limit]
+    return idx[np.argsort(-scores[idx])]
+
+
+class _Cursor:
+    def __init__(self, catalog, predicate):
+        self.catalog = catalog
+        self.predicate = predicate
+        self._limit = 0
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def __iter__(self):
+        found = 0
+        for i in range(self.catalog.size):
+            if self._limit and found >= self._limit:
+                return
+            doc = {"category": CATEGORIES[self.catalog.category[i]], "combined_text": None}
+            if self.predicate(doc, i):
+                found += 1
+                yield self.catalog.document(i)
+
+
+class InMemoryCollection:
+    """
+    Just enough of pymongo.Collection.find for ChatEngine's regex and
+    featured fallbacks ($or/$and/$regex/equality).
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+
+    def _compile(self, query):
+        if not query:
+            return lambda doc, i: True
+        if "$or" in query:
+            parts = [self._compile(q) for q in query["$or"]]
+            return lambda doc, i: any(p(doc, i) for p in parts)
+        if "$and" in query:
+            parts = [self._compile(q) for q in query["$and"]]
+            return lambda doc, i: all(p(doc, i) for p in parts)
+        checks = []
+        for field, cond in query.items():
+            if isinstance(cond, dict) and "$regex" in cond:
+                pattern = re.compile(cond["$regex"], re.I if "i" in cond.get("$options", "") else 0)
+                if field == "combined_text":
+                    checks.append(lambda doc, i, p=pattern: bool(p.search(self.catalog.combined_text(i))))
+                else:
+                    checks.append(lambda doc, i, p=pattern, f=field: bool(p.search(str(doc.get(f, "")))))
+            else:
+                checks.append(lambda doc, i, f=field, v=cond: doc.get(f) == v)
+        return lambda doc, i: all(c(doc, i) for c in checks)
+
+    def find(self, query=None, projection=None):
+        return _Cursor(self.catalog, self._compile(query or {}))
+
+
+class InMemoryDatabaseHandler:
+    """
+    Brute-force stand-in for DatabaseHandler over a SyntheticCatalog.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.unified_collection = InMemoryCollection(catalog)
+
+    def unified_search(self, query_embedding, limit=5, filter_dict=None, constraints=None):
+        scores = self.catalog.text_emb @ np.asarray(query_embedding, dtype=np.float32)
+        mask = self.catalog.filter_mask((filter_dict or {}).get("category"), constraints)
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+        return [self.catalog.document(i) for i in _top_k(scores, limit) if np.isfinite(scores[i])]
+
+    def strict_visual_search(self, clip_text_embedding, category, limit=5, constraints=None):
+        image_scores = self.catalog.clip_emb @ np.asarray(clip_text_embedding, dtype=np.float32)
+        # Best image per node, like a vector index over related_images.clip_embedding
+        scores = image_scores.reshape(self.catalog.size, self.catalog.images_per_node).max(axis=1)
+        mask = self.catalog.filter_mask(category, constraints)
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+        return [self.catalog.document(i) for i in _top_k(scores, limit) if np.isfinite(scores[i])]
+
+
+# ---------------- Queries ----------------
+
+QUERY_TEMPLATES = [
+    "{style} kitchen with {color} cabinets and {material} countertops",
+    "Show me {color} bedroom designs with a {feature}",
+    "{material} wardrobe in {color}",
+    "kitchen {feature} ideas with {material}",
+    "{style} bedroom with {material} headboard",
+    "What is the price of the {style} kitchen?",
+    "cozy reading nook by the window",
+    "best lighting for a small {feature}",
+    "{color} and {color2} interior palette",
+    "what's the weather tomorrow",
+]
+
+
+def synthetic_queries(n=50, seed=0):
+    rng = random.Random(seed)
+    queries = []
+    for i in range(n):
+        template = QUERY_TEMPLATES[i % len(QUERY_TEMPLATES)]
+        queries.append(template.format(
+            style=rng.choice(STYLES), color=rng.choice(COLORS), color2=rng.choice(COLORS),
+            material=rng.choice(MATERIALS), feature=rng.choice(FEATURES),
+        ))
+    return queries
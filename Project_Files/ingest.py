@@ -1,14 +1,27 @@
 import os
 import fitz
 import re
+import threading
+from collections import defaultdict
 import pandas as pd
 import numpy as np
-import pytesseract
 from PIL import Image
 from io import BytesIO
 from pymongo import MongoClient
 from dotenv import load_dotenv
 from backend.rag_tools import RAGTools
+from backend.image_derivatives import make_derivatives, content_hash
+from backend.page_previews import prerender_page
+from backend.ingest_pipeline import StreamingPipeline, Stage
+from backend.bulk_writer import BulkWriter
+from backend.checkpoint import CheckpointStore
+from backend.catalog_parser import iter_catalog
+from backend.attributes import node_attributes
+from backend.neighbor_graph import build_neighbor_graph
+from backend.catalog_versions import CatalogVersions, asset_dir
+from backend.embedding_versions import CLIP_EMBEDDING_VERSION, LEGACY_VERSIONS, embedding_field
+from backend.snapshot import export_snapshot, SNAPSHOT_DIR
+from backend.ocr_pool import OCRPool, estimate_dpi, likely_has_text
 
 # ---------------- CONFIGURATION ----------------
 load_dotenv()
@@ -16,20 +29,32 @@ MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = "remodel_catalog"
 COLLECTION_NAME = "unified_nodes"
 
-IMAGE_OUTPUT_DIR = "Data/processed/images"
-OCR_OUTPUT_DIR = "Data/processed/ocr"
-os.makedirs(IMAGE_OUTPUT_DIR, exist_ok=True)
-os.makedirs(OCR_OUTPUT_DIR, exist_ok=True)
+# Subdirectories of a catalog version's asset directory (catalog_versions.asset_dir)
+ASSET_SUBDIRS = ["images", "ocr", "pages"]
 
 # OCR Setup
 TESSERACT_PATH = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
-if os.path.exists(TESSERACT_PATH):
-    pytesseract.pytesseract.tesseract_cmd = TESSERACT_PATH
+ocr_pool = OCRPool(tesseract_cmd=TESSERACT_PATH if os.path.exists(TESSERACT_PATH) else None)
+ingest_stats = {"images": 0, "seconds": 0.0, "ocr_calls": 0, "avoided_text_layer": 0, "avoided_no_text": 0, "nodes": 0,
+                "pages_resumed": 0, "ocr_resumed": 0, "clip_resumed": 0, "ocr_errors": 0, "clip_errors": 0}
+stats_lock = threading.Lock()
+
+# Pages allowed to wait between two pipeline stages
+PIPELINE_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "8"))
+
+# Mongo bulk writes
+WRITE_BATCH_SIZE = int(os.getenv("INGEST_WRITE_BATCH_SIZE", "200"))
+WRITE_IN_FLIGHT = int(os.getenv("INGEST_WRITE_IN_FLIGHT", "4"))
+
+# Native text overlapping an image with at least this many characters replaces OCR
+MIN_TEXT_LAYER_CHARS = 20
 
 rag = RAGTools()
+checkpoints = CheckpointStore()
 client = MongoClient(MONGO_URI)
 db = client[DB_NAME]
-collection = db[COLLECTION_NAME]
+# The live version when unified_nodes is served through a blue/green alias
+collection = db[CatalogVersions(db, COLLECTION_NAME).live_name()]
 
 # ---------------- HELPERS ----------------
 
@@ -43,136 +68,237 @@ def is_valid_image(pil_img):
     except: return False
     return True
 
+def overlapping_text(text_blocks, rect):
+    """
+    Native PDF text whose block bbox intersects the image placement.
+    """
+    if rect is None:
+        return ""
+    parts = [block[4].strip() for block in text_blocks if fitz.Rect(block[:4]).intersects(rect)]
+    return " ".join(p for p in parts if p).replace("\n", " ")
+
 def clean_filename(name):
     return re.sub(r'[^a-zA-Z0-9]', '_', name)
 
-def parse_txt_catalog(file_path):
-    if not os.path.exists(file_path):
-        return []
-    
-    with open(file_path, "r", encoding="utf-8") as f:
-        content = f.read()
-    
-    # Split by "Page X |"
-    entries = []
-    # Using regex to find starts of entries
-    # Format: Page 1 | Kitchen Layout 1-1 Style: ...
-    pattern = r"Page (\d+) \| (.*?)(?=Page \d+ \||\Z)"
-    matches = re.finditer(pattern, content, re.DOTALL)
-    
-    for match in matches:
-        page_no = int(match.group(1))
-        block = match.group(2).strip()
-        
-        # Parse fields within block
-        # Example: Kitchen Layout 1-1 Style: Urban Material: Plywood + Laminate ...
-        entry = {"page": page_no}
-        
-        # Extract Product Name (it's everything before "Style:")
-        name_match = re.match(r"(.*?) Style:", block)
-        if name_match:
-            entry["product"] = name_match.group(1).strip()
-        else:
-            continue
-            
-        # Regex for common fields
-        fields = [
-            ("style", r"Style: (.*?) Material:"),
-            ("material", r"Material: (.*?) Color:"),
-            ("color", r"Color: (.*?) (?:Size|Layout Size):"),
-            ("size", r"(?:Size|Layout Size): (.*?) Warranty:"),
-            ("warranty", r"Warranty: (.*?) Delivery:"),
-            ("delivery", r"Delivery: (.*?) Installation:"),
-            ("installation", r"Installation: (.*?) Description:"),
-            ("description", r"Description: (.*?) Price:"),
-            ("price", r"Price: (.*?)$")
-        ]
-        
-        for key, field_pattern in fields:
-            f_match = re.search(field_pattern, block, re.DOTALL)
-            if f_match:
-                entry[key] = f_match.group(1).strip().replace("\n", " ")
-        
-        entries.append(entry)
-        
-    return entries
-
 # ---------------- PROCESSING ----------------
+# Staged streaming pipeline, one work item per PDF page:
+#   page extract -> triage -> OCR -> embed -> node assembly -> DB write
+# Stages run on their own threads connected by bounded queues, so memory stays
+# flat for large catalogs and images travel between stages in memory.
+
+def count(key, n=1):
+    with stats_lock:
+        ingest_stats[key] += n
 
-def extract_pdf_images(pdf_path, pdf_label):
+def iter_pdf_pages(pdf_path, pdf_label, entries_by_page, assets):
+    """
+    Stage 1 (page extract): yields raw image bytes, text blocks and the catalog
+    entries of each page; files of later stages go under `assets`. PyMuPDF
+    documents are not thread safe, so every fitz call on `doc` stays in this generator.
+    """
     doc = fitz.open(pdf_path)
-    page_images = {} # page_no -> [ {path, ocr, embedding} ]
-    
-    clean_label = clean_filename(pdf_label)
-    
-    for page_idx in range(len(doc)):
-        page_no = page_idx + 1
-        page = doc[page_idx]
-        image_list = page.get_images(full=True)
-        valid_imgs = []
-        
-        for img_idx, img_info in enumerate(image_list):
-            try:
-                xref = img_info[0]
-                base_image = doc.extract_image(xref)
-                pil_img = Image.open(BytesIO(base_image["image"]))
-                
-                if not is_valid_image(pil_img): continue
-                
-                ext = base_image["ext"]
-                img_name = f"{clean_label}_p{page_no}_i{img_idx}.{ext}"
-                img_path = os.path.join(IMAGE_OUTPUT_DIR, img_name)
-                
-                with open(img_path, "wb") as f:
-                    f.write(base_image["image"])
-                
-                # Perform OCR
-                ocr_text = pytesseract.image_to_string(pil_img).strip()
-                
-                # Save OCR to txt file
-                ocr_filename = f"{img_name}.txt"
-                ocr_path = os.path.join(OCR_OUTPUT_DIR, ocr_filename)
-                with open(ocr_path, "w", encoding="utf-8") as f:
-                    f.write(ocr_text)
-                
-                # Get CLIP embedding
-                clip_emb = rag.get_clip_image_embedding(img_path)
-                
-                valid_imgs.append({
-                    "path": img_path,
-                    "ocr_text": ocr_text,
-                    "clip_embedding": clip_emb
-                })
-            except Exception as e:
-                print(f"Error extracting image {img_idx} on page {page_no}: {e}")
+    try:
+        for page_idx in range(len(doc)):
+            page_no = page_idx + 1
+
+            # Every node of this page was written by an earlier run
+            if checkpoints.page_complete(pdf_label, page_no):
+                entries_by_page.pop(page_no, None)
+                count("pages_resumed")
                 continue
-        
-        page_images[page_no] = valid_imgs
-        
-    doc.close()
-    return page_images
 
-def process_job(job):
-    category = job["category"]
-    print(f"\n>>> PROCESSING: {category.upper()}")
-    
-    # 1. Extract Images from PDF
-    pdf_images = extract_pdf_images(job["pdf"], category)
-    
-    # 2. Parse TXT Catalog
-    txt_entries = parse_txt_catalog(job["txt"])
-    print(f"Found {len(txt_entries)} entries in TXT catalog.")
-    
-    # 3. Combine and Store
-    total_pushed = 0
-    for entry in txt_entries:
-        page_no = entry["page"]
+            page = doc[page_idx]
+
+            # Page previews + single-page PDFs for deep links
+            prerender_page(doc, pdf_path, page_no, os.path.join(assets, "pages"))
+
+            raw_images = []
+            for img_idx, img_info in enumerate(page.get_images(full=True)):
+                try:
+                    xref = img_info[0]
+                    base_image = doc.extract_image(xref)
+                    rects = page.get_image_rects(xref)
+                    raw_images.append({
+                        "img_idx": img_idx,
+                        "data": base_image["image"],
+                        "ext": base_image["ext"],
+                        "rect": rects[0] if rects else None,
+                    })
+                except Exception as e:
+                    print(f"Error extracting image {img_idx} on page {page_no}: {e}")
+
+            yield {
+                "page_no": page_no,
+                "pdf_path": pdf_path,
+                "label": pdf_label,
+                "assets": assets,
+                # Native text layer with block coordinates (block_type 0 = text)
+                "text_blocks": [b for b in page.get_text("blocks") if b[6] == 0],
+                "raw_images": raw_images,
+                "entries": entries_by_page.pop(page_no, []),
+            }
+    finally:
+        doc.close()
+
+    # Catalog entries that point past the last PDF page still become nodes
+    for page_no in sorted(entries_by_page):
+        if checkpoints.page_complete(pdf_label, page_no):
+            continue
+        yield {"page_no": page_no, "pdf_path": pdf_path, "label": pdf_label, "assets": assets,
+               "text_blocks": [], "raw_images": [], "entries": entries_by_page[page_no]}
+
+def triage_page(item):
+    """
+    Stage 2 (triage): drop decorative images, save originals + derivatives,
+    attach overlapping text-layer text and decide which images need OCR.
+    """
+    page_no = item["page_no"]
+    clean_label = clean_filename(item["label"])
+    image_dir = os.path.join(item["assets"], "images")
+    images, pil_images, ocr_flags, ocr_dpis = [], [], [], []
+
+    for raw in item.pop("raw_images"):
+        try:
+            pil_img = Image.open(BytesIO(raw["data"]))
+            if not is_valid_image(pil_img): continue
+            pil_img.load()
+
+            img_name = f"{clean_label}_p{page_no}_i{raw['img_idx']}.{raw['ext']}"
+            img_path = os.path.join(image_dir, img_name)
+            with open(img_path, "wb") as f:
+                f.write(raw["data"])
+
+            # Thumbnail / medium WebP derivatives served to clients
+            derivatives = make_derivatives(pil_img, img_name, image_dir)
+
+            # Placement on the page gives the effective DPI for OCR rescaling
+            rect = raw["rect"]
+            source_dpi = estimate_dpi(pil_img.width, rect.width) if rect is not None else None
+            layer_text = overlapping_text(item["text_blocks"], rect)
+
+            # OCR only when the text layer has nothing and the image looks like it holds text
+            count("images")
+            if len(layer_text) >= MIN_TEXT_LAYER_CHARS:
+                count("avoided_text_layer")
+                needs_ocr = False
+            elif not likely_has_text(pil_img):
+                count("avoided_no_text")
+                needs_ocr = False
+            else:
+                needs_ocr = True
+
+            images.append({
+                "path": img_path,
+                "content_hash": content_hash(raw["data"]),
+                "derivatives": derivatives,
+                "pdf_path": item["pdf_path"].replace("\\", "/"),
+                "page_source": page_no,
+                "category_source": item["label"],
+                "ocr_text": layer_text,
+                "text_source": "text_layer" if layer_text else "none",
+            })
+            pil_images.append(pil_img)
+            ocr_flags.append(needs_ocr)
+            ocr_dpis.append(source_dpi)
+        except Exception as e:
+            print(f"Error triaging image {raw['img_idx']} on page {page_no}: {e}")
+
+    item.pop("text_blocks")
+    item.update(images=images, pil_images=pil_images, ocr_flags=ocr_flags, ocr_dpis=ocr_dpis)
+    return item
+
+def ocr_page(item):
+    """
+    Stage 3 (OCR): one batch per page on the persistent engine pool.
+    """
+    targets = [i for i, flag in enumerate(item.pop("ocr_flags")) if flag]
+    ocr_dpis = item.pop("ocr_dpis")
+    saved = checkpoints.load_page(item["label"], item["page_no"])["ocr"]
+
+    if saved is not None:
+        # Completed by an earlier run
+        for img in item["images"]:
+            if img["path"] in saved:
+                img["ocr_text"], img["text_source"] = saved[img["path"]]
+        count("ocr_resumed", len(targets))
+    elif targets:
+        results = ocr_pool.ocr_batch([item["pil_images"][i] for i in targets], [ocr_dpis[i] for i in targets])
+        for i, result in zip(targets, results):
+            count("ocr_calls")
+            count("seconds", result["seconds"])
+            img = item["images"][i]
+            if "error" in result:
+                # Only this image loses its OCR; the page's nodes keep its text-layer text
+                img["ocr_error"] = result["error"]
+                count("ocr_errors")
+            elif result["text"]:
+                img["ocr_text"] = " ".join(p for p in (img["ocr_text"], result["text"]) if p)
+                img["text_source"] = "ocr"
+        checkpoints.save_ocr(item["label"], item["page_no"],
+                             {img["path"]: [img["ocr_text"], img["text_source"]] for img in item["images"]})
+
+    for img in item["images"]:
+        # Save OCR / text-layer text to txt file
+        ocr_path = os.path.join(item["assets"], "ocr", f"{os.path.basename(img['path'])}.txt")
+        with open(ocr_path, "w", encoding="utf-8") as f:
+            f.write(img["ocr_text"])
+    return item
+
+def embed_page(item):
+    """
+    Stage 4 (embed): batched CLIP over the decoded images, no disk re-read.
+    """
+    pil_images = item.pop("pil_images")
+    saved = checkpoints.load_page(item["label"], item["page_no"])["clip"]
+
+    if saved is not None and all(img["path"] in saved for img in item["images"]):
+        # Completed by an earlier run
+        for img in item["images"]:
+            img["clip_embedding"] = saved[img["path"]]
+        count("clip_resumed", len(item["images"]))
+    elif pil_images:
+        try:
+            vectors = rag.get_clip_image_embeddings(pil_images)
+        except Exception as e:
+            # Retry one image at a time so a single bad image only loses its own vector
+            print(f"Batched CLIP failed on page {item['page_no']} ({e}), embedding images one by one")
+            vectors = []
+            for img, pil_img in zip(item["images"], pil_images):
+                try:
+                    vectors.append(rag.get_clip_image_embedding(pil_img))
+                except Exception as e:
+                    img["clip_error"] = str(e)
+                    vectors.append(None)
+        for img, emb in zip(item["images"], vectors):
+            if emb is None:
+                # No clip_embedding field: reembed.py fills images missing it
+                count("clip_errors")
+            else:
+                img["clip_embedding"] = emb
+        checkpoints.save_clip(item["label"], item["page_no"],
+                              {img["path"]: img["clip_embedding"] for img in item["images"] if "clip_embedding" in img})
+    return item
+
+def assemble_nodes(item):
+    """
+    Stage 5 (node assembly): one unified node per catalog entry on the page.
+    """
+    entries = item["entries"]
+    if not entries:
+        checkpoints.save_nodes(item["label"], item["page_no"], [])
+        return None
+
+    category = item["label"]
+    page_no = item["page_no"]
+
+    # Link Images from the same page
+    images_on_page = item["images"]
+    image_paths = [img["path"].replace("\\", "/") for img in images_on_page]
+
+    docs = []
+    for entry in entries:
         product_name = entry.get("product", "Unknown")
         
-        # Link Images from the same page
-        images_on_page = pdf_images.get(page_no, [])
-        image_paths = [img["path"].replace("\\", "/") for img in images_on_page]
-        
         # Construct ID
         clean_prod = clean_filename(product_name).lower()
         node_id = f"{category}_{page_no}_{clean_prod}"
@@ -194,11 +320,8 @@ def process_job(job):
             if img["ocr_text"]:
                 fields_to_combine.append(f"Image Content: {img['ocr_text']}")
                 
-        combined_text = " | ".join(fields_to_combine)
-        embedding = rag.get_embeddings(combined_text)
-        
         # Final Document
-        doc = {
+        docs.append({
             "id": node_id,
             "category": category,
             "page": page_no,
@@ -212,34 +335,113 @@ def process_job(job):
             "delivery": entry.get("delivery", ""),
             "installation": entry.get("installation", ""),
             "description": entry.get("description", ""),
+            # Parsed price/size and material/color tokens, used as vector search pre-filters
+            **node_attributes(entry),
             "image_paths": image_paths, # List of strings as requested
+            # Asset directory of this catalog version; the alias switch serves files from it
+            "assets": item["assets"],
             "related_images": images_on_page, # Storing full objects inclusive of OCR/Embeddings internally
-            "combined_text": combined_text,
-            "embedding": embedding
-        }
-        
-        collection.replace_one({"id": node_id}, doc, upsert=True)
-        total_pushed += 1
+            "combined_text": " | ".join(fields_to_combine),
+        })
+
+    for doc, embedding in zip(docs, rag.get_embeddings_batch([d["combined_text"] for d in docs])):
+        doc["embedding"] = embedding
+
+    # The page completes once the writer acknowledges all of these ids
+    checkpoints.save_nodes(category, page_no, [d["id"] for d in docs])
 
-    print(f"Pushed {total_pushed} unified nodes for {category}.")
+    return {"page_no": page_no, "docs": docs}
 
-def ingest_all():
-    print(f"Clearing collection: {COLLECTION_NAME}")
-    collection.delete_many({})
+def write_nodes(item, writer):
+    """
+    Stage 6 (DB write): hands nodes to the batched bulk writer.
+    """
+    writer.add_many(item["docs"])
+    count("nodes", len(item["docs"]))
+    return item
+
+def record_written(docs):
+    """
+    BulkWriter callback: checkpoint node ids Mongo acknowledged, per page.
+    """
+    by_page = defaultdict(list)
+    for doc in docs:
+        by_page[(doc["category"], doc["page"])].append(doc["id"])
+    for (category, page_no), node_ids in by_page.items():
+        checkpoints.mark_written(category, page_no, node_ids)
+
+def process_job(job, target, assets):
+    category = job["category"]
+    if checkpoints.job_complete(category):
+        print(f"\n>>> SKIPPING: {category.upper()} (completed in an earlier run)")
+        return {"entries": sum(1 for _ in iter_catalog(job)), "written": 0, "complete": True}
+    print(f"\n>>> PROCESSING: {category.upper()}")
     
-    # Also clear processed directories to ensure "clear images and text"
-    import shutil
-    if os.path.exists(IMAGE_OUTPUT_DIR): shutil.rmtree(IMAGE_OUTPUT_DIR)
-    if os.path.exists(OCR_OUTPUT_DIR): shutil.rmtree(OCR_OUTPUT_DIR)
-    os.makedirs(IMAGE_OUTPUT_DIR)
-    os.makedirs(OCR_OUTPUT_DIR)
+    # Parse catalog entries, XLSX when available (grouped by page so node assembly can stream)
+    entries_by_page = defaultdict(list)
+    for entry in iter_catalog(job):
+        entries_by_page[entry["page"]].append(entry)
+    entry_count = sum(len(v) for v in entries_by_page.values())
+    print(f"Found {entry_count} catalog entries.")
+
+    writer = BulkWriter(target, key="id", batch_size=WRITE_BATCH_SIZE, max_in_flight=WRITE_IN_FLIGHT,
+                        on_written=record_written)
+    pipeline = StreamingPipeline([
+        Stage("triage", triage_page, workers=2),
+        Stage("ocr", ocr_page),
+        Stage("embed", embed_page),
+        Stage("assemble", assemble_nodes),
+        Stage("write", lambda item: write_nodes(item, writer)),
+    ], queue_size=PIPELINE_QUEUE_SIZE)
+    pipeline.run(iter_pdf_pages(job["pdf"], category, entries_by_page, assets))
+    writer.close()
+    print(pipeline.report())
+    print(writer.report())
+
+    print(f"Pushed {writer.stats['written']} unified nodes for {category}.")
+    # A page dropped by a failing stage stays incomplete, so the job is not marked done
+    stage_errors = sum(pipeline.stats[s.name]["errors"] for s in pipeline.stages)
+    complete = writer.stats["failed"] == 0 and stage_errors == 0
+    if complete:
+        checkpoints.mark_job_complete(category, {"nodes": writer.stats["written"]})
+    return {"entries": entry_count, "written": writer.stats["written"], "complete": complete}
+
+def ingest_all(resume=False, target=None, clear_files=True):
+    """
+    Ingests every catalog job into `target` (default: the live unified_nodes
+    collection). Returns totals used by refresh_db.py to validate a build.
+    Files go to the target's own asset directory (the live one when
+    rebuilding in place), so a shadow build never touches what is served.
+    clear_files=False keeps existing files; they are overwritten as pages are redone.
+    """
+    target = collection if target is None else target
+    live_name, live_assets = CatalogVersions(db, COLLECTION_NAME).live()
+    assets = live_assets if target.name == live_name else asset_dir(target.name)
+    if resume:
+        # Keep the collection, processed files and checkpoints; finish what is missing
+        print(f"Resuming ingestion into {target.name} from {checkpoints.state_dir}")
+        checkpoints.bind_target(target.name)
+    else:
+        print(f"Clearing collection: {target.name} (assets: {assets})")
+        target.delete_many({})
+        checkpoints.reset()
+        checkpoints.bind_target(target.name)
+        
+        # Also clear processed directories to ensure "clear images and text"
+        if clear_files:
+            import shutil
+            for sub in ASSET_SUBDIRS:
+                path = os.path.join(assets, sub)
+                if os.path.exists(path): shutil.rmtree(path)
+    for sub in ASSET_SUBDIRS:
+        os.makedirs(os.path.join(assets, sub), exist_ok=True)
 
     jobs = [
         {
             "category": "kitchen",
             "pdf": "Data/kitchen_data/Kitchen_Design_Collection_Book_Vol_V.pdf",
             "txt": "Data/kitchen_data/kitchen_catalog_full.txt",
-            "xls": "Data/kitchen_data/kitchen_catalog_full.xlsx" # XLS could be used for extra validation but TXT is primary now
+            "xls": "Data/kitchen_data/kitchen_catalog_full.xlsx" # Read instead of the TXT export when CATALOG_SOURCE=xlsx
         },
         {
             "category": "bedroom",
@@ -248,9 +450,67 @@ def ingest_all():
         }
     ]
 
+    totals = {"entries": 0, "written": 0, "complete": True}
     for job in jobs:
-        process_job(job)
+        result = process_job(job, target, assets)
+        totals["entries"] += result["entries"]
+        totals["written"] += result["written"]
+        totals["complete"] = totals["complete"] and result["complete"]
+
+    # "More like this" graph needs every CLIP vector of a category, so it runs after all jobs.
+    # It uses the served CLIP version; ingest writes only the legacy one, so any other
+    # version's graph is built once its vectors exist (refresh_db.py / reembed.py)
+    if CLIP_EMBEDDING_VERSION == LEGACY_VERSIONS["clip"]:
+        print("\n>>> BUILDING IMAGE NEIGHBOR GRAPH")
+        totals["complete"] = (build_neighbor_graph(target, clip_field=embedding_field(CLIP_EMBEDDING_VERSION))
+                              and totals["complete"])
+    else:
+        print(f"\n>>> NEIGHBOR GRAPH: built after re-embedding as {CLIP_EMBEDDING_VERSION}")
+
+    ocr_pool.close()
+    if ingest_stats["images"]:
+        avoided = ingest_stats["avoided_text_layer"] + ingest_stats["avoided_no_text"]
+        print(f"OCR ({ocr_pool.backend}, {ocr_pool.workers} workers): {ingest_stats['ocr_calls']} calls for "
+              f"{ingest_stats['images']} images, {ingest_stats['seconds']:.1f}s engine time")
+        print(f"OCR calls avoided: {avoided} ({avoided / ingest_stats['images']:.0%}) - "
+              f"{ingest_stats['avoided_text_layer']} covered by the PDF text layer, "
+              f"{ingest_stats['avoided_no_text']} with no detected text")
+    if ingest_stats["ocr_errors"] or ingest_stats["clip_errors"]:
+        print(f"Image failures: {ingest_stats['ocr_errors']} without OCR (ocr_error on the image), "
+              f"{ingest_stats['clip_errors']} without a CLIP vector (run reembed.py to fill them)")
+    if resume:
+        print(f"Resumed: {ingest_stats['pages_resumed']} pages skipped, {ingest_stats['ocr_resumed']} OCR results "
+              f"and {ingest_stats['clip_resumed']} CLIP vectors reused from checkpoints")
+    return totals
+
+def export_catalog_snapshot(out_dir, target=None):
+    """
+    Writes `target` (default: the live collection) as a portable snapshot
+    that refresh_db.py --from-snapshot or CATALOG_SNAPSHOT can load.
+    """
+    target = collection if target is None else target
+    docs = target.find({}, {"_id": 0}).sort("id", 1)
+    models = {"text": RAGTools.TEXT_MODEL, "clip": RAGTools.CLIP_MODEL}
+    return export_snapshot(docs, out_dir, models, source=f"{DB_NAME}.{target.name}")
 
 if __name__ == "__main__":
-    ingest_all()
+    import argparse
+    parser = argparse.ArgumentParser(description="Ingest catalog PDFs and TXT/XLSX entries into unified_nodes")
+    parser.add_argument("--resume", action="store_true", help="Continue from the last checkpoint instead of rebuilding")
+    parser.add_argument("--snapshot", nargs="?", const=os.path.join(SNAPSHOT_DIR, "latest"), metavar="DIR",
+                        help="Also export a catalog snapshot after ingesting")
+    parser.add_argument("--neighbors-only", action="store_true",
+                        help="Only rebuild the image neighbor graph of the live collection")
+    args = parser.parse_args()
+
+    if args.neighbors_only:
+        build_neighbor_graph(collection)
+        raise SystemExit(0)
+
+    totals = ingest_all(resume=args.resume)
+    if args.snapshot:
+        if totals["complete"]:
+            export_catalog_snapshot(args.snapshot)
+        else:
+            print("Skipping snapshot export: ingestion had failures")
     print("\n✅ UPDATED UNIFIED INGESTION COMPLETE!")
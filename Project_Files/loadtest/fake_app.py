@@ -0,0 +1,29 @@
+"""
+ASGI entry point for load tests: backend.main:app with the Atlas handler
+replaced by the in-memory stand-in. Groq is redirected through
+GROQ_API_BASE by the load-test runner.
+
+    LOADTEST_CATALOG_SIZE=100000 uvicorn loadtest.fake_app:app --workers 4
+"""
+import os
+
+# Must run before torch is imported by the encoders
+torch_threads = os.getenv("TORCH_NUM_THREADS")
+if torch_threads:
+    import torch
+    torch.set_num_threads(int(torch_threads))
+
+from benchmarks.standins import FakeRAGTools, InMemoryDatabaseHandler, SyntheticCatalog
+import backend.chat_engine as chat_engine
+
+CATALOG_SIZE = int(os.getenv("LOADTEST_CATALOG_SIZE", "10000"))
+FAKE_ENCODERS = os.getenv("LOADTEST_FAKE_ENCODERS", "false").lower() == "true"
+
+_catalog = SyntheticCatalog(CATALOG_SIZE, images_per_node=int(os.getenv("LOADTEST_IMAGES_PER_NODE", "2")))
+
+# ChatEngine() in backend.main constructs these; RAGTools gets the text_model/clip_model keywords
+chat_engine.DatabaseHandler = lambda: InMemoryDatabaseHandler(_catalog)
+if FAKE_ENCODERS:
+    chat_engine.RAGTools = FakeRAGTools
+
+from backend.main import app  # noqa: E402
@@ -0,0 +1,68 @@
+"""
+Minimal Groq (OpenAI-compatible) chat completions server with a fixed
+response latency. Point ChatGroq at it with GROQ_API_BASE=http://host:port.
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_handler(latency, answer_words):
+    class FakeGroqHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            prompt = " ".join(str(m.get("content", "")) for m in body.get("messages", []))
+
+            time.sleep(latency)
+            content = "YES" if "Answer exactly 'YES' or 'NO'" in prompt else " ".join(["design"] * answer_words)
+
+            payload = json.dumps({
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "llama-3.1-8b-instant"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": len(content.split()),
+                          "total_tokens": len(prompt.split()) + len(content.split())},
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FakeGroqHandler
+
+
+def start_fake_groq(host="127.0.0.1", port=0, latency=0.3, answer_words=180):
+    """
+    Starts the server on a daemon thread and returns it; server.server_address
+    holds the bound port.
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(latency, answer_words))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Groq chat completions server")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.3)
+    args = parser.parse_args()
+    server = start_fake_groq(port=args.port, latency=args.latency)
+    print(f"Fake Groq listening on http://127.0.0.1:{server.server_address[1]}")
+    threading.Event().wait()
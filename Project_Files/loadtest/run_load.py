@@ -0,0 +1,316 @@
+"""
+Closed/open-loop load test for the FastAPI /ask service.
+
+    python -m loadtest.run_load --workers 1,2,4 --torch-threads 1,4 --mode closed --concurrency 16 --duration 60
+
+For every (workers, torch threads) combination the runner starts
+loadtest.fake_app under uvicorn against a local fake Groq server and the
+in-memory catalog, drives /ask from a query corpus and reports throughput,
+p50/p95/p99 latency, error rate and per-worker RSS/CPU. Results are written
+to JSON for comparison.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from benchmarks.standins import synthetic_queries
+from .fake_groq import start_fake_groq
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def load_queries(path, n):
+    if path:
+        with open(path, encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+    return synthetic_queries(n)
+
+
+# ---------------- Server lifecycle ----------------
+
+def start_server(port, workers, torch_threads, groq_url, args, workdir):
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": PROJECT_DIR + os.pathsep + env.get("PYTHONPATH", ""),
+        "GROQ_API_BASE": groq_url,
+        "GROQ_API_KEY": "loadtest",
+        "LOADTEST_CATALOG_SIZE": str(args.catalog_size),
+        "LOADTEST_FAKE_ENCODERS": "true" if args.fake_encoders else "false",
+        "TORCH_NUM_THREADS": str(torch_threads),
+        "OMP_NUM_THREADS": str(torch_threads),
+        "MKL_NUM_THREADS": str(torch_threads),
+        "LOG_LEVEL": "WARNING",
+    })
+    cmd = [sys.executable, "-m", "uvicorn", "loadtest.fake_app:app",
+           "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers),
+           "--log-level", "warning", "--no-access-log"]
+    # main.py mounts Data/ and frontend/ relative to the working directory
+    proc = subprocess.Popen(cmd, cwd=workdir, env=env)
+
+    deadline = time.time() + args.startup_timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Server exited with code {proc.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/metrics")
+            if conn.getresponse().status == 200:
+                conn.close()
+                return proc
+        except OSError:
+            time.sleep(0.5)
+    proc.terminate()
+    raise RuntimeError("Server did not become ready in time")
+
+
+def stop_server(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+class ResourceSampler:
+    """
+    Samples RSS and CPU of the uvicorn process tree once per second.
+    """
+
+    def __init__(self, pid, interval=1.0):
+        self.pid = pid
+        self.interval = interval
+        self.samples = {}  # pid -> [(rss_mb, cpu_percent)]
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        if psutil is not None:
+            self._thread.start()
+        return self
+
+    def _processes(self):
+        parent = psutil.Process(self.pid)
+        children = parent.children(recursive=True)
+        # With --workers > 1 the parent only supervises; the children serve
+        return children or [parent]
+
+    def _run(self):
+        procs = {}
+        while not self._stop.wait(self.interval):
+            try:
+                for p in self._processes():
+                    if p.pid not in procs:
+                        procs[p.pid] = p
+                        p.cpu_percent(None)
+                        continue
+                    self.samples.setdefault(p.pid, []).append(
+                        (p.memory_info().rss / 1e6, p.cpu_percent(None)))
+            except psutil.Error:
+                continue
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        report = {}
+        for pid, rows in self.samples.items():
+            rss = [r for r, _ in rows]
+            cpu = [c for _, c in rows]
+            report[str(pid)] = {
+                "rss_mb_max": round(max(rss), 1),
+                "rss_mb_last": round(rss[-1], 1),
+                "cpu_percent_mean": round(float(np.mean(cpu)), 1),
+            }
+        return report
+
+
+# ---------------- Load generation ----------------
+
+class Recorder:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds, ok):
+        with self._lock:
+            if ok:
+                self.latencies.append(seconds)
+            else:
+                self.errors += 1
+
+
+def send_ask(port, question, timeout):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    try:
+        body = json.dumps({"question": question})
+        conn.request("POST", "/ask", body=body, headers={"Content-Type": "application/json"})
+        response = conn.getresponse()
+        response.read()
+        return response.status == 200
+    except OSError:
+        return False
+    finally:
+        conn.close()
+
+
+def closed_loop(port, queries, args, recorder):
+    """
+    `concurrency` virtual users, each sending the next request as soon as the
+    previous one returns.
+    """
+    stop_at = time.perf_counter() + args.duration
+
+    def user(seed):
+        rng = random.Random(seed)
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            ok = send_ask(port, rng.choice(queries), args.timeout)
+            recorder.record(time.perf_counter() - start, ok)
+
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def open_loop(port, queries, args, recorder):
+    """
+    Poisson arrivals at `rate` requests/sec regardless of completions.
+    Latency is measured from the scheduled arrival time, so queueing in the
+    client is charged to the service (no coordinated omission).
+    """
+    rng = random.Random(0)
+    pool = ThreadPoolExecutor(max_workers=args.max_in_flight)
+
+    def fire(scheduled, question):
+        ok = send_ask(port, question, args.timeout)
+        recorder.record(time.perf_counter() - scheduled, ok)
+
+    start = time.perf_counter()
+    next_at = start
+    while next_at < start + args.duration:
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        pool.submit(fire, next_at, rng.choice(queries))
+        next_at += rng.expovariate(args.rate)
+    pool.shutdown(wait=True)
+
+
+def summarize(recorder, elapsed):
+    lat = np.array(recorder.latencies) * 1000
+    total = len(lat) + recorder.errors
+    return {
+        "requests": total,
+        "throughput_rps": round(len(lat) / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round(recorder.errors / total, 4) if total else 0.0,
+        "p50_ms": round(float(np.percentile(lat, 50)), 1) if len(lat) else None,
+        "p95_ms": round(float(np.percentile(lat, 95)), 1) if len(lat) else None,
+        "p99_ms": round(float(np.percentile(lat, 99)), 1) if len(lat) else None,
+    }
+
+
+def run_config(workers, torch_threads, groq_url, queries, args, workdir):
+    port = free_port()
+    print(f"\n--- workers={workers} torch_threads={torch_threads} ({args.mode}-loop) ---")
+    proc = start_server(port, workers, torch_threads, groq_url, args, workdir)
+    try:
+        # Warm each worker's models before measuring
+        for q in queries[:args.warmup]:
+            send_ask(port, q, args.timeout)
+
+        sampler = ResourceSampler(proc.pid).start()
+        recorder = Recorder()
+        started = time.perf_counter()
+        if args.mode == "closed":
+            closed_loop(port, queries, args, recorder)
+        else:
+            open_loop(port, queries, args, recorder)
+        elapsed = time.perf_counter() - started
+        result = summarize(recorder, elapsed)
+        result["workers_resources"] = sampler.stop()
+    finally:
+        stop_server(proc)
+
+    print(f"throughput={result['throughput_rps']} rps  p50={result['p50_ms']}ms  "
+          f"p95={result['p95_ms']}ms  p99={result['p99_ms']}ms  errors={result['error_rate']:.2%}")
+    for pid, res in result["workers_resources"].items():
+        print(f"  worker {pid}: rss_max={res['rss_mb_max']}MB cpu_mean={res['cpu_percent_mean']}%")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for the /ask service")
+    parser.add_argument("--workers", default="1", help="Comma separated uvicorn worker counts")
+    parser.add_argument("--torch-threads", default="1", help="Comma separated torch thread counts")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed")
+    parser.add_argument("--concurrency", type=int, default=8, help="Virtual users (closed loop)")
+    parser.add_argument("--rate", type=float, default=5.0, help="Requests/sec (open loop)")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Client threads (open loop)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per configuration")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--queries", help="File with one query per line (default: synthetic)")
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--catalog-size", type=int, default=10000)
+    parser.add_argument("--fake-encoders", action="store_true")
+    parser.add_argument("--groq-latency", type=float, default=0.3)
+    parser.add_argument("--startup-timeout", type=float, default=300.0)
+    parser.add_argument("--output", default="loadtest/results")
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries, args.num_queries)
+    groq = start_fake_groq(latency=args.groq_latency)
+    groq_url = f"http://127.0.0.1:{groq.server_address[1]}"
+
+    if psutil is None:
+        print("psutil not installed: per-worker RSS/CPU will not be reported")
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for sub in ("Data/processed/images", "frontend"):
+            os.makedirs(os.path.join(workdir, sub), exist_ok=True)
+        for workers in [int(w) for w in args.workers.split(",")]:
+            for threads in [int(t) for t in args.torch_threads.split(",")]:
+                result = run_config(workers, threads, groq_url, queries, args, workdir)
+                results.append({"workers": workers, "torch_threads": threads, **result})
+
+    groq.shutdown()
+
+    print("\nworkers  threads  rps      p50ms    p95ms    p99ms    errors")
+    for r in results:
+        print(f"{r['workers']:<8} {r['torch_threads']:<8} {r['throughput_rps']:<8} "
+              f"{r['p50_ms']!s:<8} {r['p95_ms']!s:<8} {r['p99_ms']!s:<8} {r['error_rate']:.2%}")
+
+    os.makedirs(args.output, exist_ok=True)
+    out_path = os.path.join(args.output, f"load_{args.mode}_{int(time.time())}.json")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump({"config": vars(args), "results": results}, f, indent=2)
+    print(f"\nResults written to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+from pymongo import MongoClient
+import argparse
+import os
+import sys
+from dotenv import load_dotenv
+from backend.catalog_versions import CatalogVersions
+from backend.embedding_versions import (
+    EMBEDDING_VERSIONS, CLIP_EMBEDDING_VERSION, get_version, embedding_field, search_index_template,
+)
+from backend.neighbor_graph import build_neighbor_graph
+from backend.reembed import ReembedJob
+
+load_dotenv()
+MONGO_URI = os.getenv("MONGO_URI")
+DB_NAME = "remodel_catalog"
+
+
+def reembed_collection(collection, version, batch_size=64, force=False, rag_tools=None):
+    """
+    Writes `version` vectors next to the existing ones; returns True when
+    every node was updated.
+    """
+    spec = get_version(version)
+    if rag_tools is None:
+        from backend.rag_tools import RAGTools
+        rag_tools = RAGTools(**{f"{spec['kind']}_model": spec["model"]})
+    job = ReembedJob(collection, version, rag_tools, batch_size=batch_size, force=force)
+    return job.run()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Add an embedding version to the live catalog without re-running OCR. "
+                    "Search keeps using the current version until TEXT_EMBEDDING_VERSION / "
+                    "CLIP_EMBEDDING_VERSION point at the new one."
+    )
+    parser.add_argument("version", nargs="+", choices=sorted(EMBEDDING_VERSIONS))
+    parser.add_argument("--collection", help="Collection to update (default: the live unified_nodes version)")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--force", action="store_true", help="Recompute vectors that already exist")
+    parser.add_argument("--skip-index", action="store_true", help="Do not create the version's search index")
+    parser.add_argument("--index-timeout", type=float, default=900.0)
+    args = parser.parse_args()
+
+    client = MongoClient(MONGO_URI)
+    db = client[DB_NAME]
+    versions = CatalogVersions(db, "unified_nodes")
+    name = args.collection or versions.live_name()
+
+    ok = True
+    for version in args.version:
+        print(f"\n--- RE-EMBEDDING {name} AS {version} ---")
+        if not reembed_collection(db[name], version, batch_size=args.batch_size, force=args.force):
+            print(f"❌ {version}: some nodes failed; re-run to finish them")
+            ok = False
+            continue
+        # "More like this" follows the served CLIP version
+        if version == CLIP_EMBEDDING_VERSION:
+            ok = build_neighbor_graph(db[name], clip_field=embedding_field(version)) and ok
+        if not args.skip_index:
+            versions.ensure_search_indexes(name, templates=[search_index_template(version)],
+                                           timeout=args.index_timeout)
+
+    client.close()
+    if not ok:
+        sys.exit(1)
+    print("\n✅ RE-EMBEDDING COMPLETE")
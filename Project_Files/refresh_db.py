@@ -1,7 +1,17 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
+import argparse
 import os
+import sys
 from dotenv import load_dotenv
-import subprocess
+from backend.catalog_versions import CatalogVersions
+from backend.embedding_versions import (
+    EMBEDDING_VERSIONS, LEGACY_VERSIONS, TEXT_EMBEDDING_VERSION, CLIP_EMBEDDING_VERSION,
+    search_index_template, index_name, vector_path, embedding_field,
+)
+from backend.neighbor_graph import build_neighbor_graph
+from backend.snapshot import Snapshot, restore_mongo
+from backend.bulk_writer import BulkWriter
+from backend.attributes import node_attributes
 
 load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI")
@@ -9,20 +19,161 @@ DB_NAME = "remodel_catalog"
 
 client = MongoClient(MONGO_URI)
 db = client[DB_NAME]
+versions = CatalogVersions(db, "unified_nodes")
 
-colls_to_clear = ["unified_nodes", "embeddings", "embeddings_v1", "image_embeddings"]
+# Collections from the older per-modality pipeline; unified_nodes is cleared by ingest itself
+LEGACY_COLLECTIONS = ["embeddings", "embeddings_v1", "image_embeddings"]
 
-print(f"--- REFRESHING DATABASE: {DB_NAME} ---")
-for coll in colls_to_clear:
-    if coll in db.list_collection_names():
-        count = db[coll].count_documents({})
-        print(f"Clearing {coll} ({count} documents)...")
-        db[coll].delete_many({})
 
-client.close()
+def refresh_in_place():
+    """
+    Old behaviour: search is empty or partial until ingestion finishes.
+    """
+    for coll in LEGACY_COLLECTIONS:
+        if coll in db.list_collection_names():
+            count = db[coll].count_documents({})
+            print(f"Clearing {coll} ({count} documents)...")
+            db[coll].delete_many({})
 
-print("\n--- RUNNING INGESTION ---")
-# Run ingest.py
-subprocess.run(["python", "ingest.py"], check=True)
+    print("\n--- RUNNING INGESTION ---")
+    import ingest  # loads the models once, in this process
+    ingest.ingest_all()
 
-print("\n✅ DATABASE REFRESH AND INGESTION COMPLETE!")
+
+def backfill_attributes(args):
+    """
+    Adds the parsed price/size/material/color fields to the live collection
+    from its stored strings and updates its search indexes with the new
+    filter paths. No OCR or re-embedding; search keeps serving throughout.
+    """
+    name = versions.live_name()
+    coll = db[name]
+    print(f"Backfilling attributes on {name}")
+    writer = BulkWriter(coll, key="_id", to_op=lambda u: UpdateOne({"_id": u["_id"]}, {"$set": u["set"]}))
+    for doc in coll.find({}, {"price": 1, "size": 1, "material": 1, "color": 1}):
+        writer.add({"_id": doc["_id"], "set": node_attributes(doc)})
+    writer.close()
+    print(writer.report())
+
+    print("\n--- UPDATING SEARCH INDEXES ---")
+    versions.ensure_search_indexes(name, timeout=args.index_timeout)
+
+
+def versions_to_embed(extra=()):
+    """
+    Non-legacy embedding versions a new build needs: the ones servers query
+    (TEXT/CLIP_EMBEDDING_VERSION), any already present on the live
+    version, and `extra`. Ingest and snapshots write the legacy fields only.
+    """
+    live = db[versions.live_name()]
+    wanted = set(extra) | {TEXT_EMBEDDING_VERSION, CLIP_EMBEDDING_VERSION}
+    wanted |= {v for v in EMBEDDING_VERSIONS if v not in LEGACY_VERSIONS.values()
+               and live.find_one({vector_path(v): {"$exists": True}}, {"_id": 1})}
+    return sorted(v for v in wanted if v not in LEGACY_VERSIONS.values())
+
+
+def refresh_blue_green(args):
+    """
+    Builds a new unified_nodes version next to the live one and switches
+    the alias only after it is indexed and validated.
+    """
+    shadow = versions.building() if args.resume else None
+    resuming = bool(shadow) and shadow in db.list_collection_names()
+    if resuming:
+        print(f"Resuming build of {shadow}")
+    else:
+        shadow = versions.new_version()
+        print(f"Building {shadow} (live: {versions.live_name()})")
+
+    if args.from_snapshot:
+        # No OCR or encoders needed: vectors come from the snapshot files
+        print(f"\n--- RESTORING SNAPSHOT {args.from_snapshot} ---")
+        snapshot = Snapshot(args.from_snapshot, verify=True)
+        stats = restore_mongo(snapshot, db[shadow])
+        totals = {"entries": len(snapshot), "complete": stats["failed"] == 0}
+    else:
+        print("\n--- RUNNING INGESTION ---")
+        import ingest  # loads the models once, in this process
+        totals = ingest.ingest_all(resume=resuming, target=db[shadow])
+        if totals["complete"] and args.snapshot_out:
+            ingest.export_catalog_snapshot(args.snapshot_out, target=db[shadow])
+    if not totals["complete"]:
+        print(f"\n❌ Ingestion into {shadow} had failures; fix them and re-run with --resume")
+        sys.exit(1)
+
+    # Served and live versions other than the legacy ones, so the switch never drops a queried field
+    reembed = versions_to_embed(args.reembed)
+    if reembed:
+        from reembed import reembed_collection
+        for version in reembed:
+            print(f"\n--- RE-EMBEDDING AS {version} ---")
+            if not reembed_collection(db[shadow], version):
+                print(f"\n❌ Re-embedding {shadow} as {version} had failures; re-run with --resume")
+                sys.exit(1)
+        if CLIP_EMBEDDING_VERSION in reembed:
+            print(f"\n--- BUILDING IMAGE NEIGHBOR GRAPH ({CLIP_EMBEDDING_VERSION}) ---")
+            if not build_neighbor_graph(db[shadow], clip_field=embedding_field(CLIP_EMBEDDING_VERSION)):
+                print(f"\n❌ Neighbor graph writes to {shadow} had failures; re-run with --resume")
+                sys.exit(1)
+
+    print("\n--- BUILDING SEARCH INDEXES ---")
+    templates = versions.index_templates()
+    names = {t["name"] for t in templates}
+    templates += [t for t in map(search_index_template, reembed) if t["name"] not in names]
+    versions.ensure_search_indexes(shadow, templates=templates, timeout=args.index_timeout)
+
+    print("\n--- VALIDATING ---")
+    # Self-retrieval on the text version servers query (CLIP vectors are shared by a page's nodes)
+    ok, report = versions.validate(shadow, expected=totals["entries"], min_recall=args.min_recall,
+                                   probe_size=args.probe_size, timeout=args.probe_timeout,
+                                   index=index_name(TEXT_EMBEDDING_VERSION),
+                                   path=vector_path(TEXT_EMBEDDING_VERSION))
+    print(f"{report['count']} documents (expected {report['expected']}, live {report['live_count']}), "
+          f"recall@10 {report['recall'] if report['recall'] is not None else 'n/a'}")
+    if not ok and not args.force:
+        print(f"\n❌ Validation failed: {'; '.join(report['problems'])}")
+        if not args.keep_failed:
+            versions.discard(shadow)
+        sys.exit(1)
+
+    versions.switch(shadow)
+    versions.prune(keep=args.keep)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the catalog without taking search offline")
+    parser.add_argument("--in-place", action="store_true", help="Clear and rebuild the live collection directly")
+    parser.add_argument("--resume", action="store_true", help="Continue the last unfinished blue/green build")
+    parser.add_argument("--rollback", action="store_true", help="Point the alias back at the previous version")
+    parser.add_argument("--keep", type=int, default=2, help="Versions kept after a switch, live included")
+    parser.add_argument("--min-recall", type=float, default=0.9, help="Self-retrieval recall@10 required to switch")
+    parser.add_argument("--probe-size", type=int, default=20)
+    parser.add_argument("--probe-timeout", type=float, default=300.0)
+    parser.add_argument("--index-timeout", type=float, default=900.0)
+    parser.add_argument("--force", action="store_true", help="Switch even if validation fails")
+    parser.add_argument("--keep-failed", action="store_true", help="Keep a build that failed validation")
+    parser.add_argument("--from-snapshot", metavar="DIR", help="Build the new version from an exported snapshot")
+    parser.add_argument("--snapshot-out", metavar="DIR", help="Export a snapshot of the new version after ingesting")
+    parser.add_argument("--backfill-attributes", action="store_true",
+                        help="Only add parsed price/size/material/color filter fields to the live version")
+    parser.add_argument("--reembed", action="append", default=[], choices=sorted(EMBEDDING_VERSIONS),
+                        metavar="VERSION", help="Also embed the new version with this embedding version "
+                             "(served and live versions are always embedded)")
+    args = parser.parse_args()
+
+    print(f"--- REFRESHING DATABASE: {DB_NAME} ---")
+    if args.rollback:
+        versions.rollback()
+        client.close()
+        print("\n✅ ROLLED BACK TO THE PREVIOUS CATALOG VERSION")
+        sys.exit(0)
+
+    if args.backfill_attributes:
+        backfill_attributes(args)
+    elif args.in_place:
+        refresh_in_place()
+    else:
+        refresh_blue_green(args)
+
+    client.close()
+    print("\n✅ DATABASE REFRESH AND INGESTION COMPLETE!")
@@ -34,6 +34,10 @@ from langchain_groq import ChatGroq
 # -----------------------------
 from dotenv import load_dotenv
 import os
+import re
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 
 load_dotenv()
 
@@ -47,6 +51,12 @@ COLLECTION_NAME = os.getenv("COLLECTION_NAME")
 INDEX_NAME = os.getenv("INDEX_NAME")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
+# Speculative retrieval: search with the raw question while the rewrite runs
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "true").lower() == "true"
+
+# Cosine similarity above which the speculative results are reused
+SPECULATION_REUSE_THRESHOLD = float(os.getenv("SPECULATION_REUSE_THRESHOLD", "0.9"))
+
 
 # =====================================================
 # Global Objects
@@ -54,6 +64,21 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
 chat_history = []
 
+# Vector store is built once and shared by every turn
+_vectorstore = None
+
+# Background worker used for speculative retrieval
+_executor = ThreadPoolExecutor(max_workers=1)
+
+# Counters used to report how often speculation paid off
+speculation_stats = {
+    "turns": 0,
+    "rewrite_skipped": 0,
+    "speculation_reused": 0,
+    "speculation_discarded": 0,
+    "seconds_saved": 0.0,
+}
+
 
 # =====================================================
 # Function: get_vector_store
@@ -61,6 +86,11 @@ chat_history = []
 # =====================================================
 def get_vector_store():
 
+    global _vectorstore
+
+    if _vectorstore is not None:
+        return _vectorstore
+
     embeddings = HuggingFaceEmbeddings(
         model_name="all-MiniLM-L6-v2"
     )
@@ -74,6 +104,8 @@ def get_vector_store():
         index_name=INDEX_NAME
     )
 
+    _vectorstore = vectorstore
+
     return vectorstore
 
 
@@ -115,6 +147,41 @@ def rewrite_question(model, user_question):
     return result.content.strip()
 
 
+# =====================================================
+# Function: is_standalone_question
+# Cheap local check that avoids the rewrite LLM call
+# =====================================================
+
+# Words that usually point back to something said earlier
+FOLLOW_UP_REFERENCES = {
+    "it", "its", "that", "this", "those", "these", "they", "them", "their",
+    "he", "she", "him", "her", "his", "one", "ones", "same", "else",
+    "also", "more", "above", "previous", "former", "latter",
+}
+
+# Openings that only make sense as a continuation
+FOLLOW_UP_OPENINGS = ("and ", "but ", "so ", "what about", "how about", "why not", "then ")
+
+
+def is_standalone_question(user_question, min_words=4):
+    """
+    Returns True when the question can be searched without the chat history.
+    """
+
+    q = user_question.strip().lower()
+
+    if q.startswith(FOLLOW_UP_OPENINGS):
+        return False
+
+    words = re.findall(r"[a-z0-9']+", q)
+
+    # Very short questions ("why?", "and the price?") lean on context
+    if len(words) < min_words:
+        return False
+
+    return not any(w in FOLLOW_UP_REFERENCES for w in words)
+
+
 # =====================================================
 # Function: retrieve_documents
 # Performs semantic search
@@ -132,6 +199,111 @@ def retrieve_documents(query, k=3):
     return docs
 
 
+# =====================================================
+# Function: retrieve_by_vector
+# Semantic search from an already computed query embedding
+# =====================================================
+def retrieve_by_vector(query_embedding, k=3):
+
+    vectorstore = get_vector_store()
+
+    return vectorstore.similarity_search_by_vector(query_embedding, k=k)
+
+
+# =====================================================
+# Function: embed_query
+# Embeds a query with the same model used by the vector store
+# =====================================================
+def embed_query(query):
+
+    return get_vector_store().embeddings.embed_query(query)
+
+
+# =====================================================
+# Function: cosine_similarity
+# =====================================================
+def cosine_similarity(a, b):
+
+    a = np.asarray(a)
+    b = np.asarray(b)
+
+    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b) + 1e-8))
+
+
+# =====================================================
+# Function: speculative_retrieve
+# Runs retrieval on the raw question while the rewrite is in flight
+# =====================================================
+def speculative_retrieve(model, user_question, k=3):
+    """
+    Returns (search_question, docs).
+
+    The raw question is embedded and searched in a background thread while
+    the rewrite LLM call runs. If the rewritten question embeds close enough
+    to the raw one, the speculative results are reused and the second
+    search is skipped.
+    """
+
+    speculation_stats["turns"] += 1
+
+    # No history, or the question already stands alone: nothing to rewrite
+    if not chat_history or is_standalone_question(user_question):
+        if chat_history:
+            speculation_stats["rewrite_skipped"] += 1
+        return user_question, retrieve_documents(user_question, k=k)
+
+    def _search_raw():
+        raw_embedding = embed_query(user_question)
+        started = time.perf_counter()
+        docs = retrieve_by_vector(raw_embedding, k=k)
+        return raw_embedding, docs, time.perf_counter() - started
+
+    future = _executor.submit(_search_raw)
+
+    # Step 1: Rewrite question (runs concurrently with the search above)
+    search_question = rewrite_question(model, user_question)
+
+    raw_embedding, speculative_docs, search_seconds = future.result()
+
+    if search_question.strip().lower() == user_question.strip().lower():
+        speculation_stats["speculation_reused"] += 1
+        speculation_stats["seconds_saved"] += search_seconds
+        return search_question, speculative_docs
+
+    rewritten_embedding = embed_query(search_question)
+
+    if cosine_similarity(raw_embedding, rewritten_embedding) >= SPECULATION_REUSE_THRESHOLD:
+        speculation_stats["speculation_reused"] += 1
+        speculation_stats["seconds_saved"] += search_seconds
+        return search_question, speculative_docs
+
+    speculation_stats["speculation_discarded"] += 1
+
+    return search_question, retrieve_by_vector(rewritten_embedding, k=k)
+
+
+# =====================================================
+# Function: print_speculation_report
+# Shows how often speculation avoided a round-trip
+# =====================================================
+def print_speculation_report():
+
+    turns = speculation_stats["turns"]
+
+    if not turns:
+        return
+
+    used = speculation_stats["rewrite_skipped"] + speculation_stats["speculation_reused"]
+
+    print("\n--- Speculative Retrieval ---")
+    print(f"Turns: {turns}")
+    print(f"Rewrite skipped (standalone): {speculation_stats['rewrite_skipped']}")
+    print(f"Speculative results reused: {speculation_stats['speculation_reused']}")
+    print(f"Speculative results discarded: {speculation_stats['speculation_discarded']}")
+    print(f"Speculation used on {used / turns:.0%} of turns")
+    print(f"Serial search time saved: {speculation_stats['seconds_saved']:.2f}s")
+
+
 # =====================================================
 # Function: generate_answer
 # Uses Groq to answer based on retrieved context
@@ -171,12 +343,17 @@ def ask_question(model, user_question):
 
     print(f"\n--- You asked: {user_question} ---")
 
-    # Step 1: Rewrite question
-    search_question = rewrite_question(model, user_question)
-    print(f"🔍 Searching for: {search_question}")
+    if SPECULATIVE_RETRIEVAL:
+        # Steps 1 + 2: Rewrite and retrieve concurrently
+        search_question, docs = speculative_retrieve(model, user_question)
+        print(f"🔍 Searching for: {search_question}")
+    else:
+        # Step 1: Rewrite question
+        search_question = rewrite_question(model, user_question)
+        print(f"🔍 Searching for: {search_question}")
 
-    # Step 2: Retrieve documents
-    docs = retrieve_documents(search_question)
+        # Step 2: Retrieve documents
+        docs = retrieve_documents(search_question)
 
     print(f"📄 Found {len(docs)} relevant documents")
 
@@ -218,6 +395,7 @@ def start_chat():
             continue
 
         if question.lower() in ["quit", "exit"]:
+            print_speculation_report()
             print("Goodbye!")
             break
 